@@ -0,0 +1,55 @@
+"""
+SISTEMA DE GESTIÓN - GOBIERNO DIGITAL - ALCALDÍA DE COTA
+
+Importar el paquete no carga ningún submódulo: las clases se cargan en el
+primer uso (PEP 562), de modo que un script que solo necesita la
+configuración o las plantillas no paga el resto.
+
+    from app import ConfigCota, TemplatesCota
+    import app; app.storage.StorageCota
+
+El núcleo (config, storage, templates, utils y lo que ellos usan) no
+importa Streamlit ni NumPy; la interfaz es app.main.
+"""
+import importlib
+
+_CLASES = {
+    "AgregadosCota": "aggregates",
+    "AnaliticaCota": "analytics",
+    "ArchivoCota": "archive",
+    "AutenticacionCota": "auth",
+    "BorradoresCota": "drafts",
+    "BusquedaCota": "search",
+    "ConfigCota": "config",
+    "EscrituraCota": "atomic",
+    "EvidenciasCota": "evidence",
+    "ExportCota": "export",
+    "ImportadorCota": "importer",
+    "LoggerCota": "logger",
+    "MetricasCota": "metrics",
+    "ProgramadorCota": "scheduler",
+    "ProyectosCota": "projects",
+    "RespaldoCota": "backup",
+    "StorageCota": "storage",
+    "TableroCota": "dashboard",
+    "TemplatesCota": "templates",
+    "UtilsCota": "utils",
+}
+_SUBMODULOS = frozenset(_CLASES.values()) | {"batch", "bench", "check", "loadtest"}
+
+__all__ = sorted(_CLASES)
+
+
+def __getattr__(nombre):
+    if nombre in _CLASES:
+        valor = getattr(importlib.import_module(f".{_CLASES[nombre]}", __name__), nombre)
+    elif nombre in _SUBMODULOS:
+        valor = importlib.import_module(f".{nombre}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    globals()[nombre] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_CLASES) | _SUBMODULOS)
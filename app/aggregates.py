@@ -0,0 +1,164 @@
+"""
+AGREGADOS MENSUALES, TRIMESTRALES Y ANUALES - ALCALDÍA DE COTA
+"""
+from datetime import datetime
+from .config import ConfigCota
+from .storage import StorageCota
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS agregados (
+    municipio TEXT NOT NULL,
+    dependencia TEXT NOT NULL,
+    año INTEGER NOT NULL,
+    periodo TEXT NOT NULL,
+    indicador TEXT NOT NULL,
+    suma REAL,
+    promedio REAL,
+    minimo REAL,
+    maximo REAL,
+    ultimo REAL,
+    meses INTEGER NOT NULL,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (municipio, dependencia, año, periodo, indicador)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_agregados_periodo ON agregados (municipio, año, periodo);
+CREATE TABLE IF NOT EXISTS versiones (
+    municipio TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (municipio, nombre)
+) WITHOUT ROWID;
+"""
+StorageCota.registrar_esquema(ESQUEMA)
+
+
+class AgregadosCota:
+    """Consolidados materializados por (dependencia, año, período, indicador)
+
+    Períodos: 'M01'..'M12' (mes), 'T1'..'T4' (trimestre) y 'A' (año).
+    Al guardar los indicadores de un mes solo se recalculan ese mes, su
+    trimestre y su año, dentro de la misma transacción que los guarda.
+    Cada recálculo incrementa la versión de los datos ('versiones'), que
+    usan las cachés derivadas (series del tablero) para invalidarse.
+    """
+
+    @staticmethod
+    def periodos_afectados(meses):
+        """Períodos que incluyen los meses indicados: {(periodo, mes_desde, mes_hasta)}"""
+        periodos = {("A", 1, 12)}
+        for mes in meses:
+            trimestre = (mes - 1) // 3
+            periodos.add((f"M{mes:02d}", mes, mes))
+            periodos.add((f"T{trimestre + 1}", trimestre * 3 + 1, trimestre * 3 + 3))
+        return sorted(periodos)
+
+    @classmethod
+    def actualizar(cls, conn, municipio, dependencia, año, meses):
+        """Recalcula solo los consolidados de los períodos que contienen los meses indicados"""
+        ahora = datetime.now().isoformat(timespec="seconds")
+        conn.execute(
+            """INSERT INTO versiones (municipio, nombre, version) VALUES (?, 'indicadores', 1)
+               ON CONFLICT (municipio, nombre) DO UPDATE SET version = version + 1""",
+            (municipio,)
+        )
+        for periodo, desde, hasta in cls.periodos_afectados(meses):
+            conn.execute(
+                "DELETE FROM agregados WHERE municipio = ? AND dependencia = ? AND año = ? AND periodo = ?",
+                (municipio, dependencia, año, periodo)
+            )
+            conn.execute(
+                """INSERT INTO agregados (municipio, dependencia, año, periodo, indicador, suma, promedio,
+                                          minimo, maximo, ultimo, meses, actualizado)
+                   SELECT i.municipio, i.dependencia, i.año, ?, i.indicador,
+                          SUM(i.valor), AVG(i.valor), MIN(i.valor), MAX(i.valor),
+                          (SELECT u.valor FROM indicadores u
+                           WHERE u.municipio = i.municipio AND u.dependencia = i.dependencia
+                             AND u.año = i.año AND u.indicador = i.indicador
+                             AND u.mes BETWEEN ? AND ? AND u.valor IS NOT NULL
+                           ORDER BY u.mes DESC LIMIT 1),
+                          COUNT(i.valor), ?
+                   FROM indicadores i
+                   WHERE i.municipio = ? AND i.dependencia = ? AND i.año = ? AND i.mes BETWEEN ? AND ?
+                   GROUP BY i.indicador""",
+                (periodo, desde, hasta, ahora, municipio, dependencia, año, desde, hasta)
+            )
+
+    @classmethod
+    def reconstruir(cls, año=None, municipio=None):
+        """Recalcula desde cero (mantenimiento); devuelve los años-dependencia procesados"""
+        municipio = StorageCota._municipio(municipio)
+        sql = "SELECT DISTINCT dependencia, año, mes FROM indicadores WHERE municipio = ?"
+        parametros = [municipio]
+        if año is not None:
+            sql += " AND año = ?"
+            parametros.append(int(año))
+
+        with StorageCota.transaccion() as conn:
+            meses_por_año = {}
+            for dependencia, año_fila, mes in conn.execute(sql, parametros):
+                meses_por_año.setdefault((dependencia, año_fila), set()).add(mes)
+
+            if año is None:
+                conn.execute("DELETE FROM agregados WHERE municipio = ?", (municipio,))
+            else:
+                conn.execute("DELETE FROM agregados WHERE municipio = ? AND año = ?", (municipio, int(año)))
+            for (dependencia, año_fila), meses in meses_por_año.items():
+                cls.actualizar(conn, municipio, dependencia, año_fila, meses)
+        return len(meses_por_año)
+
+    @staticmethod
+    def version(municipio=None):
+        """Versión de los indicadores del municipio (0 si nunca se guardaron)"""
+        fila = StorageCota.conexion().execute(
+            "SELECT version FROM versiones WHERE municipio = ? AND nombre = 'indicadores'",
+            (StorageCota._municipio(municipio),)
+        ).fetchone()
+        return fila[0] if fila else 0
+
+    @staticmethod
+    def valor_consolidado(fila):
+        """Valor representativo según la agregación del indicador (suma, promedio o último)"""
+        agregacion = ConfigCota.INDICADORES.get(fila["indicador"], {}).get("agregacion", "suma")
+        return fila[agregacion]
+
+    @classmethod
+    def obtener(cls, año, periodo="A", dependencia=None, indicador=None, municipio=None):
+        """Consolidados de un período: [{dependencia, indicador, suma, ..., valor}]"""
+        sql = "SELECT * FROM agregados WHERE municipio = ? AND año = ? AND periodo = ?"
+        parametros = [StorageCota._municipio(municipio), int(año), periodo]
+        if dependencia is not None:
+            sql += " AND dependencia = ?"
+            parametros.append(dependencia)
+        if indicador is not None:
+            sql += " AND indicador = ?"
+            parametros.append(indicador)
+
+        filas = []
+        for fila in StorageCota.conexion().execute(sql + " ORDER BY dependencia, indicador", parametros):
+            fila = dict(fila)
+            fila["valor"] = StorageCota._valor(cls.valor_consolidado(fila))
+            filas.append(fila)
+        return filas
+
+    @classmethod
+    def totales(cls, año, periodo="A", municipio=None):
+        """{dependencia: {indicador: valor}} de un período"""
+        totales = {}
+        for fila in cls.obtener(año, periodo, municipio=municipio):
+            totales.setdefault(fila["dependencia"], {})[fila["indicador"]] = fila["valor"]
+        return totales
+
+
+# Instancia global de agregados
+aggregates = AgregadosCota()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reconstruye los consolidados desde la tabla de indicadores")
+    parser.add_argument("--año", type=int, help="Solo este año (por defecto, todo el historial)")
+    args = parser.parse_args()
+
+    procesados = AgregadosCota.reconstruir(args.año)
+    print(f"✅ Consolidados reconstruidos para {procesados} combinaciones dependencia-año")
@@ -0,0 +1,169 @@
+"""
+ANALÍTICA DE INDICADORES VS. METAS - ALCALDÍA DE COTA
+"""
+import numpy as np
+from .config import ConfigCota
+from .storage import StorageCota
+
+
+class HistorialIndicadores:
+    """Historial de indicadores en forma columnar
+
+    valores[d, p, i] es el valor del indicador i de la dependencia d en el
+    período p (NaN si no se capturó). Los períodos son consecutivos y se
+    codifican como año * 12 + (mes - 1).
+    """
+
+    def __init__(self, dependencias, periodos, indicadores, valores, metas, tipos):
+        self.dependencias = tuple(dependencias)
+        self.periodos = periodos
+        self.indicadores = tuple(indicadores)
+        self.valores = valores
+        self.metas = metas
+        self.tipos = tipos
+        self._dependencia_idx = {d: n for n, d in enumerate(self.dependencias)}
+        self._indicador_idx = {i: n for n, i in enumerate(self.indicadores)}
+
+    @property
+    def vacio(self):
+        return self.valores.size == 0
+
+    def indice_periodo(self, año, mes):
+        """Posición de un período en el eje de tiempo (None si está fuera de rango)"""
+        if self.vacio:
+            return None
+        posicion = int(año) * 12 + StorageCota.numero_mes(mes) - 1 - int(self.periodos[0])
+        return posicion if 0 <= posicion < len(self.periodos) else None
+
+    def calcular(self, ventana=3):
+        """Calcula todas las métricas para todas las dependencias en una sola pasada"""
+        valores = self.valores
+        if self.vacio:
+            vacio = np.empty_like(valores)
+            return {clave: vacio for clave in
+                    ("valores", "porcentaje_meta", "variacion_mensual", "media_movil", "acumulado_anual")}
+
+        presentes = ~np.isnan(valores)
+        ceros = np.where(presentes, valores, 0.0)
+
+        # Acumulado del año: suma acumulada menos la suma hasta el cierre del año anterior
+        acumulado = np.cumsum(ceros, axis=1)
+        inicio_año = np.searchsorted(self.periodos, (self.periodos // 12) * 12)
+        base = np.where(
+            (inicio_año > 0)[None, :, None],
+            acumulado[:, np.maximum(inicio_año - 1, 0), :],
+            0.0
+        )
+        acumulado_anual = acumulado - base
+
+        # Variación frente al mes anterior
+        variacion = np.full_like(valores, np.nan)
+        variacion[:, 1:, :] = valores[:, 1:, :] - valores[:, :-1, :]
+
+        # Media móvil sobre los meses con dato dentro de la ventana
+        cuenta = np.cumsum(presentes, axis=1)
+        suma_ventana = acumulado.copy()
+        cuenta_ventana = cuenta.copy()
+        suma_ventana[:, ventana:, :] -= acumulado[:, :-ventana, :]
+        cuenta_ventana[:, ventana:, :] -= cuenta[:, :-ventana, :]
+
+        # Porcentaje de meta: las metas anuales se comparan con el acumulado
+        anual = (self.tipos == "anual")[None, None, :]
+        comparado = np.where(anual, acumulado_anual, valores)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media_movil = np.where(cuenta_ventana > 0, suma_ventana / cuenta_ventana, np.nan)
+            porcentaje = np.where(presentes, comparado / self.metas[None, None, :] * 100.0, np.nan)
+
+        return {
+            "valores": valores,
+            "porcentaje_meta": porcentaje,
+            "variacion_mensual": variacion,
+            "media_movil": media_movil,
+            "acumulado_anual": np.where(presentes, acumulado_anual, np.nan),
+        }
+
+    def resumen_periodo(self, año, mes, metricas=None):
+        """{dependencia: {indicador: {métrica: valor}}} para un período"""
+        posicion = self.indice_periodo(año, mes)
+        if posicion is None:
+            return {}
+        metricas = metricas if metricas is not None else self.calcular()
+        corte = {nombre: matriz[:, posicion, :] for nombre, matriz in metricas.items()}
+
+        resumen = {}
+        for d, dependencia in enumerate(self.dependencias):
+            if np.isnan(corte["valores"][d]).all():
+                continue
+            resumen[dependencia] = {
+                indicador: {nombre: self._escalar(matriz[d, i]) for nombre, matriz in corte.items()}
+                for i, indicador in enumerate(self.indicadores)
+            }
+        return resumen
+
+    def serie(self, dependencia, indicador, metrica="valores", metricas=None):
+        """Serie temporal de una dependencia e indicador"""
+        metricas = metricas if metricas is not None else self.calcular()
+        return metricas[metrica][self._dependencia_idx[dependencia], :, self._indicador_idx[indicador]]
+
+    @staticmethod
+    def _escalar(valor):
+        return None if np.isnan(valor) else float(valor)
+
+
+class AnaliticaCota:
+    """Carga el historial del almacén y lo compara contra indicadores_meta"""
+
+    @staticmethod
+    def metas(indicadores=None):
+        """Vector de metas (NaN si el indicador no tiene meta configurada)"""
+        indicadores_meta = ConfigCota.cargar_configuracion().get("indicadores_meta", {})
+        indicadores = indicadores or list(ConfigCota.INDICADORES)
+        metas = np.full(len(indicadores), np.nan)
+        for n, indicador in enumerate(indicadores):
+            ruta = ConfigCota.INDICADORES.get(indicador, {}).get("meta")
+            if ruta:
+                valor = indicadores_meta.get(ruta[0], {}).get(ruta[1])
+                if valor:
+                    metas[n] = float(valor)
+        return metas
+
+    @classmethod
+    def cargar_historial(cls, municipio=None, dependencias=None):
+        """Lee todos los indicadores capturados en una consulta y los ubica en un arreglo 3D"""
+        filas = StorageCota.conexion().execute(
+            "SELECT dependencia, año * 12 + mes - 1, indicador, valor FROM indicadores WHERE municipio = ?",
+            (StorageCota._municipio(municipio),)
+        ).fetchall()
+
+        indicadores = list(ConfigCota.INDICADORES)
+        indicadores += sorted({fila[2] for fila in filas} - set(indicadores))
+        dependencias = list(dependencias or ConfigCota.cargar_configuracion().get("dependencias_municipales", ()))
+        dependencias += sorted({fila[0] for fila in filas} - set(dependencias))
+        tipos = np.array([ConfigCota.INDICADORES.get(i, {}).get("tipo", "mensual") for i in indicadores])
+        metas = cls.metas(indicadores)
+
+        if not filas:
+            return HistorialIndicadores(dependencias, np.arange(0), indicadores,
+                                        np.empty((len(dependencias), 0, len(indicadores))), metas, tipos)
+
+        dependencia_idx = {d: n for n, d in enumerate(dependencias)}
+        indicador_idx = {i: n for n, i in enumerate(indicadores)}
+        d = np.fromiter((dependencia_idx[f[0]] for f in filas), dtype=np.int64, count=len(filas))
+        p = np.fromiter((f[1] for f in filas), dtype=np.int64, count=len(filas))
+        i = np.fromiter((indicador_idx[f[2]] for f in filas), dtype=np.int64, count=len(filas))
+        v = np.fromiter((np.nan if f[3] is None else f[3] for f in filas), dtype=np.float64, count=len(filas))
+
+        periodos = np.arange(p.min(), p.max() + 1)
+        valores = np.full((len(dependencias), len(periodos), len(indicadores)), np.nan)
+        valores[d, p - periodos[0], i] = v
+        return HistorialIndicadores(dependencias, periodos, indicadores, valores, metas, tipos)
+
+    @classmethod
+    def cumplimiento(cls, año, mes, municipio=None):
+        """Atajo: métricas de todas las dependencias para un período"""
+        return cls.cargar_historial(municipio).resumen_periodo(año, mes)
+
+
+# Instancia global de analítica
+analytics = AnaliticaCota()
@@ -0,0 +1,204 @@
+"""
+ARCHIVO DE INFORMES DIRECCIONADO POR CONTENIDO - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.archive --verificar [--hilos 8]
+"""
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from .atomic import EscrituraCota
+from .config import ConfigCota
+from .metrics import medir
+from .storage import StorageCota
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS manifiesto (
+    municipio TEXT NOT NULL,
+    año INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    tipo TEXT NOT NULL,
+    dependencia TEXT NOT NULL DEFAULT '',
+    digest TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    ruta TEXT,
+    creado TEXT NOT NULL,
+    PRIMARY KEY (municipio, año, mes, tipo, dependencia, digest)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_manifiesto_digest ON manifiesto (digest);
+"""
+StorageCota.registrar_esquema(ESQUEMA)
+
+TAMANO_BLOQUE = 1024 * 1024
+
+
+class ArchivoCota:
+    """Cada informe se guarda una sola vez bajo su SHA-256 (reports/archivo/ab/abcdef...)
+
+    El manifiesto (tabla 'manifiesto' del almacén) relaciona (año, mes, tipo,
+    dependencia) con los digest archivados.
+    """
+
+    @staticmethod
+    def directorio():
+        return ConfigCota.obtener_ruta("reports") / "archivo"
+
+    @classmethod
+    def ruta_objeto(cls, digest):
+        return cls.directorio() / digest[:2] / digest
+
+    @staticmethod
+    @medir("archivo.digest_texto")
+    def digest_texto(texto):
+        """SHA-256 del texto codificado en UTF-8"""
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def digest_archivo(ruta, tamano_bloque=TAMANO_BLOQUE):
+        """SHA-256 de un archivo leído por bloques (memoria constante)"""
+        sha = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(tamano_bloque), b""):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    @classmethod
+    def buscar(cls, año, mes, digest, tipo="mensual", dependencia=None, municipio=None):
+        """Entrada del manifiesto para un contenido ya archivado en ese período (o None)"""
+        fila = StorageCota.conexion().execute(
+            """SELECT * FROM manifiesto WHERE municipio = ? AND año = ? AND mes = ? AND tipo = ?
+                   AND dependencia = ? AND digest = ?""",
+            (StorageCota._municipio(municipio), int(año), StorageCota.numero_mes(mes), tipo,
+             dependencia or "", digest)
+        ).fetchone()
+        return dict(fila) if fila else None
+
+    @classmethod
+    def digests(cls, año, mes=None, tipo=None, dependencia=None, municipio=None):
+        """Digests archivados para un período (orden cronológico)"""
+        sql = "SELECT * FROM manifiesto WHERE municipio = ? AND año = ?"
+        parametros = [StorageCota._municipio(municipio), int(año)]
+        for columna, valor in (("mes", mes), ("tipo", tipo), ("dependencia", dependencia)):
+            if valor is not None:
+                sql += f" AND {columna} = ?"
+                parametros.append(StorageCota.numero_mes(valor) if columna == "mes" else valor)
+        return [dict(f) for f in StorageCota.conexion().execute(sql + " ORDER BY creado", parametros)]
+
+    @classmethod
+    @medir("archivo.archivar")
+    def archivar(cls, flujo):
+        """Copia un flujo binario al archivo calculando el SHA-256 al vuelo; devuelve (digest, tamaño)"""
+        sha = hashlib.sha256()
+        tamano = 0
+        with EscrituraCota.temporal(cls.directorio(), ".entrante_") as (destino, temporal):
+            for bloque in iter(lambda: flujo.read(TAMANO_BLOQUE), b""):
+                sha.update(bloque)
+                destino.write(bloque)
+                tamano += len(bloque)
+            digest = sha.hexdigest()
+            objeto = cls.ruta_objeto(digest)
+            if not objeto.exists():
+                EscrituraCota.sincronizar(destino)
+                destino.close()
+                objeto.parent.mkdir(exist_ok=True)
+                EscrituraCota.reemplazar(temporal, objeto)
+        return digest, tamano
+
+    @classmethod
+    def registrar(cls, digest, tamano, año, mes, tipo="mensual", dependencia=None, ruta=None, municipio=None):
+        """Agrega la entrada al manifiesto"""
+        with StorageCota.transaccion() as conn:
+            conn.execute(
+                """INSERT OR IGNORE INTO manifiesto (municipio, año, mes, tipo, dependencia, digest,
+                                                     tamano, ruta, creado)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (StorageCota._municipio(municipio), int(año), StorageCota.numero_mes(mes), tipo,
+                 dependencia or "", digest, tamano, ruta, datetime.now().isoformat(timespec="seconds"))
+            )
+
+    @classmethod
+    def publicar(cls, digest, ruta):
+        """Expone el objeto en la ruta legible (enlace duro; copia si no es posible)
+
+        Nunca sobrescribe: si la ruta existe lanza FileExistsError, porque
+        escribir sobre un enlace duro modificaría otro objeto del archivo.
+        La copia se escribe aparte y se publica completa.
+        """
+        ruta = Path(ruta)
+        objeto = cls.ruta_objeto(digest)
+        try:
+            os.link(objeto, ruta)
+        except FileExistsError:
+            raise
+        except OSError:
+            import shutil
+            with open(objeto, "rb") as origen, EscrituraCota.atomica(ruta, sobrescribir=False) as destino:
+                shutil.copyfileobj(origen, destino, TAMANO_BLOQUE)
+
+    # ============================================
+    # VERIFICACIÓN DE INTEGRIDAD
+    # ============================================
+    @classmethod
+    def verificar(cls, hilos=None):
+        """Recalcula en paralelo el SHA-256 de todos los objetos; devuelve un resumen"""
+        from concurrent.futures import ThreadPoolExecutor
+        directorio = cls.directorio()
+        objetos = [r for r in directorio.glob("??/*") if r.is_file()] if directorio.exists() else []
+
+        def revisar(ruta):
+            try:
+                return ruta, cls.digest_archivo(ruta) == ruta.name, ruta.stat().st_size
+            except OSError:
+                return ruta, False, 0
+
+        inicio = time.perf_counter()
+        corruptos = []
+        total_bytes = 0
+        with ThreadPoolExecutor(max_workers=hilos or min(32, (os.cpu_count() or 1) * 2)) as pool:
+            for ruta, correcto, tamano in pool.map(revisar, objetos):
+                total_bytes += tamano
+                if not correcto:
+                    corruptos.append(str(ruta))
+
+        presentes = {r.name for r in objetos}
+        faltantes = sorted({
+            fila["digest"] for fila in StorageCota.conexion().execute("SELECT DISTINCT digest FROM manifiesto")
+        } - presentes)
+
+        return {
+            "objetos": len(objetos),
+            "bytes": total_bytes,
+            "corruptos": corruptos,
+            "faltantes": faltantes,
+            "segundos": round(time.perf_counter() - inicio, 3),
+        }
+
+
+# Instancia global del archivo
+archive = ArchivoCota()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Archivo de informes direccionado por contenido")
+    parser.add_argument("--verificar", action="store_true", help="Verifica la integridad de todo el archivo")
+    parser.add_argument("--hilos", type=int, help="Hilos de verificación")
+    args = parser.parse_args()
+
+    if not args.verificar:
+        parser.print_help()
+        sys.exit(0)
+
+    resumen = ArchivoCota.verificar(args.hilos)
+    megabytes = resumen["bytes"] / (1024 * 1024)
+    print(f"🔍 {resumen['objetos']} objetos ({megabytes:.1f} MB) verificados en {resumen['segundos']} s")
+    for ruta in resumen["corruptos"]:
+        print(f"❌ Corrupto: {ruta}")
+    for digest in resumen["faltantes"]:
+        print(f"❌ Falta el objeto: {digest}")
+    if resumen["corruptos"] or resumen["faltantes"]:
+        sys.exit(1)
+    print("✅ Archivo íntegro")
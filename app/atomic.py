@@ -0,0 +1,215 @@
+"""
+ESCRITURA ATÓMICA Y BLOQUEOS POR PERÍODO - ALCALDÍA DE COTA
+
+Uso:
+    with EscrituraCota.atomica(ruta) as f:
+        f.write(datos)
+
+    with EscrituraCota.bloqueo_periodo(2024, 3, "Secretaría General"):
+        ...
+
+Un archivo escrito con atomica() aparece completo o no aparece: se escribe
+en un temporal del mismo directorio, se sincroniza con fsync y se renombra
+sobre el destino. Los bloqueos por período sirven entre hilos y entre
+procesos (lotes), sin frenar la escritura de períodos distintos.
+"""
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+from .config import ConfigCota
+from .storage import StorageCota
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class EscrituraCota:
+    """Temporal + fsync + os.replace, y bloqueos de archivo por clave"""
+
+    # COTA_FSYNC=0 omite fsync (más rápido, pero un corte de luz puede perder lo último escrito)
+    SINCRONIZAR = os.environ.get("COTA_FSYNC", "1").lower() not in ("0", "false", "no")
+    ESPERA_BLOQUEO = 30.0
+
+    _locks = {}
+    _lock = threading.Lock()
+
+    # ============================================
+    # ESCRITURA ATÓMICA
+    # ============================================
+    @classmethod
+    def sincronizar(cls, archivo):
+        """Vacía el búfer y fuerza los datos al disco"""
+        archivo.flush()
+        if cls.SINCRONIZAR:
+            os.fsync(archivo.fileno())
+
+    @classmethod
+    def sincronizar_directorio(cls, directorio):
+        """Persiste la entrada del directorio tras un rename (no aplica en Windows)"""
+        if not cls.SINCRONIZAR or not hasattr(os, "O_DIRECTORY"):
+            return
+        descriptor = os.open(directorio, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    @classmethod
+    def reemplazar(cls, temporal, ruta):
+        """Mueve un temporal ya sincronizado a su destino (sobrescribe de forma atómica)"""
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, ruta)
+        cls.sincronizar_directorio(Path(ruta).parent)
+
+    @classmethod
+    def publicar(cls, temporal, ruta):
+        """Como reemplazar(), pero sin sobrescribir: FileExistsError si la ruta existe
+
+        Con enlaces duros la comprobación es atómica; en sistemas de archivos
+        sin ellos el llamador debe tener el bloqueo del período.
+        """
+        os.chmod(temporal, 0o644)
+        try:
+            os.link(temporal, ruta)
+        except FileExistsError:
+            raise
+        except OSError:
+            if os.path.lexists(ruta):
+                raise FileExistsError(ruta)
+            os.replace(temporal, ruta)
+        else:
+            os.unlink(temporal)
+        cls.sincronizar_directorio(Path(ruta).parent)
+
+    @classmethod
+    @contextmanager
+    def temporal(cls, directorio, prefijo=".escribiendo_", modo="wb", encoding=None):
+        """Archivo temporal abierto en el directorio de destino: produce (archivo, ruta)
+
+        Se elimina si el bloque falla o si nadie lo movió a su destino.
+        """
+        import tempfile
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        descriptor, ruta = tempfile.mkstemp(dir=directorio, prefix=prefijo)
+        try:
+            with os.fdopen(descriptor, modo, encoding=encoding) as archivo:
+                yield archivo, ruta
+        finally:
+            if os.path.exists(ruta):
+                os.unlink(ruta)
+
+    @classmethod
+    @contextmanager
+    def atomica(cls, ruta, modo="wb", encoding=None, sobrescribir=True):
+        """Escribe ruta completa o no la toca (con sobrescribir=False, FileExistsError si existe)"""
+        ruta = Path(ruta)
+        if "b" not in modo and encoding is None:
+            encoding = "utf-8"
+        with cls.temporal(ruta.parent, f".{ruta.name}.", modo, encoding) as (archivo, temporal):
+            yield archivo
+            cls.sincronizar(archivo)
+            archivo.close()
+            (cls.reemplazar if sobrescribir else cls.publicar)(temporal, ruta)
+
+    @classmethod
+    def escribir(cls, ruta, datos, sobrescribir=True):
+        """Escritura atómica de un texto o bytes completos"""
+        modo = "wb" if isinstance(datos, (bytes, bytearray)) else "w"
+        with cls.atomica(ruta, modo, sobrescribir=sobrescribir) as archivo:
+            archivo.write(datos)
+        return Path(ruta)
+
+    # ============================================
+    # BLOQUEOS
+    # ============================================
+    @staticmethod
+    def directorio_bloqueos():
+        return ConfigCota.obtener_ruta("data") / ".bloqueos"
+
+    @staticmethod
+    def _nombre_bloqueo(clave):
+        texto = unicodedata.normalize("NFKD", "_".join(str(parte) for parte in clave))
+        legible = "".join(c if c.isalnum() else "_" for c in texto.encode("ascii", "ignore").decode("ascii"))
+        # El sufijo evita choques entre claves que se normalizan igual
+        return f"{legible[:80]}_{hashlib.sha1('|'.join(map(str, clave)).encode()).hexdigest()[:8]}.lock"
+
+    @classmethod
+    @contextmanager
+    def bloqueo(cls, *clave, espera=None):
+        """Exclusión mutua por clave entre hilos y procesos del mismo municipio
+
+        TimeoutError si no se obtiene en 'espera' segundos (ESPERA_BLOQUEO por defecto).
+        """
+        ruta = cls.directorio_bloqueos() / cls._nombre_bloqueo(clave)
+        limite = time.monotonic() + (cls.ESPERA_BLOQUEO if espera is None else espera)
+
+        # El lock del hilo se comparte mientras alguien lo usa o lo espera; luego se olvida
+        with cls._lock:
+            entrada = cls._locks.get(ruta)
+            if entrada is None:
+                entrada = cls._locks[ruta] = [threading.Lock(), 0]
+            entrada[1] += 1
+        lock = entrada[0]
+        try:
+            if not lock.acquire(timeout=max(limite - time.monotonic(), 0)):
+                raise TimeoutError(f"Bloqueo ocupado: {' / '.join(map(str, clave))}")
+            try:
+                # Un descriptor por uso: con miles de períodos no se acumulan archivos abiertos
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                descriptor = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    cls._bloquear_archivo(descriptor, limite, clave)
+                    try:
+                        yield
+                    finally:
+                        cls._liberar_archivo(descriptor)
+                finally:
+                    os.close(descriptor)
+            finally:
+                lock.release()
+        finally:
+            with cls._lock:
+                entrada[1] -= 1
+                if not entrada[1]:
+                    del cls._locks[ruta]
+
+    @classmethod
+    def bloqueo_periodo(cls, año, mes, dependencia=None, espera=None):
+        """Bloqueo de los informes de un (año, mes, dependencia)"""
+        return cls.bloqueo("informe", int(año), StorageCota.numero_mes(mes), dependencia or "", espera=espera)
+
+    @staticmethod
+    def _bloquear_archivo(descriptor, limite, clave):
+        pausa = 0.005
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(descriptor, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if time.monotonic() >= limite:
+                    raise TimeoutError(f"Bloqueo ocupado por otro proceso: {' / '.join(map(str, clave))}")
+                time.sleep(pausa)
+                pausa = min(pausa * 2, 0.1)
+
+    @staticmethod
+    def _liberar_archivo(descriptor):
+        if fcntl is not None:
+            fcntl.flock(descriptor, fcntl.LOCK_UN)
+        else:
+            os.lseek(descriptor, 0, os.SEEK_SET)
+            msvcrt.locking(descriptor, msvcrt.LK_UNLCK, 1)
+
+
+# Instancia global de escritura
+atomic = EscrituraCota()
@@ -0,0 +1,341 @@
+"""
+USUARIOS, ROLES Y LÍMITES DE USO - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.auth --agregar jperez --nombre "Juan Pérez" --rol editor --cargo Funcionario
+    python -m app.auth --clave jperez
+    python -m app.auth --desactivar jperez
+    python -m app.auth --listar
+
+Los usuarios están en config/usuarios.json:
+
+    {"usuarios": {"jperez": {"nombre": "Juan Pérez", "rol": "editor",
+                             "cargo": "Funcionario", "dependencia": "Oficina de Sistemas y TIC",
+                             "municipios": ["cota"], "activo": true,
+                             "clave": "pbkdf2_sha256$600000$<sal>$<hash>"}}}
+
+Sin usuarios (archivo vacío o inexistente) el acceso queda abierto, como
+antes. Las claves se guardan con PBKDF2-SHA256 (también se aceptan hashes
+scrypt$n$r$p$<sal>$<hash>); la derivación lenta se hace solo al ingresar:
+después la sesión se valida con un token en memoria.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from .atomic import EscrituraCota
+from .config import ConfigCota
+from .logger import logger
+
+# Permisos de cada rol
+ROLES = {
+    "administrador": frozenset({"generar", "importar", "tablero", "metricas"}),
+    "editor": frozenset({"generar", "importar", "tablero"}),
+    "consulta": frozenset({"tablero"}),
+}
+
+
+class ErrorAutenticacion(ValueError):
+    """Usuario o clave incorrectos, usuario inactivo o sin acceso al municipio"""
+
+
+class AutenticacionCota:
+    """Índice de usuarios en memoria, sesiones verificadas y límites por usuario
+
+    El índice se revalida con la firma (mtime, tamaño) de usuarios.json. Una
+    sesión guarda la huella del hash de la clave: si la clave cambia o el
+    usuario se desactiva, la sesión deja de valer en la siguiente validación.
+    """
+
+    ITERACIONES = 600_000
+    DURACION_SESION = float(os.environ.get("COTA_SESION_HORAS", "8")) * 3600
+    # acción: (máximo de eventos, ventana en segundos)
+    LIMITES = {
+        "informe": (int(os.environ.get("COTA_INFORMES_POR_MINUTO", "5")), 60),
+        "ingreso": (5, 300),
+    }
+    INTERVALO_PURGA = 60  # segundos entre limpiezas de los contadores vencidos
+
+    _indice = (None, {})
+    _hash_simulado = None
+    _sesiones = {}
+    _eventos = {}
+    _ultima_purga = 0.0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def ruta_usuarios():
+        return ConfigCota.CONFIG_DIR / "usuarios.json"
+
+    # ============================================
+    # ÍNDICE DE USUARIOS
+    # ============================================
+    @classmethod
+    def _leer_usuarios(cls):
+        ruta = cls.ruta_usuarios()
+        if not ruta.exists() or ruta.stat().st_size == 0:
+            return {}
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        usuarios = datos.get("usuarios", {}) if isinstance(datos, dict) else {}
+        return {cls.normalizar(usuario): dict(perfil, usuario=cls.normalizar(usuario))
+                for usuario, perfil in usuarios.items()}
+
+    @classmethod
+    def usuarios(cls):
+        """{usuario: perfil} de usuarios.json (se relee solo si cambió el archivo)"""
+        firma = ConfigCota._firma_archivo(cls.ruta_usuarios())
+        indice = cls._indice
+        if indice[0] == firma:
+            return indice[1]
+        with cls._lock:
+            if cls._indice[0] != firma:
+                cls._indice = (firma, cls._leer_usuarios())
+            return cls._indice[1]
+
+    @classmethod
+    def activa(cls):
+        """True si hay usuarios configurados (sin usuarios el acceso es abierto)"""
+        return bool(cls.usuarios())
+
+    @staticmethod
+    def normalizar(usuario):
+        return str(usuario or "").strip().lower()
+
+    @staticmethod
+    def permisos(perfil):
+        return ROLES.get(perfil.get("rol"), frozenset())
+
+    @classmethod
+    def puede(cls, perfil, permiso):
+        """Sin autenticación activa (perfil None) todo está permitido"""
+        return perfil is None or permiso in cls.permisos(perfil)
+
+    @staticmethod
+    def perfil_publico(perfil):
+        """Perfil sin el hash de la clave"""
+        return {clave: valor for clave, valor in perfil.items() if clave != "clave"}
+
+    # ============================================
+    # CLAVES
+    # ============================================
+    @classmethod
+    def hash_clave(cls, clave):
+        sal = secrets.token_bytes(16)
+        derivada = hashlib.pbkdf2_hmac("sha256", clave.encode("utf-8"), sal, cls.ITERACIONES)
+        return "$".join(("pbkdf2_sha256", str(cls.ITERACIONES), base64.b64encode(sal).decode(),
+                         base64.b64encode(derivada).decode()))
+
+    @staticmethod
+    def verificar_clave(clave, almacenado):
+        """Compara en tiempo constante; False si el hash no tiene un formato conocido"""
+        try:
+            algoritmo, *parametros, sal, esperado = str(almacenado).split("$")
+            sal, esperado = base64.b64decode(sal), base64.b64decode(esperado)
+            if algoritmo == "pbkdf2_sha256":
+                derivada = hashlib.pbkdf2_hmac("sha256", clave.encode("utf-8"), sal, int(parametros[0]))
+            elif algoritmo == "scrypt":
+                n, r, p = (int(v) for v in parametros)
+                derivada = hashlib.scrypt(clave.encode("utf-8"), salt=sal, n=n, r=r, p=p,
+                                          maxmem=256 * 1024 * 1024, dklen=len(esperado))
+            else:
+                return False
+        except (ValueError, IndexError):
+            return False
+        return hmac.compare_digest(derivada, esperado)
+
+    @classmethod
+    def _simulado(cls):
+        """Hash de una clave aleatoria para comparar cuando el usuario no existe (se crea al primer uso)"""
+        if cls._hash_simulado is None:
+            cls._hash_simulado = cls.hash_clave(secrets.token_urlsafe(16))
+        return cls._hash_simulado
+
+    @staticmethod
+    def _huella(perfil):
+        return hashlib.sha256(str(perfil.get("clave", "")).encode()).hexdigest()
+
+    # ============================================
+    # SESIONES
+    # ============================================
+    @classmethod
+    def ingresar(cls, usuario, clave, municipio=None, origen=None):
+        """Verifica la clave y abre una sesión; devuelve el token
+
+        ErrorAutenticacion con un mensaje que no distingue usuario inexistente
+        de clave incorrecta. Los intentos fallidos cuentan en el límite 'ingreso'
+        por usuario y origen (equipo o sesión): quien falla desde otro equipo
+        no bloquea al titular de la cuenta.
+        """
+        usuario = cls.normalizar(usuario)
+        intento = (usuario, origen)
+        espera = cls.espera(intento, "ingreso", registrar=False)
+        if espera:
+            raise ErrorAutenticacion(f"Demasiados intentos fallidos; espere {espera} s")
+        perfil = cls.usuarios().get(usuario)
+        municipio = municipio or ConfigCota.municipio_actual()
+        # Un usuario inexistente también paga la derivación: el tiempo no lo delata
+        valido = cls.verificar_clave(clave, perfil.get("clave", "") if perfil else cls._simulado())
+        if not (valido and perfil and cls._habilitado(perfil, municipio)):
+            cls.espera(intento, "ingreso")
+            logger.registrar(f"Ingreso rechazado: {usuario or '(vacío)'} desde {origen or '(desconocido)'}", "WARNING")
+            raise ErrorAutenticacion("Usuario o clave incorrectos")
+
+        token = secrets.token_urlsafe(32)
+        with cls._lock:
+            ahora = time.monotonic()
+            # Se aprovecha para olvidar las sesiones vencidas
+            for vencido in [t for t, s in cls._sesiones.items() if s[3] < ahora]:
+                del cls._sesiones[vencido]
+            cls._sesiones[token] = (usuario, municipio, cls._huella(perfil), ahora + cls.DURACION_SESION)
+            cls._eventos.pop((intento, "ingreso"), None)
+        logger.registrar(f"Ingreso: {usuario} ({perfil.get('rol')}) en {municipio}")
+        return token
+
+    @staticmethod
+    def _habilitado(perfil, municipio):
+        municipios = perfil.get("municipios")
+        return perfil.get("activo", True) and (not municipios or municipio in municipios)
+
+    @classmethod
+    def sesion(cls, token, municipio=None):
+        """Perfil (sin hash) de una sesión válida, o None; no repite la derivación de la clave"""
+        if not token:
+            return None
+        entrada = cls._sesiones.get(token)
+        if entrada is None:
+            return None
+        usuario, municipio_sesion, huella, expira = entrada
+        perfil = cls.usuarios().get(usuario)
+        if (time.monotonic() > expira or perfil is None or cls._huella(perfil) != huella
+                or municipio_sesion != (municipio or ConfigCota.municipio_actual())
+                or not cls._habilitado(perfil, municipio_sesion)):
+            cls.salir(token)
+            return None
+        return cls.perfil_publico(perfil)
+
+    @classmethod
+    def salir(cls, token):
+        with cls._lock:
+            entrada = cls._sesiones.pop(token, None)
+        if entrada:
+            logger.registrar(f"Salida: {entrada[0]}")
+
+    # ============================================
+    # LÍMITES DE USO
+    # ============================================
+    @classmethod
+    def espera(cls, clave, accion, registrar=True):
+        """Segundos que 'clave' debe esperar para 'accion' (0 si puede hacerlo ya)
+
+        Ventana deslizante en memoria del proceso. Con registrar=True, si está
+        permitido el evento se cuenta.
+        """
+        maximo, ventana = cls.LIMITES[accion]
+        with cls._lock:
+            ahora = time.monotonic()
+            if ahora - cls._ultima_purga > cls.INTERVALO_PURGA:
+                cls._purgar_eventos(ahora)
+            eventos = cls._eventos.get((clave, accion))
+            while eventos and eventos[0] <= ahora - ventana:
+                eventos.popleft()
+            if eventos and len(eventos) >= maximo:
+                return max(1, int(eventos[0] + ventana - ahora + 0.999))
+            if registrar:
+                cls._eventos.setdefault((clave, accion), deque()).append(ahora)
+            elif eventos is not None and not eventos:
+                del cls._eventos[(clave, accion)]
+            return 0
+
+    @classmethod
+    def _purgar_eventos(cls, ahora):
+        """Olvida las claves sin eventos dentro de su ventana (llamar con _lock tomado)
+
+        Sin esto, cada nombre de usuario probado dejaría su cola en memoria.
+        """
+        for clave, accion in list(cls._eventos):
+            eventos = cls._eventos[(clave, accion)]
+            if not eventos or eventos[-1] <= ahora - cls.LIMITES[accion][1]:
+                del cls._eventos[(clave, accion)]
+        cls._ultima_purga = ahora
+
+    # ============================================
+    # ADMINISTRACIÓN (CLI)
+    # ============================================
+    @classmethod
+    def guardar_usuario(cls, usuario, **cambios):
+        """Crea o actualiza un usuario en usuarios.json (escritura atómica); devuelve el perfil"""
+        usuario = cls.normalizar(usuario)
+        if not usuario:
+            raise ValueError("El nombre de usuario no puede estar vacío")
+        if "rol" in cambios and cambios["rol"] not in ROLES:
+            raise ValueError(f"Rol desconocido: {cambios['rol']} (use {', '.join(ROLES)})")
+        ruta = cls.ruta_usuarios()
+        with EscrituraCota.bloqueo("usuarios"):
+            datos = {"usuarios": {}}
+            if ruta.exists() and ruta.stat().st_size:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    datos = json.load(f)
+            perfil = datos.setdefault("usuarios", {}).setdefault(usuario, {"rol": "editor", "activo": True})
+            perfil.update({clave: valor for clave, valor in cambios.items() if valor is not None})
+            EscrituraCota.escribir(ruta, json.dumps(datos, ensure_ascii=False, indent=2) + "\n")
+        return dict(perfil, usuario=usuario)
+
+
+# Instancia global de autenticación
+auth = AutenticacionCota()
+
+
+if __name__ == "__main__":
+    import argparse
+    import getpass
+    parser = argparse.ArgumentParser(description="Administración de usuarios (config/usuarios.json)")
+    accion = parser.add_mutually_exclusive_group(required=True)
+    accion.add_argument("--agregar", metavar="USUARIO", help="Crea o actualiza un usuario")
+    accion.add_argument("--clave", metavar="USUARIO", help="Cambia la clave de un usuario")
+    accion.add_argument("--desactivar", metavar="USUARIO", help="Impide el ingreso del usuario")
+    accion.add_argument("--listar", action="store_true", help="Muestra los usuarios configurados")
+    parser.add_argument("--nombre", help="Nombre completo (aparece como responsable del informe)")
+    parser.add_argument("--rol", choices=list(ROLES))
+    parser.add_argument("--cargo")
+    parser.add_argument("--dependencia")
+    parser.add_argument("--municipios", nargs="+", help="Municipios a los que tiene acceso (por defecto todos)")
+    args = parser.parse_args()
+
+    def pedir_clave():
+        clave = getpass.getpass("Clave: ")
+        if len(clave) < 8:
+            sys.exit("❌ La clave debe tener al menos 8 caracteres")
+        if getpass.getpass("Repita la clave: ") != clave:
+            sys.exit("❌ Las claves no coinciden")
+        return AutenticacionCota.hash_clave(clave)
+
+    if args.listar:
+        for usuario, perfil in sorted(AutenticacionCota.usuarios().items()):
+            estado = "activo" if perfil.get("activo", True) else "inactivo"
+            print(f"👤 {usuario:<15} {perfil.get('rol', ''):<13} {estado:<8} {perfil.get('nombre', '')}"
+                  f" · {perfil.get('cargo', '')} · {', '.join(perfil.get('municipios') or ['todos'])}")
+        sys.exit(0)
+
+    try:
+        if args.agregar:
+            nuevo = AutenticacionCota.normalizar(args.agregar) not in AutenticacionCota.usuarios()
+            perfil = AutenticacionCota.guardar_usuario(
+                args.agregar, nombre=args.nombre, rol=args.rol, cargo=args.cargo, dependencia=args.dependencia,
+                municipios=args.municipios, clave=pedir_clave() if nuevo else None
+            )
+        elif AutenticacionCota.normalizar(args.clave or args.desactivar) not in AutenticacionCota.usuarios():
+            raise ValueError(f"Usuario no configurado: {args.clave or args.desactivar}")
+        elif args.clave:
+            perfil = AutenticacionCota.guardar_usuario(args.clave, clave=pedir_clave())
+        else:
+            perfil = AutenticacionCota.guardar_usuario(args.desactivar, activo=False)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    print(f"✅ Usuario {perfil['usuario']} guardado en {AutenticacionCota.ruta_usuarios()}")
@@ -0,0 +1,252 @@
+"""
+RESPALDOS INCREMENTALES COMPRIMIDOS - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.backup
+    python -m app.backup --completo
+    python -m app.backup --restaurar /ruta/destino [--manifiesto respaldo_20240301_013000.json]
+
+Cada respaldo es un ZIP (respaldos/respaldo_AAAAMMDD_HHMMSS.zip) con solo
+los archivos nuevos o modificados de config, data y reports de todos los
+municipios. El manifiesto (respaldos/manifiesto.json, y una copia por
+respaldo) indica en qué ZIP está la versión vigente de cada archivo, así
+que restaurar lee únicamente el último manifiesto. Un contenido repetido
+(por ejemplo, los enlaces duros de reports/archivo) se guarda una sola vez.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from .atomic import EscrituraCota
+from .config import ConfigCota
+
+TAMANO_BLOQUE = 1024 * 1024
+
+# Cachés que se regeneran solas y archivos de trabajo que no se respaldan
+DIRECTORIOS_EXCLUIDOS = {".bloqueos", "series", "exportados", "__pycache__"}
+SUFIJOS_EXCLUIDOS = ("-wal", "-shm", "-journal", ".lock")
+
+# Formatos ya comprimidos: se guardan sin volver a comprimir
+SIN_COMPRESION = {".zip", ".docx", ".xlsx", ".xlsm", ".pdf", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".npz", ".gz"}
+
+
+class RespaldoCota:
+    """Respaldos incrementales (por mtime y tamaño, deduplicados por SHA-256) en ZIP"""
+
+    NOMBRE_MANIFIESTO = "manifiesto.json"
+
+    @staticmethod
+    def directorio():
+        return Path(os.environ.get("COTA_RESPALDOS_DIR") or ConfigCota.BASE_DIR / "respaldos").expanduser()
+
+    @classmethod
+    def origenes(cls):
+        """(prefijo en el respaldo, carpeta): la configuración y data/reports de cada municipio"""
+        origenes = [("config", ConfigCota.CONFIG_DIR)]
+        for municipio in ConfigCota.municipios():
+            data_dir, reports_dir = ConfigCota.directorios_municipio(municipio)
+            origenes += [(f"{municipio}/data", data_dir), (f"{municipio}/reports", reports_dir)]
+        return origenes
+
+    @staticmethod
+    def _excluido(ruta):
+        nombre = ruta.name
+        return nombre.startswith(".") or nombre.endswith(SUFIJOS_EXCLUIDOS)
+
+    @classmethod
+    def archivos(cls):
+        """Genera (nombre en el respaldo, ruta) de todos los archivos a respaldar"""
+        for prefijo, carpeta in cls.origenes():
+            if not carpeta.is_dir():
+                continue
+            for raiz, directorios, archivos in os.walk(carpeta):
+                directorios[:] = sorted(d for d in directorios
+                                        if d not in DIRECTORIOS_EXCLUIDOS and not d.startswith("."))
+                for nombre in sorted(archivos):
+                    ruta = Path(raiz) / nombre
+                    if not cls._excluido(ruta):
+                        yield f"{prefijo}/{ruta.relative_to(carpeta).as_posix()}", ruta
+
+    @staticmethod
+    def _firma(ruta):
+        """(mtime_ns, tamaño); en SQLite cuenta también el WAL, donde quedan los cambios recientes"""
+        estado = ruta.stat()
+        mtime, tamano = estado.st_mtime_ns, estado.st_size
+        wal = ruta.with_name(ruta.name + "-wal")
+        if ruta.suffix == ".db" and wal.exists():
+            estado_wal = wal.stat()
+            mtime, tamano = max(mtime, estado_wal.st_mtime_ns), tamano + estado_wal.st_size
+        return mtime, tamano
+
+    @staticmethod
+    def _digest(ruta):
+        sha = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b""):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _copia_sqlite(ruta, destino):
+        """Copia consistente de una base en uso (API de backup de SQLite, no una copia del archivo)"""
+        origen = sqlite3.connect(f"{ruta.resolve().as_uri()}?mode=ro", uri=True, timeout=30)
+        copia = sqlite3.connect(destino)
+        try:
+            origen.backup(copia)
+        finally:
+            copia.close()
+            origen.close()
+
+    @classmethod
+    def cargar_manifiesto(cls, ruta=None):
+        ruta = Path(ruta) if ruta else cls.directorio() / cls.NOMBRE_MANIFIESTO
+        if not ruta.exists():
+            return {"archivos": {}}
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def respaldar(cls, completo=False):
+        """Crea el respaldo incremental; devuelve un resumen
+
+        Con completo=True ignora el manifiesto anterior y guarda todo (inicia
+        una nueva cadena de respaldos).
+        """
+        inicio = time.perf_counter()
+        directorio = cls.directorio()
+        directorio.mkdir(parents=True, exist_ok=True)
+        anterior = {} if completo else cls.cargar_manifiesto()["archivos"]
+        # Contenido ya respaldado: digest -> ubicación (para no repetir enlaces duros o copias)
+        ubicaciones = {entrada["digest"]: entrada for entrada in anterior.values()}
+
+        marca = segundo = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Dos respaldos en el mismo segundo (por ejemplo, uno manual y el programado) se numeran
+        numero = 1
+        while (directorio / f"respaldo_{marca}.zip").exists():
+            numero += 1
+            marca = f"{segundo}_{numero}"
+        nombre_zip = f"respaldo_{marca}.zip"
+        archivos = {}
+        resumen = {"respaldo": None, "archivos": 0, "nuevos": 0, "repetidos": 0, "sin_cambios": 0,
+                   "eliminados": 0, "bytes": 0, "bytes_comprimidos": 0}
+
+        with EscrituraCota.temporal(directorio, ".respaldo_") as (destino, temporal):
+            with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as paquete:
+                for nombre, ruta in cls.archivos():
+                    try:
+                        mtime, tamano = cls._firma(ruta)
+                    except FileNotFoundError:
+                        continue
+                    previa = anterior.get(nombre)
+                    if previa and (previa["mtime_ns"], previa["tamano"]) == (mtime, tamano):
+                        archivos[nombre] = previa
+                        resumen["sin_cambios"] += 1
+                        continue
+
+                    if ruta.suffix == ".db":
+                        with EscrituraCota.temporal(directorio, ".sqlite_") as (copia, ruta_copia):
+                            copia.close()
+                            cls._copia_sqlite(ruta, ruta_copia)
+                            entrada = cls._agregar(paquete, nombre, Path(ruta_copia), ubicaciones, nombre_zip)
+                    else:
+                        entrada = cls._agregar(paquete, nombre, ruta, ubicaciones, nombre_zip)
+                    entrada.update(mtime_ns=mtime, tamano=tamano)
+                    archivos[nombre] = entrada
+                    if entrada["respaldo"] == nombre_zip and entrada["miembro"] == nombre:
+                        informacion = paquete.getinfo(nombre)
+                        resumen["nuevos"] += 1
+                        resumen["bytes"] += informacion.file_size
+                        resumen["bytes_comprimidos"] += informacion.compress_size
+                    else:
+                        resumen["repetidos"] += 1
+
+                manifiesto = {
+                    "creado": datetime.now().isoformat(timespec="seconds"),
+                    "respaldo": nombre_zip if resumen["nuevos"] else None,
+                    "archivos": archivos,
+                }
+                if resumen["nuevos"]:
+                    paquete.writestr(cls.NOMBRE_MANIFIESTO, json.dumps(manifiesto, ensure_ascii=False))
+            # Sin archivos nuevos no se publica el ZIP (el temporal se descarta)
+            if resumen["nuevos"]:
+                EscrituraCota.sincronizar(destino)
+                destino.close()
+                EscrituraCota.publicar(temporal, directorio / nombre_zip)
+                resumen["respaldo"] = str(directorio / nombre_zip)
+
+        resumen["archivos"] = len(archivos)
+        resumen["eliminados"] = len(set(anterior) - set(archivos))
+        # El manifiesto se actualiza también si solo hubo eliminados o archivos tocados sin cambios
+        if archivos != anterior:
+            texto = json.dumps(manifiesto, ensure_ascii=False, indent=1)
+            if resumen["nuevos"]:
+                EscrituraCota.escribir(directorio / f"respaldo_{marca}.json", texto)
+            EscrituraCota.escribir(directorio / cls.NOMBRE_MANIFIESTO, texto)
+        resumen["segundos"] = round(time.perf_counter() - inicio, 3)
+        return resumen
+
+    @classmethod
+    def _agregar(cls, paquete, nombre, ruta, ubicaciones, nombre_zip):
+        """Agrega el archivo al ZIP si su contenido no está ya respaldado; devuelve su entrada"""
+        digest = cls._digest(ruta)
+        existente = ubicaciones.get(digest)
+        if existente:
+            return {"digest": digest, "respaldo": existente["respaldo"], "miembro": existente["miembro"]}
+        compresion = zipfile.ZIP_STORED if Path(nombre).suffix.lower() in SIN_COMPRESION else zipfile.ZIP_DEFLATED
+        paquete.write(ruta, nombre, compress_type=compresion)
+        entrada = {"digest": digest, "respaldo": nombre_zip, "miembro": nombre}
+        ubicaciones[digest] = entrada
+        return dict(entrada)
+
+    @classmethod
+    def restaurar(cls, destino, manifiesto=None):
+        """Reconstruye en 'destino' el estado del manifiesto (el último por defecto); devuelve cuántos archivos"""
+        destino = Path(destino)
+        # Los ZIP están junto al manifiesto
+        directorio = Path(manifiesto).parent if manifiesto else cls.directorio()
+        archivos = cls.cargar_manifiesto(manifiesto)["archivos"]
+        por_respaldo = {}
+        for nombre, entrada in archivos.items():
+            por_respaldo.setdefault(entrada["respaldo"], []).append((nombre, entrada))
+
+        for nombre_zip, entradas in por_respaldo.items():
+            with zipfile.ZipFile(directorio / nombre_zip) as paquete:
+                for nombre, entrada in entradas:
+                    ruta = destino / nombre
+                    ruta.parent.mkdir(parents=True, exist_ok=True)
+                    with paquete.open(entrada["miembro"]) as origen, EscrituraCota.atomica(ruta) as copia:
+                        for bloque in iter(lambda: origen.read(TAMANO_BLOQUE), b""):
+                            copia.write(bloque)
+        return len(archivos)
+
+
+# Instancia global de respaldos
+backup = RespaldoCota()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Respaldos incrementales comprimidos de config, data y reports")
+    parser.add_argument("--completo", action="store_true", help="Respalda todo, sin mirar el manifiesto anterior")
+    parser.add_argument("--restaurar", type=Path, metavar="DESTINO", help="Restaura el último estado en DESTINO")
+    parser.add_argument("--manifiesto", type=Path, help="Manifiesto a restaurar (por defecto el último)")
+    args = parser.parse_args()
+
+    if args.restaurar:
+        total = RespaldoCota.restaurar(args.restaurar, args.manifiesto)
+        print(f"✅ {total} archivos restaurados en {args.restaurar}")
+        sys.exit(0)
+
+    resumen = RespaldoCota.respaldar(args.completo)
+    if not resumen["nuevos"]:
+        print(f"✅ Sin archivos nuevos desde el último respaldo ({resumen['eliminados']} eliminados)")
+    else:
+        print(f"✅ Respaldo {resumen['respaldo']}: {resumen['nuevos']} archivos nuevos o modificados, "
+              f"{resumen['sin_cambios'] + resumen['repetidos']} sin cambios, {resumen['eliminados']} eliminados "
+              f"({resumen['bytes'] / 1024:,.0f} KB → {resumen['bytes_comprimidos'] / 1024:,.0f} KB, "
+              f"{resumen['segundos']} s)")
@@ -0,0 +1,134 @@
+"""
+GENERACIÓN DE INFORMES POR LOTES - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.batch --año 2024
+    python -m app.batch --año 2024 --meses 1 2 3 --dependencias "Secretaría General"
+    python -m app.batch --año 2024 --municipio chia
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from .archive import ArchivoCota
+from .config import ConfigCota
+from .logger import logger
+from .storage import StorageCota
+from .templates import TemplatesCota
+from .utils import UtilsCota
+
+RESPONSABLE_POR_DEFECTO = "INGENIERO DE SISTEMAS"
+CARGO_POR_DEFECTO = "Contrato de Prestación de Servicios"
+
+
+def generar_informe(dependencia, año, mes, tipo="mensual", forzar=False,
+                    responsable=RESPONSABLE_POR_DEFECTO, cargo=CARGO_POR_DEFECTO):
+    """Genera el informe de un período desde el almacén; devuelve (estado, detalle)"""
+    periodo = StorageCota.obtener_periodo(dependencia, año, mes)
+    if not periodo["indicadores"]:
+        return "sin_datos", None
+
+    # Datos del último informe capturado en la interfaz (actividades, responsable)
+    informe = periodo["informe"] or {}
+    nombre_mes = ConfigCota.MESES[StorageCota.numero_mes(mes) - 1]
+
+    # La fecha del informe es la de captura de los datos: el contenido (y su hash)
+    # solo cambia si cambian los datos, lo que permite reanudar lotes interrumpidos
+    capturado = datetime.fromisoformat(periodo["actualizado"])
+    contexto = TemplatesCota.construir_contexto(
+        ConfigCota.cargar_configuracion(), nombre_mes, año,
+        informe.get("responsable") or responsable, informe.get("cargo") or cargo,
+        informe.get("actividades", []), periodo["indicadores"],
+        fecha=capturado.strftime("%d/%m/%Y"), hora=capturado.strftime("%H:%M:%S"),
+        dependencia=dependencia
+    )
+    contenido = TemplatesCota.renderizar_informe(contexto)
+    digest = ArchivoCota.digest_texto(contenido)
+
+    if not forzar and ArchivoCota.buscar(año, mes, digest, tipo, dependencia):
+        return "omitido", None
+
+    ruta = UtilsCota.guardar_informe(
+        contenido, nombre_mes, año, tipo=tipo, dependencia=dependencia,
+        responsable=contexto["responsable"], cargo=contexto["cargo"],
+        actividades=contexto["actividades"]
+    )
+    return "generado", ruta
+
+
+def _tarea(argumentos):
+    """Punto de entrada de cada proceso del pool"""
+    dependencia, año, mes = argumentos[:3]
+    try:
+        return (dependencia, mes) + generar_informe(*argumentos)
+    except Exception as e:
+        return dependencia, mes, "error", str(e)
+    finally:
+        # Los procesos del pool terminan sin ejecutar atexit
+        logger.vaciar()
+
+
+def ejecutar_lote(año, meses=None, dependencias=None, tipo="mensual", forzar=False,
+                  procesos=None, salida=sys.stdout):
+    """Genera los informes de todas las dependencias y meses indicados"""
+    config = ConfigCota.cargar_configuracion()
+    meses = list(meses or range(1, 13))
+    dependencias = list(dependencias or config.get("dependencias_municipales", ()))
+    tareas = [(dependencia, año, mes, tipo, forzar) for dependencia in dependencias for mes in meses]
+
+    resumen = {"generado": 0, "omitido": 0, "sin_datos": 0, "error": 0}
+    inicio = time.perf_counter()
+
+    print(f"🚀 Generando {len(tareas)} informes ({len(dependencias)} dependencias × {len(meses)} meses)", file=salida)
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [pool.submit(_tarea, tarea) for tarea in tareas]
+        for numero, futuro in enumerate(as_completed(futuros), 1):
+            dependencia, mes, estado, detalle = futuro.result()
+            resumen[estado] += 1
+            simbolo = {"generado": "✓", "omitido": "↷", "sin_datos": "·", "error": "✗"}[estado]
+            linea = f"[{numero}/{len(tareas)}] {simbolo} {dependencia} - {ConfigCota.MESES[mes - 1]} {año}"
+            if detalle:
+                linea += f" ({detalle})"
+            print(linea, file=salida)
+
+    duracion = time.perf_counter() - inicio
+    resumen["segundos"] = round(duracion, 3)
+    resumen["informes_por_segundo"] = round(resumen["generado"] / duracion, 2) if duracion else 0.0
+
+    print("=" * 70, file=salida)
+    print(f"✅ Generados: {resumen['generado']}  ↷ Omitidos (sin cambios): {resumen['omitido']}  "
+          f"· Sin datos: {resumen['sin_datos']}  ✗ Errores: {resumen['error']}", file=salida)
+    print(f"⏱️  {resumen['segundos']} s - {resumen['informes_por_segundo']} informes/s", file=salida)
+    UtilsCota.registrar_log(
+        f"Lote {año}: {resumen['generado']} generados, {resumen['omitido']} omitidos, "
+        f"{resumen['error']} errores en {resumen['segundos']} s"
+    )
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera informes mensuales por lotes desde el almacén")
+    parser.add_argument("--año", type=int, default=datetime.now().year)
+    parser.add_argument("--meses", type=int, nargs="+", choices=range(1, 13), metavar="MES",
+                        help="Meses (1-12); por defecto todos")
+    parser.add_argument("--dependencias", nargs="+",
+                        help="Dependencias; por defecto todas las de cota.json")
+    parser.add_argument("--tipo", default="mensual")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(),
+                        help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--municipio", help="Municipio configurado (por defecto, COTA_MUNICIPIO o cota)")
+    parser.add_argument("--forzar", action="store_true",
+                        help="No omite informes ya archivados (vuelve a publicar los que se hayan borrado)")
+    args = parser.parse_args(argv)
+    if args.municipio:
+        # Los procesos del pool heredan el entorno
+        os.environ["COTA_MUNICIPIO"] = ConfigCota.seleccionar_municipio(args.municipio)
+
+    resumen = ejecutar_lote(args.año, args.meses, args.dependencias, args.tipo, args.forzar, args.procesos)
+    return 1 if resumen["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
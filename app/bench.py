@@ -0,0 +1,322 @@
+"""
+BENCHMARKS DE GENERACIÓN, PERSISTENCIA, TABLERO Y CONFIGURACIÓN - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.bench
+    python -m app.bench --años 5 --dependencias 12 --guardar linea_base.json
+    python -m app.bench --comparar linea_base.json --tolerancia 0.25
+
+Todo corre sin red sobre un directorio temporal con datos sintéticos
+(reproducibles con --semilla); los datos reales no se tocan. Sale con
+código 1 si --comparar encuentra regresiones.
+"""
+import argparse
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from .config import ConfigCota
+
+CATEGORIAS = ("Planificación", "Implementación", "Seguimiento", "Capacitación")
+ESTADOS = ("En ejecución", "Planificación", "Terminado")
+PRIORIDADES = ("Alta", "Media", "Baja")
+NIVELES = ("INFO", "INFO", "INFO", "WARNING", "ERROR")
+PERCENTILES = (50, 90, 95, 99)
+
+
+class GeneradorDatos:
+    """Datos sintéticos reproducibles: configuración, informes, documentos y mensajes"""
+
+    def __init__(self, semilla=2024, dependencias=10):
+        self.azar = random.Random(semilla)
+        self.dependencias = [f"Dependencia {n:02d}" for n in range(1, dependencias + 1)]
+        self.actividades = [f"{categoria}: Actividad {n:02d}" for categoria in CATEGORIAS for n in range(1, 9)]
+        self.contador = 0
+
+    def configuracion(self, proyectos=200):
+        """cota.json sintético con proyectos y dependencias"""
+        configuracion = ConfigCota._configuracion_por_defecto()
+        configuracion["municipio"]["nit"] = "800.000.000-0"
+        configuracion["dependencias_municipales"] = list(self.dependencias)
+        configuracion["indicadores_meta"] = {
+            "portal_web": {"visitas_mensuales": 2000, "paginas_vistas": 5000},
+            "tramites": {"digitalizados": 80},
+            "capacitacion": {"funcionarios_capacitados": 150, "horas_totales": 300},
+            "infraestructura": {"servidores": 8, "disponibilidad": 99.5},
+        }
+        configuracion["proyectos_prioritarios"] = [self.proyecto(n) for n in range(proyectos)]
+        return configuracion
+
+    def proyecto(self, n):
+        año, mes = self.azar.randint(2020, 2026), self.azar.randint(1, 12)
+        duracion = self.azar.randint(1, 36)
+        fin = año * 12 + mes - 1 + duracion
+        return {
+            "id": f"PROY-{n:05d}", "nombre": f"Proyecto sintético {n}",
+            "estado": self.azar.choice(ESTADOS), "prioridad": self.azar.choice(PRIORIDADES),
+            "fecha_inicio": f"{año}-{mes:02d}-01", "fecha_fin_estimada": f"{fin // 12}-{fin % 12 + 1:02d}-28",
+        }
+
+    def indicadores(self):
+        return {
+            "visitas": self.azar.randint(500, 5000), "paginas": self.azar.randint(1000, 15000),
+            "tramites": self.azar.randint(10, 120), "pqrs": self.azar.randint(0, 80),
+            "capacitados": self.azar.randint(0, 60), "horas": self.azar.randint(0, 120),
+            "servidores": self.azar.randint(2, 12), "disponibilidad": self.azar.randint(95, 100),
+        }
+
+    def informe(self, configuracion, año, mes, dependencia):
+        """Contexto de plantilla de un informe mensual"""
+        from .templates import TemplatesCota
+        self.contador += 1
+        actividades = self.azar.sample(self.actividades, self.azar.randint(3, 16))
+        return TemplatesCota.construir_contexto(
+            configuracion, ConfigCota.MESES[mes - 1], año, f"Responsable {self.contador}",
+            "Funcionario", actividades, self.indicadores(),
+            fecha=f"{self.azar.randint(1, 28):02d}/{mes:02d}/{año}",
+            hora=f"{self.azar.randint(7, 18):02d}:{self.azar.randint(0, 59):02d}:{self.contador % 60:02d}",
+            dependencia=dependencia
+        )
+
+    def informes(self, configuracion, años, año_inicial=2020):
+        """Contextos de 'años' años de informes mensuales para todas las dependencias"""
+        return [
+            self.informe(configuracion, año, mes, dependencia)
+            for año in range(año_inicial, año_inicial + años)
+            for mes in range(1, 13)
+            for dependencia in self.dependencias
+        ]
+
+    def documento(self, registros=100):
+        return {"registros": [
+            {"dependencia": self.azar.choice(self.dependencias), "año": self.azar.randint(2020, 2026),
+             "mes": self.azar.randint(1, 12), "indicadores": self.indicadores()}
+            for _ in range(registros)
+        ]}
+
+    def mensaje(self):
+        self.contador += 1
+        return f"Informe generado: Informe_{self.contador}.txt ({self.azar.choice(self.dependencias)})"
+
+
+# ============================================
+# MEDICIÓN
+# ============================================
+def _percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not ordenados:
+        return 0.0
+    posicion = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[posicion]
+
+
+def medir(operacion, entradas, entradas_memoria=()):
+    """Latencias por llamada (sin tracemalloc) y pico de memoria (en una pasada aparte)
+
+    Las latencias se miden sin tracemalloc porque este vuelve varias veces
+    más lenta cada asignación de memoria.
+    """
+    latencias = []
+    inicio = time.perf_counter()
+    for entrada in entradas:
+        t0 = time.perf_counter()
+        operacion(entrada)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - inicio
+
+    pico = 0
+    if entradas_memoria:
+        tracemalloc.start()
+        try:
+            for entrada in entradas_memoria:
+                operacion(entrada)
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    ordenadas = sorted(latencias)
+    decil = max(1, len(latencias) // 10)
+    resultado = {
+        "n": len(latencias),
+        "total_s": round(total, 4),
+        "ops_s": round(len(latencias) / total, 1) if total else 0.0,
+        "media_ms": round(sum(latencias) / len(latencias), 4) if latencias else 0.0,
+        "max_ms": round(ordenadas[-1], 4) if ordenadas else 0.0,
+        "pico_memoria_kib": round(pico / 1024, 1),
+        # Latencia mediana al principio y al final: muestra si crece con los datos
+        "p50_primer_decil_ms": round(_percentil(sorted(latencias[:decil]), 50), 4),
+        "p50_ultimo_decil_ms": round(_percentil(sorted(latencias[-decil:]), 50), 4),
+    }
+    for p in PERCENTILES:
+        resultado[f"p{p}_ms"] = round(_percentil(ordenadas, p), 4)
+    return resultado
+
+
+# ============================================
+# SUITE
+# ============================================
+def ejecutar(años=3, dependencias=10, proyectos=200, repeticiones=2000, semilla=2024, operaciones=None,
+             conservar=False):
+    """Ejecuta la suite en un directorio temporal; devuelve {metadatos, resultados}"""
+    directorio = Path(tempfile.mkdtemp(prefix="cota_bench_"))
+    rutas_originales = {a: getattr(ConfigCota, a) for a in
+                        ("BASE_DIR", "CONFIG_DIR", "DATA_DIR", "REPORTS_DIR", "LOGS_DIR", "MUNICIPIOS_DIR",
+                         "ORIGEN_RUTAS")}
+    try:
+        ConfigCota.configurar_rutas(directorio)
+        ConfigCota.CONFIG_DIR.mkdir(parents=True)
+        ConfigCota.invalidar_cache()
+
+        generador = GeneradorDatos(semilla, dependencias)
+        configuracion = generador.configuracion(proyectos)
+        with open(ConfigCota.CONFIG_DIR / "cota.json", "w", encoding="utf-8") as f:
+            json.dump(configuracion, f, ensure_ascii=False, indent=2)
+
+        # Importaciones diferidas: los módulos que usan el almacén y el log ya ven las rutas temporales
+        from .logger import logger
+        from .templates import TemplatesCota
+        from .utils import UtilsCota
+
+        config = ConfigCota.cargar_configuracion()
+        resultados = {}
+
+        def caso(nombre, operacion, entradas, entradas_memoria=()):
+            if operaciones and nombre not in operaciones:
+                return
+            print(f"⏱️  {nombre} ({len(entradas)} llamadas)...", file=sys.stderr)
+            resultados[nombre] = medir(operacion, entradas, entradas_memoria)
+
+        informes = generador.informes(config, años)
+        informes_memoria = generador.informes(config, 1, año_inicial=2020 + años)[:50]
+        contenidos = [TemplatesCota.renderizar_informe(c) for c in informes]
+        contenidos_memoria = [TemplatesCota.renderizar_informe(c) for c in informes_memoria]
+
+        caso("renderizar_informe", TemplatesCota.renderizar_informe, informes, informes_memoria[:20])
+
+        def guardar(argumentos):
+            contexto, contenido = argumentos
+            UtilsCota.guardar_informe(contenido, contexto["mes"], contexto["año"],
+                                      dependencia=contexto["dependencia"], responsable=contexto["responsable"],
+                                      cargo=contexto["cargo"], actividades=contexto["actividades"])
+
+        caso("guardar_informe", guardar, list(zip(informes, contenidos)),
+             list(zip(informes_memoria, contenidos_memoria))[:20])
+
+        # Tablero: historial de indicadores de todos los informes, de la caché columnar a las series
+        from .dashboard import GRANULARIDADES, TableroCota
+        from .storage import StorageCota
+        StorageCota.guardar_indicadores_lote({
+            (c["dependencia"], c["año"], c["mes"]): c["indicadores"] for c in informes
+        })
+        caso("tablero_construir", lambda _: TableroCota.construir(), [None] * 20, [None] * 2)
+        caso("tablero_series (8 indicadores)",
+             lambda granularidad: [TableroCota.series(i, granularidad=granularidad) for i in ConfigCota.INDICADORES],
+             list(GRANULARIDADES) * 100, list(GRANULARIDADES))
+
+        documentos = [(f"bench_{n % 50}", generador.documento()) for n in range(min(repeticiones, 500))]
+        caso("guardar_json", lambda a: UtilsCota.guardar_json(a[1], a[0], "bench"), documentos, documentos[:20])
+        caso("cargar_json", lambda a: UtilsCota.cargar_json(a[0], "bench"), documentos, documentos[:20])
+
+        mensajes = [generador.mensaje() for _ in range(repeticiones * 5)]
+        caso("registrar_log", lambda m: UtilsCota.registrar_log(m, generador.azar.choice(NIVELES)),
+             mensajes, mensajes[:200])
+        caso("registrar_log (vaciado)", lambda _: logger.vaciar(), [None])
+
+        caso("cargar_configuracion", lambda _: ConfigCota.cargar_configuracion(), [None] * repeticiones,
+             [None] * 20)
+
+        def en_frio(_):
+            ConfigCota.invalidar_cache()
+            ConfigCota.cargar_configuracion()
+
+        caso("cargar_configuracion (en frío)", en_frio, [None] * min(repeticiones, 200), [None] * 5)
+        logger.vaciar()
+
+        metadatos = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "parametros": {"años": años, "dependencias": dependencias, "proyectos": proyectos,
+                           "repeticiones": repeticiones, "semilla": semilla},
+        }
+        return {"metadatos": metadatos, "resultados": resultados}
+    finally:
+        from .storage import StorageCota
+        StorageCota.cerrar()
+        for atributo, valor in rutas_originales.items():
+            setattr(ConfigCota, atributo, valor)
+        ConfigCota.invalidar_cache()
+        if conservar:
+            print(f"📁 Datos del benchmark conservados en {directorio}", file=sys.stderr)
+        else:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def comparar(actual, base, tolerancia=0.2):
+    """Compara p50/p95 y throughput con una línea base; devuelve [(operación, métrica, base, actual, cambio)]"""
+    regresiones = []
+    for nombre, resultado in actual["resultados"].items():
+        anterior = base.get("resultados", {}).get(nombre)
+        if anterior is None:
+            continue
+        for metrica, mayor_es_peor in (("p50_ms", True), ("p95_ms", True), ("ops_s", False)):
+            antes, ahora = anterior.get(metrica), resultado.get(metrica)
+            if not antes or ahora is None:
+                continue
+            cambio = (ahora - antes) / antes
+            if (cambio > tolerancia) if mayor_es_peor else (cambio < -tolerancia):
+                regresiones.append((nombre, metrica, antes, ahora, cambio))
+    return regresiones
+
+
+def imprimir(informe):
+    print(f"{'Operación':<32}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>11}{'pico KiB':>11}")
+    for nombre, r in informe["resultados"].items():
+        print(f"{nombre:<32}{r['n']:>7}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['ops_s']:>11.1f}{r['pico_memoria_kib']:>11.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks reproducibles con datos sintéticos")
+    parser.add_argument("--años", type=int, default=3, help="Años de informes sintéticos")
+    parser.add_argument("--dependencias", type=int, default=10)
+    parser.add_argument("--proyectos", type=int, default=200, help="Proyectos en la configuración sintética")
+    parser.add_argument("--repeticiones", type=int, default=2000, help="Llamadas de las operaciones rápidas")
+    parser.add_argument("--semilla", type=int, default=2024)
+    parser.add_argument("--operaciones", nargs="+", help="Solo estas operaciones")
+    parser.add_argument("--guardar", type=Path, help="Guarda los resultados como línea base (JSON)")
+    parser.add_argument("--comparar", type=Path, help="Compara con una línea base guardada")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento relativo aceptado")
+    parser.add_argument("--conservar", action="store_true", help="No borra el directorio temporal")
+    args = parser.parse_args(argv)
+
+    informe = ejecutar(args.años, args.dependencias, args.proyectos, args.repeticiones, args.semilla,
+                       args.operaciones, args.conservar)
+    imprimir(informe)
+
+    if args.guardar:
+        args.guardar.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"💾 Línea base guardada en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(informe, base, args.tolerancia)
+        for nombre, metrica, antes, ahora, cambio in regresiones:
+            print(f"❌ {nombre} {metrica}: {antes} → {ahora} ({cambio:+.0%})")
+        if regresiones:
+            return 1
+        print(f"✅ Sin regresiones frente a {args.comparar} (tolerancia {args.tolerancia:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+VERIFICACIÓN DE ARRANQUE DEL SISTEMA - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.check
+    python -m app.check --streamlit --limite-ms 3000
+    python -m app.check --json
+    python -m app.check --presupuesto-ms 80
+
+Sale con código 0 si todo está bien y 1 si falla algún paso (apto para
+health checks de contenedores). Cada paso se mide con perf_counter; la
+importación del núcleo se mide además en un intérprete limpio (-X importtime)
+contra un presupuesto, y falla si arrastra Streamlit o NumPy.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SECCIONES_REQUERIDAS = ("municipio", "alcaldia", "sistema")
+NUCLEO = ("app.config", "app.storage", "app.templates", "app.utils")
+# Módulos que el núcleo no debe cargar (son de la interfaz o de la analítica)
+PROHIBIDOS_NUCLEO = ("streamlit", "numpy", "pandas")
+PRESUPUESTO_IMPORTACION_MS = 150.0
+
+
+def _medir(nombre, funcion):
+    """Ejecuta un paso; devuelve {paso, ok, ms, detalle}"""
+    salida = io.StringIO()
+    inicio = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(salida):
+            ok, detalle = funcion()
+    except Exception as e:
+        ok, detalle = False, f"{type(e).__name__}: {e}"
+    return {"paso": nombre, "ok": bool(ok), "ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "detalle": detalle}
+
+
+def _importar_nucleo():
+    for modulo in NUCLEO:
+        importlib.import_module(modulo)
+    return True, None
+
+
+def tiempo_importacion(modulos=NUCLEO):
+    """Importa los módulos en un intérprete nuevo: (ms acumulados, {módulo: ms}, prohibidos cargados)"""
+    paquete = str(Path(__file__).resolve().parent.parent)
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (paquete, os.environ.get("PYTHONPATH")))))
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modulos)}"],
+        capture_output=True, text=True, env=entorno, timeout=60
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+
+    por_modulo, cargados = {}, set()
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea.split("|")
+        if not acumulado.strip().isdigit():
+            continue  # encabezado
+        cargados.add(nombre.strip().split(".")[0])
+        # Las líneas sin sangría son las importaciones de primer nivel del comando
+        if not nombre.startswith("  ") and nombre.strip().split(".")[0] == "app":
+            por_modulo[nombre.strip()] = int(acumulado) / 1000
+    prohibidos = sorted(cargados & set(PROHIBIDOS_NUCLEO))
+    return round(sum(por_modulo.values()), 2), por_modulo, prohibidos
+
+
+def _presupuesto_importacion(presupuesto_ms=PRESUPUESTO_IMPORTACION_MS):
+    total, por_modulo, prohibidos = tiempo_importacion()
+    detalle = f"{total:.1f} ms de {presupuesto_ms:.0f} ms (" + ", ".join(
+        f"{modulo} {ms:.1f}" for modulo, ms in por_modulo.items()) + ")"
+    if prohibidos:
+        return False, f"el núcleo carga {', '.join(prohibidos)}; {detalle}"
+    return total <= presupuesto_ms, detalle
+
+
+def _rutas():
+    from .config import ConfigCota
+    origen = ConfigCota.configurar_rutas()
+    return True, f"{ConfigCota.BASE_DIR} (origen: {origen}, municipio: {ConfigCota.municipio_actual()})"
+
+
+def _configuracion():
+    """Lectura estricta de cota.json (sin la configuración por defecto) y carga en caché"""
+    from .config import ConfigCota
+    ruta = ConfigCota.ruta_configuracion()
+    with open(ruta, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+    faltantes = [seccion for seccion in SECCIONES_REQUERIDAS if seccion not in datos]
+    if faltantes:
+        return False, f"{ruta}: faltan las secciones {', '.join(faltantes)}"
+    ConfigCota.invalidar_cache()
+    ConfigCota.cargar_configuracion()
+    return True, str(ruta)
+
+
+def _estructura():
+    from .config import ConfigCota
+    return ConfigCota.verificar_estructura(), None
+
+
+def _archivos():
+    from .utils import UtilsCota
+    resultados = UtilsCota.verificar_archivos_sistema()
+    faltantes = [r for r in resultados if r.startswith("✗")]
+    return not faltantes, ", ".join(faltantes or resultados)
+
+
+def _almacen():
+    from .storage import StorageCota
+    StorageCota.conexion().execute("SELECT COUNT(*) FROM informes").fetchone()
+    return True, str(StorageCota.ruta_base_datos())
+
+
+def _usuarios():
+    """usuarios.json legible, con roles conocidos y claves con hash (sin usuarios el acceso es abierto)"""
+    from .auth import ROLES, AutenticacionCota
+    usuarios = AutenticacionCota.usuarios()
+    if not usuarios:
+        return True, "sin usuarios: acceso abierto"
+    errores = [f"{usuario}: rol {perfil.get('rol')!r}" for usuario, perfil in usuarios.items()
+               if perfil.get("rol") not in ROLES]
+    errores += [f"{usuario}: clave sin hash" for usuario, perfil in usuarios.items()
+                if not str(perfil.get("clave", "")).startswith(("pbkdf2_sha256$", "scrypt$"))]
+    if errores:
+        return False, "; ".join(errores)
+    return True, f"{len(usuarios)} usuarios"
+
+
+def _streamlit():
+    importlib.import_module("streamlit")
+    return True, None
+
+
+def verificar(streamlit=False, presupuesto_ms=PRESUPUESTO_IMPORTACION_MS):
+    """Ejecuta todos los pasos en orden (si el núcleo no se puede importar, el resto se omite)"""
+    pasos = [("importación del núcleo", _importar_nucleo),
+             ("presupuesto de importación", lambda: _presupuesto_importacion(presupuesto_ms)), ("rutas", _rutas),
+             ("configuración", _configuracion), ("estructura", _estructura),
+             ("archivos del sistema", _archivos), ("almacén", _almacen), ("usuarios", _usuarios)]
+    if streamlit:
+        pasos.append(("importación de streamlit", _streamlit))
+
+    resultados = []
+    for nombre, funcion in pasos:
+        if resultados and not resultados[0]["ok"]:
+            resultados.append({"paso": nombre, "ok": False, "ms": 0.0, "detalle": "omitido"})
+            continue
+        resultados.append(_medir(nombre, funcion))
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica rutas, configuración y estructura, y mide el arranque")
+    parser.add_argument("--streamlit", action="store_true", help="Mide también la importación de streamlit")
+    parser.add_argument("--limite-ms", type=float, help="Falla si el tiempo total supera este límite")
+    parser.add_argument("--presupuesto-ms", type=float, default=PRESUPUESTO_IMPORTACION_MS,
+                        help=f"Tiempo máximo de importación del núcleo (por defecto {PRESUPUESTO_IMPORTACION_MS:.0f} ms)")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    resultados = verificar(args.streamlit, args.presupuesto_ms)
+    total = round((time.perf_counter() - inicio) * 1000, 2)
+    ok = all(r["ok"] for r in resultados) and (args.limite_ms is None or total <= args.limite_ms)
+
+    if args.json:
+        print(json.dumps({"ok": ok, "total_ms": total, "pasos": resultados}, ensure_ascii=False, indent=2))
+    else:
+        for r in resultados:
+            detalle = f"  {r['detalle']}" if r["detalle"] else ""
+            print(f"{'✓' if r['ok'] else '✗'} {r['paso']:<26} {r['ms']:>9.2f} ms{detalle}")
+        limite = f" (límite {args.limite_ms:.0f} ms)" if args.limite_ms is not None else ""
+        print(f"{'✅' if ok else '❌'} Total: {total:.2f} ms{limite}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
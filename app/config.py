@@ -1,25 +1,167 @@
 """
 CONFIGURACIÓN DEL SISTEMA - ALCALDÍA DE COTA
 """
+import contextvars
 import json
 import os
+import re
+import threading
 from pathlib import Path
+from types import MappingProxyType
+from .metrics import medir
+
+
+class _RutaPendiente:
+    """Atributo de ruta que se resuelve con configurar_rutas() en el primer acceso
+
+    Así importar el módulo no lee el entorno ni cota.json; después del
+    primer acceso los atributos son valores normales de la clase.
+    """
+
+    def __set_name__(self, propietario, nombre):
+        self.nombre = nombre
+
+    def __get__(self, instancia, propietario):
+        propietario.configurar_rutas()
+        return getattr(propietario, self.nombre)
+
 
 class ConfigCota:
     """Clase para manejar la configuración del sistema"""
     
-    # Rutas del sistema
-    BASE_DIR = Path("C:/Sistema_Cota")
-    CONFIG_DIR = BASE_DIR / "config"
-    DATA_DIR = BASE_DIR / "data"
-    REPORTS_DIR = BASE_DIR / "reports"
-    APP_DIR = BASE_DIR / "app"
+    # Rutas del sistema (las resuelve configurar_rutas en el primer uso)
+    APP_DIR = Path(__file__).resolve().parent
+    BASE_DIR = _RutaPendiente()
+    CONFIG_DIR = _RutaPendiente()
+    DATA_DIR = _RutaPendiente()
+    REPORTS_DIR = _RutaPendiente()
+    LOGS_DIR = _RutaPendiente()
+    MUNICIPIOS_DIR = _RutaPendiente()
+    ORIGEN_RUTAS = _RutaPendiente()
+    
+    # Multi-municipio: el municipio por defecto usa config/cota.json y las
+    # carpetas de siempre; cada municipio adicional tiene su propio archivo
+    # config/municipios/<id>.json y sus carpetas municipios/<id>/{data,reports}.
+    # El municipio activo es por contexto (cada sesión de Streamlit corre en
+    # su propio hilo); los scripts pueden fijarlo con COTA_MUNICIPIO.
+    MUNICIPIO_POR_DEFECTO = "cota"
+    _municipio_actual = contextvars.ContextVar("municipio_cota", default=None)
+    
+    MESES = (
+        "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+        "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+    )
+    
+    # Indicadores capturados en el informe y su relación con indicadores_meta.
+    # tipo: "mensual" (meta por mes), "anual" (meta sobre el acumulado del año)
+    #       o "nivel" (valor puntual, no se acumula)
+    # agregacion: cómo se consolidan datos diarios en el valor mensual
+    INDICADORES = {
+        "visitas": {"etiqueta": "Visitas portal", "meta": ("portal_web", "visitas_mensuales"),
+                    "tipo": "mensual", "agregacion": "suma"},
+        "paginas": {"etiqueta": "Páginas vistas", "meta": ("portal_web", "paginas_vistas"),
+                    "tipo": "mensual", "agregacion": "suma"},
+        "tramites": {"etiqueta": "Trámites online", "meta": ("tramites", "digitalizados"),
+                     "tipo": "nivel", "agregacion": "ultimo"},
+        "pqrs": {"etiqueta": "PQRS digitales", "meta": None,
+                 "tipo": "mensual", "agregacion": "suma"},
+        "capacitados": {"etiqueta": "Personas capacitadas", "meta": ("capacitacion", "funcionarios_capacitados"),
+                        "tipo": "anual", "agregacion": "suma"},
+        "horas": {"etiqueta": "Horas de capacitación", "meta": ("capacitacion", "horas_totales"),
+                  "tipo": "anual", "agregacion": "suma"},
+        "servidores": {"etiqueta": "Servidores activos", "meta": ("infraestructura", "servidores"),
+                       "tipo": "nivel", "agregacion": "ultimo"},
+        "disponibilidad": {"etiqueta": "Disponibilidad %", "meta": ("infraestructura", "disponibilidad"),
+                           "tipo": "nivel", "agregacion": "promedio"},
+    }
+    
+    # Caché de configuración por proceso: ruta -> (firma del archivo, vista inmutable)
+    _cache = {}
+    _cache_lock = threading.Lock()
+    _estadisticas = {"aciertos": 0, "recargas": 0}
+    # Lock propio de los contadores: un acierto no espera a que otra sesión relea el archivo
+    _estadisticas_lock = threading.Lock()
+    
+    # ============================================
+    # MUNICIPIOS
+    # ============================================
+    @classmethod
+    def municipios(cls):
+        """Identificadores de los municipios configurados (el de por defecto primero)"""
+        directorio = cls.CONFIG_DIR / "municipios"
+        adicionales = sorted(r.stem for r in directorio.glob("*.json")) if directorio.is_dir() else []
+        return [cls.MUNICIPIO_POR_DEFECTO] + [m for m in adicionales if m != cls.MUNICIPIO_POR_DEFECTO]
+    
+    @classmethod
+    def municipio_actual(cls):
+        """Municipio activo en este contexto"""
+        return (cls._municipio_actual.get() or os.environ.get("COTA_MUNICIPIO")
+                or cls.MUNICIPIO_POR_DEFECTO)
+    
+    @classmethod
+    def seleccionar_municipio(cls, municipio):
+        """Activa un municipio en el contexto actual; ValueError si no está configurado"""
+        municipio = cls.normalizar_municipio(municipio)
+        if municipio not in cls.municipios():
+            raise ValueError(f"Municipio no configurado: {municipio}")
+        cls._municipio_actual.set(municipio)
+        return municipio
+    
+    @staticmethod
+    def normalizar_municipio(municipio):
+        """Identificador seguro (minúsculas, sin rutas) de un municipio"""
+        municipio = str(municipio or "").strip().lower()
+        if not re.fullmatch(r"[a-z0-9][a-z0-9_-]*", municipio):
+            raise ValueError(f"Identificador de municipio inválido: {municipio!r}")
+        return municipio
+    
+    @classmethod
+    def municipio_por_host(cls, host):
+        """Municipio según el nombre de host (chia.ejemplo.gov.co -> chia), o None"""
+        etiqueta = str(host or "").split(":")[0].split(".")[0].lower()
+        return etiqueta if etiqueta in cls.municipios() else None
+    
+    @classmethod
+    def ruta_configuracion(cls, municipio=None):
+        """Archivo de configuración de un municipio"""
+        municipio = cls.normalizar_municipio(municipio or cls.municipio_actual())
+        ruta = cls.CONFIG_DIR / "municipios" / f"{municipio}.json"
+        if municipio == cls.MUNICIPIO_POR_DEFECTO and not ruta.exists():
+            return cls.CONFIG_DIR / "cota.json"
+        return ruta
     
     @classmethod
-    def cargar_configuracion(cls):
-        """Carga la configuración desde cota.json"""
-        config_path = cls.CONFIG_DIR / "cota.json"
+    @medir("config.cargar_configuracion")
+    def cargar_configuracion(cls, municipio=None):
+        """Carga la configuración del municipio (en caché, revalidada por mtime y tamaño)"""
+        config_path = cls.ruta_configuracion(municipio)
+        clave = str(config_path)
+        firma = cls._firma_archivo(config_path)
         
+        entrada = cls._cache.get(clave)
+        if entrada is not None and entrada[0] == firma:
+            cls._contar("aciertos")
+            return entrada[1]
+        
+        with cls._cache_lock:
+            entrada = cls._cache.get(clave)
+            if entrada is not None and entrada[0] == firma:
+                cls._contar("aciertos")
+                return entrada[1]
+            
+            vista = cls._congelar(cls._leer_configuracion(config_path))
+            cls._cache[clave] = (firma, vista)
+            cls._contar("recargas")
+            return vista
+    
+    @classmethod
+    def _contar(cls, contador):
+        with cls._estadisticas_lock:
+            cls._estadisticas[contador] += 1
+    
+    @classmethod
+    def _leer_configuracion(cls, config_path):
+        """Lee y parsea cota.json desde disco"""
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = json.load(f)
@@ -31,6 +173,56 @@ class ConfigCota:
             print(f"❌ Error: Archivo cota.json corrupto")
             return cls._configuracion_por_defecto()
     
+    @staticmethod
+    def _firma_archivo(ruta):
+        """Firma (mtime, tamaño) usada para detectar cambios sin leer el archivo"""
+        try:
+            estado = os.stat(ruta)
+        except OSError:
+            return None
+        return (estado.st_mtime_ns, estado.st_size)
+    
+    @classmethod
+    def _congelar(cls, valor):
+        """Convierte dicts y listas en vistas inmutables"""
+        if isinstance(valor, dict):
+            return MappingProxyType({k: cls._congelar(v) for k, v in valor.items()})
+        if isinstance(valor, list):
+            return tuple(cls._congelar(v) for v in valor)
+        return valor
+    
+    @classmethod
+    def _descongelar(cls, valor):
+        """Copia mutable (dicts y listas) de una vista inmutable"""
+        if isinstance(valor, MappingProxyType):
+            return {k: cls._descongelar(v) for k, v in valor.items()}
+        if isinstance(valor, tuple):
+            return [cls._descongelar(v) for v in valor]
+        return valor
+    
+    @classmethod
+    def configuracion_mutable(cls):
+        """Copia editable (y serializable a JSON) de la configuración"""
+        return cls._descongelar(cls.cargar_configuracion())
+    
+    @classmethod
+    @medir("config.version_configuracion")
+    def version_configuracion(cls, municipio=None):
+        """Firma del archivo de configuración, útil como clave de caché"""
+        return cls._firma_archivo(cls.ruta_configuracion(municipio))
+    
+    @classmethod
+    def estadisticas_cache(cls):
+        """Contadores de aciertos y recargas de la caché de configuración"""
+        with cls._estadisticas_lock:
+            return dict(cls._estadisticas, entradas=len(cls._cache))
+    
+    @classmethod
+    def invalidar_cache(cls):
+        """Vacía la caché para forzar una nueva lectura"""
+        with cls._cache_lock:
+            cls._cache.clear()
+    
     @staticmethod
     def _configuracion_por_defecto():
         """Configuración por defecto si no existe el archivo"""
@@ -38,9 +230,12 @@ class ConfigCota:
             "municipio": {
                 "nombre": "Cota",
                 "nombre_completo": "Municipio de Cota, Cundinamarca",
-                "codigo_dane": "25224"
+                "codigo_dane": "25224",
+                "departamento": "Cundinamarca"
             },
             "alcaldia": {
+                "alcalde": "Alcalde Municipal",
+                "secretario_tic": "Jefe de Sistemas y TIC",
                 "direccion": "Carrera 6 # 3-21, Centro",
                 "telefono_principal": "(601) 123 4567",
                 "correo_sistemas": "sistemas@cota-cundinamarca.gov.co",
@@ -54,17 +249,80 @@ class ConfigCota:
         }
     
     @classmethod
+    def configurar_rutas(cls, base_dir=None):
+        """Resuelve las rutas del sistema; devuelve el origen de BASE_DIR
+
+        BASE_DIR, en orden de prioridad:
+          1. el argumento base_dir
+          2. la variable de entorno COTA_BASE_DIR
+          3. "sistema.ruta_base" de cota.json, si es una ruta absoluta en este sistema
+          4. la carpeta que contiene el paquete app/
+        cota.json se busca en COTA_CONFIG_DIR o en <base inicial>/config.
+        COTA_DATA_DIR, COTA_REPORTS_DIR y COTA_LOGS_DIR permiten ubicar cada
+        carpeta por separado (por ejemplo, en un volumen); COTA_MUNICIPIOS_DIR
+        la de los municipios adicionales.
+        """
+        paquete = cls.APP_DIR.parent
+        entorno = os.environ.get("COTA_BASE_DIR")
+        inicial = Path(base_dir or entorno or paquete).expanduser()
+        config_dir = Path(os.environ.get("COTA_CONFIG_DIR") or inicial / "config").expanduser()
+
+        if base_dir:
+            base, origen = inicial, "argumento"
+        elif entorno:
+            base, origen = inicial, "COTA_BASE_DIR"
+        else:
+            base, origen = paquete, "paquete"
+            ruta_base = cls._ruta_base_configurada(config_dir / "cota.json")
+            if ruta_base is not None:
+                base, origen = ruta_base, "cota.json"
+
+        cls.BASE_DIR = base
+        cls.CONFIG_DIR = config_dir
+        cls.DATA_DIR = Path(os.environ.get("COTA_DATA_DIR") or base / "data").expanduser()
+        cls.REPORTS_DIR = Path(os.environ.get("COTA_REPORTS_DIR") or base / "reports").expanduser()
+        cls.LOGS_DIR = Path(os.environ.get("COTA_LOGS_DIR") or base / "logs").expanduser()
+        cls.MUNICIPIOS_DIR = Path(os.environ.get("COTA_MUNICIPIOS_DIR") or base / "municipios").expanduser()
+        cls.ORIGEN_RUTAS = origen
+        return origen
+
+    @staticmethod
+    def _ruta_base_configurada(config_path):
+        """Valor de sistema.ruta_base en cota.json, solo si es absoluto aquí ("C:/..." no lo es en Linux)"""
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                ruta = json.load(f).get("sistema", {}).get("ruta_base")
+        except (OSError, ValueError, AttributeError):
+            return None
+        if not ruta:
+            return None
+        ruta = Path(ruta).expanduser()
+        return ruta if ruta.is_absolute() else None
+
+    @classmethod
+    def directorios_municipio(cls, municipio=None):
+        """(data, reports) del municipio: los de siempre para el de por defecto"""
+        municipio = cls.normalizar_municipio(municipio or cls.municipio_actual())
+        if municipio == cls.MUNICIPIO_POR_DEFECTO:
+            return cls.DATA_DIR, cls.REPORTS_DIR
+        raiz = cls.MUNICIPIOS_DIR / municipio
+        return raiz / "data", raiz / "reports"
+    
+    @classmethod
+    @medir("config.obtener_ruta")
     def obtener_ruta(cls, tipo, crear=True):
-        """Obtiene rutas del sistema"""
+        """Obtiene rutas del sistema (data y reports son las del municipio activo)"""
+        data_dir, reports_dir = cls.directorios_municipio()
         rutas = {
             "base": cls.BASE_DIR,
             "config": cls.CONFIG_DIR,
-            "data": cls.DATA_DIR,
-            "reports": cls.REPORTS_DIR,
+            "data": data_dir,
+            "reports": reports_dir,
             "app": cls.APP_DIR,
-            "documentos": cls.DATA_DIR / "documentos",
-            "evidencias": cls.DATA_DIR / "evidencias",
-            "base_datos": cls.DATA_DIR / "base_datos"
+            "logs": cls.LOGS_DIR,
+            "documentos": data_dir / "documentos",
+            "evidencias": data_dir / "evidencias",
+            "base_datos": data_dir / "base_datos"
         }
         
         ruta = rutas.get(tipo)
@@ -74,17 +332,20 @@ class ConfigCota:
         return ruta
     
     @classmethod
+    @medir("config.verificar_estructura")
     def verificar_estructura(cls):
-        """Verifica y crea la estructura de carpetas necesaria"""
+        """Verifica y crea la estructura de carpetas necesaria (del municipio activo)"""
+        data_dir, reports_dir = cls.directorios_municipio()
         carpetas = [
             cls.BASE_DIR,
             cls.CONFIG_DIR,
-            cls.DATA_DIR,
-            cls.REPORTS_DIR,
-            cls.DATA_DIR / "documentos",
-            cls.DATA_DIR / "evidencias",
-            cls.DATA_DIR / "base_datos",
-            cls.REPORTS_DIR / "2024"
+            data_dir,
+            reports_dir,
+            cls.LOGS_DIR,
+            data_dir / "documentos",
+            data_dir / "evidencias",
+            data_dir / "base_datos",
+            reports_dir / "2024"
         ]
         
         for carpeta in carpetas:
@@ -95,5 +356,9 @@ class ConfigCota:
         print("✅ Estructura de carpetas verificada")
         return True
 
-# Instancia global de configuración
-config = ConfigCota.cargar_configuracion()
\ No newline at end of file
+
+def __getattr__(nombre):
+    """'config' (configuración del municipio activo) se carga al pedirla, no al importar"""
+    if nombre == "config":
+        return ConfigCota.cargar_configuracion()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
@@ -0,0 +1,264 @@
+"""
+SERIES DEL TABLERO DE INDICADORES - ALCALDÍA DE COTA
+
+Uso:
+    datos = TableroCota.series("visitas", desde=2020 * 12, granularidad="trimestre")
+    filas = TableroCota.comparativo("capacitados", desde=2024 * 12, hasta=2024 * 12 + 11)
+
+    python -m app.dashboard --construir
+
+Las series se precalculan por indicador en data/base_datos/series/<indicador>.npz
+(matriz dependencias × meses) y se reconstruyen cuando cambia la versión de
+los indicadores (AgregadosCota.version). La reducción a trimestres, años o
+un máximo de puntos por serie se hace aquí, con la agregación de cada
+indicador, para que el navegador reciba solo lo que dibuja.
+"""
+import sys
+import threading
+import numpy as np
+from .aggregates import AgregadosCota
+from .analytics import AnaliticaCota
+from .atomic import EscrituraCota
+from .config import ConfigCota
+from .metrics import medir
+
+# Meses que agrupa cada punto según la granularidad
+GRANULARIDADES = {"mes": 1, "trimestre": 3, "año": 12}
+MAXIMO_PUNTOS = 120
+
+
+class TableroCota:
+    """Caché columnar por indicador y consultas reducidas para los gráficos
+
+    Los períodos se codifican como en HistorialIndicadores: año * 12 + (mes - 1).
+    """
+
+    # ruta del .npz -> arrays ya leídos (se descartan al cambiar la versión)
+    _series = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def directorio():
+        return ConfigCota.obtener_ruta("base_datos") / "series"
+
+    @classmethod
+    def ruta_serie(cls, indicador):
+        return cls.directorio() / f"{indicador}.npz"
+
+    @staticmethod
+    def version(municipio=None):
+        return AgregadosCota.version(municipio)
+
+    # ============================================
+    # CACHÉ COLUMNAR
+    # ============================================
+    @classmethod
+    @medir("tablero.construir")
+    def construir(cls, municipio=None):
+        """Materializa las series de todos los indicadores; devuelve la versión construida
+
+        La versión se lee antes que el historial: si otro proceso escribe en
+        medio, la caché queda marcada como vieja y se reconstruye en la
+        siguiente consulta.
+        """
+        with EscrituraCota.bloqueo("series"):
+            version = AgregadosCota.version(municipio)
+            historial = AnaliticaCota.cargar_historial(municipio)
+            acumulado = historial.calcular()["acumulado_anual"]
+            dependencias = np.array(historial.dependencias, dtype=str)
+            cls.directorio().mkdir(parents=True, exist_ok=True)
+            for i, indicador in enumerate(historial.indicadores):
+                with EscrituraCota.atomica(cls.ruta_serie(indicador)) as destino:
+                    np.savez(destino, version=np.int64(version), periodos=historial.periodos,
+                             dependencias=dependencias,
+                             valores=np.ascontiguousarray(historial.valores[:, :, i]),
+                             acumulado=np.ascontiguousarray(acumulado[:, :, i]))
+        return version
+
+    @staticmethod
+    def _leer(ruta):
+        try:
+            with np.load(ruta) as datos:
+                serie = {clave: datos[clave] for clave in datos.files}
+        except (OSError, ValueError, KeyError):
+            return None
+        serie["version"] = int(serie["version"])
+        return serie
+
+    @classmethod
+    def cargar(cls, indicador, municipio=None):
+        """Serie precalculada {version, periodos, dependencias, valores, acumulado} de un indicador"""
+        if indicador not in ConfigCota.INDICADORES:
+            raise ValueError(f"Indicador desconocido: {indicador}")
+        version = AgregadosCota.version(municipio)
+        ruta = cls.ruta_serie(indicador)
+        serie = cls._series.get(ruta)
+        if serie is None or serie["version"] != version:
+            serie = cls._leer(ruta)
+            if serie is None or serie["version"] != version:
+                cls.construir(municipio)
+                serie = cls._leer(ruta)
+            with cls._lock:
+                cls._series[ruta] = serie
+        return serie
+
+    # ============================================
+    # REDUCCIÓN
+    # ============================================
+    @staticmethod
+    def reducir(periodos, matriz, agregacion, paso):
+        """Agrupa las columnas de 'matriz' en bloques de 'paso' meses; devuelve (inicios, matriz reducida)
+
+        Los huecos (NaN) no cuentan: un bloque sin datos queda en NaN. 'ultimo'
+        toma el último mes con dato del bloque.
+        """
+        if paso <= 1 or not len(periodos):
+            return periodos, matriz
+        grupos = periodos // paso
+        inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+        presentes = ~np.isnan(matriz)
+        cuenta = np.add.reduceat(presentes, inicios, axis=1)
+        if agregacion == "ultimo":
+            posiciones = np.maximum.accumulate(np.where(presentes, np.arange(matriz.shape[1]), -1), axis=1)
+            finales = posiciones[:, np.r_[inicios[1:], matriz.shape[1]] - 1]
+            tomados = np.take_along_axis(matriz, np.maximum(finales, 0), axis=1)
+            reducida = np.where(finales >= inicios, tomados, np.nan)
+        else:
+            suma = np.add.reduceat(np.where(presentes, matriz, 0.0), inicios, axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                reducida = np.where(cuenta > 0, suma / cuenta if agregacion == "promedio" else suma, np.nan)
+        return periodos[inicios], reducida
+
+    @staticmethod
+    def _ventana(serie, desde, hasta):
+        periodos = serie["periodos"]
+        inicio = 0 if desde is None else int(np.searchsorted(periodos, desde))
+        fin = len(periodos) if hasta is None else int(np.searchsorted(periodos, hasta, side="right"))
+        return slice(inicio, fin)
+
+    @staticmethod
+    def etiqueta_periodo(codigo, paso=1):
+        año, mes = divmod(int(codigo), 12)
+        if paso == 12:
+            return str(año)
+        if paso == 3 and mes % 3 == 0:
+            return f"{año}-T{mes // 3 + 1}"
+        return f"{año}-{mes + 1:02d}"
+
+    @staticmethod
+    def _lista(valores):
+        return [None if np.isnan(v) else round(float(v), 2) for v in valores]
+
+    # ============================================
+    # CONSULTAS
+    # ============================================
+    @classmethod
+    def rango(cls, municipio=None):
+        """(primer, último) período con datos, o None si no hay indicadores"""
+        periodos = cls.cargar(next(iter(ConfigCota.INDICADORES)), municipio)["periodos"]
+        return (int(periodos[0]), int(periodos[-1])) if len(periodos) else None
+
+    @classmethod
+    @medir("tablero.series")
+    def series(cls, indicador, desde=None, hasta=None, granularidad="mes", maximo_puntos=MAXIMO_PUNTOS,
+               municipio=None):
+        """Series de un indicador por dependencia, reducidas a la granularidad y a maximo_puntos
+
+        Devuelve {indicador, etiqueta, metrica, paso, periodos, series: {dependencia: [...]}, meta}.
+        Los indicadores de meta anual se grafican como acumulado del año; 'meta'
+        es la meta de cada punto (una meta mensual se multiplica por los meses
+        que agrupa el punto) o None si el indicador no tiene meta.
+        """
+        definicion = ConfigCota.INDICADORES[indicador]
+        serie = cls.cargar(indicador, municipio)
+        ventana = cls._ventana(serie, desde, hasta)
+        periodos = serie["periodos"][ventana]
+
+        anual = definicion.get("tipo") == "anual"
+        matriz = (serie["acumulado"] if anual else serie["valores"])[:, ventana]
+        agregacion = "ultimo" if anual else definicion.get("agregacion", "suma")
+        paso = GRANULARIDADES[granularidad]
+        bloques = len(np.unique(periodos // paso)) if len(periodos) else 0
+        if bloques > maximo_puntos:
+            paso *= -(-bloques // maximo_puntos)
+        inicios, reducida = cls.reducir(periodos, matriz, agregacion, paso)
+
+        meta = float(AnaliticaCota.metas([indicador])[0])
+        metas = None
+        if not np.isnan(meta):
+            if definicion.get("tipo") == "mensual" and agregacion == "suma":
+                meses = np.diff(np.r_[np.searchsorted(periodos, inicios), len(periodos)])
+                metas = cls._lista(meta * meses)
+            else:
+                metas = [meta] * len(inicios)
+
+        return {
+            "indicador": indicador,
+            "etiqueta": definicion["etiqueta"],
+            "metrica": "acumulado_anual" if anual else "valores",
+            "paso": paso,
+            "periodos": [cls.etiqueta_periodo(codigo, paso) for codigo in inicios],
+            "series": {
+                str(dependencia): cls._lista(fila)
+                for dependencia, fila in zip(serie["dependencias"], reducida)
+                if not np.isnan(fila).all()
+            },
+            "meta": metas,
+        }
+
+    @classmethod
+    @medir("tablero.comparativo")
+    def comparativo(cls, indicador, desde=None, hasta=None, municipio=None):
+        """Consolidado de cada dependencia en la ventana frente a su meta
+
+        [{dependencia, valor, meta, porcentaje}] de mayor a menor valor. Las metas
+        mensuales y anuales se escalan a los meses de la ventana.
+        """
+        definicion = ConfigCota.INDICADORES[indicador]
+        serie = cls.cargar(indicador, municipio)
+        ventana = cls._ventana(serie, desde, hasta)
+        periodos = serie["periodos"][ventana]
+        if not len(periodos):
+            return []
+        _, consolidado = cls.reducir(np.zeros(len(periodos), dtype=np.int64), serie["valores"][:, ventana],
+                                     definicion.get("agregacion", "suma"), len(periodos))
+
+        meta = float(AnaliticaCota.metas([indicador])[0])
+        if np.isnan(meta):
+            meta = None
+        elif definicion.get("tipo") == "mensual":
+            meta *= len(periodos)
+        elif definicion.get("tipo") == "anual":
+            meta *= len(periodos) / 12
+
+        filas = []
+        for dependencia, valor in zip(serie["dependencias"], consolidado[:, 0]):
+            if np.isnan(valor):
+                continue
+            filas.append({
+                "dependencia": str(dependencia),
+                "valor": round(float(valor), 2),
+                "meta": meta,
+                "porcentaje": round(float(valor) / meta * 100, 1) if meta else None,
+            })
+        return sorted(filas, key=lambda fila: fila["valor"], reverse=True)
+
+
+# Instancia global del tablero
+dashboard = TableroCota()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Caché de series del tablero de indicadores")
+    parser.add_argument("--construir", action="store_true", help="Reconstruye la caché de series")
+    parser.add_argument("--municipio", help="Municipio (por defecto el configurado)")
+    args = parser.parse_args()
+
+    if not args.construir:
+        parser.print_help()
+        sys.exit(0)
+    if args.municipio:
+        ConfigCota.seleccionar_municipio(args.municipio)
+    version = TableroCota.construir()
+    print(f"✅ Series del tablero construidas (versión {version}) en {TableroCota.directorio()}")
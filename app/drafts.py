@@ -0,0 +1,165 @@
+"""
+BORRADORES DEL FORMULARIO DE INFORMES - ALCALDÍA DE COTA
+"""
+import atexit
+import contextvars
+import threading
+import uuid
+from datetime import datetime
+from .config import ConfigCota
+from .logger import logger
+from .storage import ConflictoVersion, StorageCota
+
+SUBCARPETA = "borradores"
+
+
+class BorradoresCota:
+    """Autoguardado del formulario en el almacén (documentos en 'borradores/<id>')
+
+    Cada cambio del formulario programa una escritura; las escrituras se
+    agrupan y se hacen como máximo una vez cada RETARDO segundos, en un hilo
+    aparte para no frenar el rerun. Lo pendiente se lee antes que lo guardado
+    y se vacía al cerrar el proceso. Cada borrador se guarda en el almacén del
+    municipio activo cuando se programó.
+
+    Cada editor (sesión) escribe sobre la versión que abrió: si otro editor
+    guardó el mismo borrador entre medio, los cambios se guardan como un
+    borrador nuevo y el conflicto queda disponible en conflictos().
+
+    Con usuarios configurados cada borrador guarda su propietario y solo él
+    lo ve en listar(); sin usuarios (acceso abierto) todos ven todos.
+    """
+
+    RETARDO = 1.0
+
+    _pendientes = {}
+    _versiones = {}
+    _conflictos = {}
+    _temporizador = None
+    _lock = threading.Lock()
+    _escritura = threading.Lock()
+
+    @staticmethod
+    def nuevo_id():
+        return uuid.uuid4().hex[:12]
+
+    @classmethod
+    def abrir(cls, identificador, editor):
+        """Carga el borrador para un editor y fija la versión sobre la que escribirá"""
+        municipio = ConfigCota.municipio_actual()
+        datos, version = StorageCota.cargar_documento_version(identificador, SUBCARPETA)
+        with cls._lock:
+            cls._versiones[(municipio, identificador, editor)] = version
+        return cls._pendiente(municipio, identificador) or datos
+
+    @classmethod
+    def _pendiente(cls, municipio, identificador):
+        """Estado más reciente aún no escrito de un borrador (de cualquier editor)"""
+        with cls._lock:
+            pendientes = [d for clave, d in cls._pendientes.items() if clave[:2] == (municipio, identificador)]
+        return dict(max(pendientes, key=lambda d: d["actualizado"])) if pendientes else None
+
+    @classmethod
+    def programar(cls, identificador, datos, editor=None, propietario=None):
+        """Registra el estado actual del borrador; se escribe tras RETARDO segundos"""
+        datos = dict(datos, actualizado=datetime.now().isoformat(timespec="seconds"))
+        if propietario is not None:
+            datos["propietario"] = propietario
+        with cls._lock:
+            cls._pendientes[(ConfigCota.municipio_actual(), identificador, editor)] = datos
+            if cls._temporizador is None:
+                cls._temporizador = threading.Timer(cls.RETARDO, cls.vaciar)
+                cls._temporizador.daemon = True
+                cls._temporizador.start()
+
+    @classmethod
+    def vaciar(cls):
+        """Escribe todos los borradores pendientes"""
+        with cls._escritura:
+            with cls._lock:
+                pendientes, cls._pendientes = cls._pendientes, {}
+                if cls._temporizador is not None:
+                    cls._temporizador.cancel()
+                    cls._temporizador = None
+            for (municipio, identificador, editor), datos in pendientes.items():
+                try:
+                    contextvars.copy_context().run(cls._guardar, municipio, identificador, editor, datos)
+                except Exception as e:
+                    logger.registrar(f"No se pudo guardar el borrador {identificador}: {e}", "ERROR")
+
+    @classmethod
+    def _guardar(cls, municipio, identificador, editor, datos):
+        ConfigCota.seleccionar_municipio(municipio)
+        clave = (municipio, identificador, editor)
+        version = cls._versiones.get(clave) if editor is not None else None
+        try:
+            version = StorageCota.guardar_documento(identificador, datos, SUBCARPETA, version)
+        except ConflictoVersion as e:
+            # Los cambios de este editor no se pierden: pasan a un borrador propio
+            nuevo = cls.nuevo_id()
+            version = StorageCota.guardar_documento(nuevo, dict(datos, origen=identificador), SUBCARPETA, 0)
+            logger.registrar(f"Conflicto en el borrador {identificador} ({e}); cambios guardados en {nuevo}",
+                             "WARNING")
+            with cls._lock:
+                cls._versiones.pop(clave, None)
+                cls._conflictos.setdefault((municipio, editor), []).append((identificador, nuevo))
+            clave = (municipio, nuevo, editor)
+        if editor is not None:
+            with cls._lock:
+                cls._versiones[clave] = version
+
+    @classmethod
+    def conflictos(cls, editor):
+        """Conflictos de un editor desde la última consulta: [(borrador, borrador nuevo)]"""
+        with cls._lock:
+            return cls._conflictos.pop((ConfigCota.municipio_actual(), editor), [])
+
+    @classmethod
+    def cargar(cls, identificador):
+        """Último estado del borrador (pendiente o guardado); None si no existe"""
+        pendiente = cls._pendiente(ConfigCota.municipio_actual(), identificador)
+        return pendiente or StorageCota.cargar_documento(identificador, SUBCARPETA)
+
+    @staticmethod
+    def accesible(datos, propietario=None):
+        """Un borrador es de todos en acceso abierto (propietario None); si no, solo de su dueño"""
+        return propietario is None or datos.get("propietario") == propietario
+
+    @classmethod
+    def listar(cls, limite=10, propietario=None):
+        """Borradores más recientes: [{id, datos}] (incluye los aún no escritos)
+
+        Con propietario, solo los suyos.
+        """
+        municipio = ConfigCota.municipio_actual()
+        with cls._lock:
+            pendientes = {}
+            for clave, datos in cls._pendientes.items():
+                if clave[0] == municipio and datos["actualizado"] >= pendientes.get(clave[1], {}).get("actualizado", ""):
+                    pendientes[clave[1]] = datos
+        # Al filtrar por propietario el límite se aplica después, no en la consulta
+        borradores = {
+            documento["nombre"]: documento["datos"]
+            for documento in StorageCota.listar_documentos(SUBCARPETA, None if propietario else limite)
+        }
+        borradores.update(pendientes)
+        ordenados = sorted(((i, d) for i, d in borradores.items() if cls.accesible(d, propietario)),
+                           key=lambda par: par[1].get("actualizado", ""), reverse=True)
+        return [{"id": identificador, "datos": datos} for identificador, datos in ordenados[:limite]]
+
+    @classmethod
+    def descartar(cls, identificador):
+        """Elimina el borrador (por ejemplo, al generar el informe)"""
+        with cls._escritura:
+            clave = (ConfigCota.municipio_actual(), identificador)
+            with cls._lock:
+                for diccionario in (cls._pendientes, cls._versiones):
+                    for pendiente in [c for c in diccionario if c[:2] == clave]:
+                        del diccionario[pendiente]
+            StorageCota.eliminar_documento(identificador, SUBCARPETA)
+
+
+atexit.register(BorradoresCota.vaciar)
+
+# Instancia global de borradores
+drafts = BorradoresCota()
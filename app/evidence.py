@@ -0,0 +1,427 @@
+"""
+EVIDENCIAS DE LOS INFORMES - ALCALDÍA DE COTA
+
+Uso:
+    digest = EvidenciasCota.adjuntar(archivo, "asistencia.pdf", borrador, "Capacitación funcionarios")
+    EvidenciasCota.vincular_informe(borrador, ruta_informe)
+
+    python -m app.evidence --verificar
+    python -m app.evidence --miniaturas
+    python -m app.evidence --limpiar
+
+Los archivos (listas de asistencia, capturas, PDF) se copian por bloques a
+data/evidencias/ab/abcdef... bajo su SHA-256: el mismo contenido subido dos
+veces ocupa un solo objeto. Las miniaturas de las imágenes se generan en un
+pool de hilos (requieren Pillow, opcional) y los archivos se sirven con
+lecturas mapeadas en memoria, sin cargarlos completos.
+"""
+import contextvars
+import hashlib
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from .atomic import EscrituraCota
+from .config import ConfigCota
+from .metrics import medir
+from .storage import StorageCota
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS evidencias (
+    municipio TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    tamano INTEGER NOT NULL,
+    miniatura INTEGER NOT NULL DEFAULT 0,
+    creado TEXT NOT NULL,
+    PRIMARY KEY (municipio, digest)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS evidencias_enlaces (
+    municipio TEXT NOT NULL,
+    borrador TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    actividad TEXT NOT NULL DEFAULT '',
+    informe INTEGER,
+    creado TEXT NOT NULL,
+    PRIMARY KEY (municipio, borrador, digest)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_evidencias_informe ON evidencias_enlaces (municipio, informe);
+CREATE INDEX IF NOT EXISTS idx_evidencias_digest ON evidencias_enlaces (municipio, digest);
+"""
+StorageCota.registrar_esquema(ESQUEMA)
+
+TAMANO_BLOQUE = 1024 * 1024
+
+# Extensiones aceptadas y su tipo MIME
+TIPOS = {
+    ".pdf": "application/pdf",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".csv": "text/csv",
+    ".txt": "text/plain",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+# Estado de la miniatura en la tabla 'evidencias'
+MINIATURA_PENDIENTE, MINIATURA_LISTA, MINIATURA_NO_DISPONIBLE = 0, 1, -1
+
+
+class ErrorEvidencia(ValueError):
+    """Archivo de evidencia rechazado (tipo no permitido, vacío o demasiado grande)"""
+
+
+class EvidenciasCota:
+    """Almacén de evidencias direccionado por contenido, enlazado a borradores e informes
+
+    Mientras se llena el formulario la evidencia queda enlazada al borrador;
+    al generar el informe, vincular_informe() fija el id del informe en esos
+    enlaces (tabla 'evidencias_enlaces').
+    """
+
+    MAXIMO_MB = float(os.environ.get("COTA_EVIDENCIAS_MAX_MB", "50"))
+    LADO_MINIATURA = 320
+    HILOS = 2
+
+    _pool = None
+    _encoladas = set()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def directorio():
+        return ConfigCota.obtener_ruta("evidencias")
+
+    @classmethod
+    def ruta_objeto(cls, digest):
+        return cls.directorio() / digest[:2] / digest
+
+    @classmethod
+    def ruta_miniatura(cls, digest):
+        return cls.directorio() / "miniaturas" / digest[:2] / f"{digest}.jpg"
+
+    @staticmethod
+    def tipo_mime(nombre):
+        """Tipo MIME según la extensión; ErrorEvidencia si no está permitida"""
+        extension = Path(nombre).suffix.lower()
+        if extension not in TIPOS:
+            raise ErrorEvidencia(f"{nombre}: tipo de archivo no permitido "
+                                 f"(se aceptan {', '.join(sorted(TIPOS))})")
+        return TIPOS[extension]
+
+    # ============================================
+    # ALMACENAMIENTO
+    # ============================================
+    @classmethod
+    @medir("evidencias.guardar")
+    def guardar(cls, flujo, nombre):
+        """Copia el flujo por bloques calculando el SHA-256; devuelve (digest, tamaño, tipo)
+
+        El límite de tamaño se comprueba mientras se copia, sin esperar al final.
+        """
+        tipo = cls.tipo_mime(nombre)
+        maximo = int(cls.MAXIMO_MB * 1024 * 1024)
+        if hasattr(flujo, "seek"):
+            flujo.seek(0)
+        sha = hashlib.sha256()
+        tamano = 0
+        with EscrituraCota.temporal(cls.directorio(), ".entrante_") as (destino, temporal):
+            for bloque in iter(lambda: flujo.read(TAMANO_BLOQUE), b""):
+                tamano += len(bloque)
+                if tamano > maximo:
+                    raise ErrorEvidencia(f"{nombre}: supera el máximo de {cls.MAXIMO_MB:g} MB")
+                sha.update(bloque)
+                destino.write(bloque)
+            if not tamano:
+                raise ErrorEvidencia(f"{nombre}: el archivo está vacío")
+            digest = sha.hexdigest()
+            objeto = cls.ruta_objeto(digest)
+            if not objeto.exists():
+                EscrituraCota.sincronizar(destino)
+                destino.close()
+                objeto.parent.mkdir(exist_ok=True)
+                EscrituraCota.reemplazar(temporal, objeto)
+        return digest, tamano, tipo
+
+    @classmethod
+    def adjuntar(cls, flujo, nombre, borrador, actividad="", municipio=None):
+        """Guarda la evidencia y la enlaza al borrador; devuelve el digest
+
+        Si el borrador ya tenía ese contenido, solo se actualizan nombre y actividad.
+        """
+        digest, tamano, tipo = cls.guardar(flujo, nombre)
+        municipio = StorageCota._municipio(municipio)
+        ahora = datetime.now().isoformat(timespec="seconds")
+        miniatura = MINIATURA_PENDIENTE if tipo.startswith("image/") else MINIATURA_NO_DISPONIBLE
+        # El mismo bloqueo que limpiar(): el objeto no puede desaparecer mientras se enlaza
+        with EscrituraCota.bloqueo("evidencia", digest), StorageCota.transaccion() as conn:
+            if not cls.ruta_objeto(digest).exists():
+                cls.guardar(flujo, nombre)
+            conn.execute(
+                """INSERT OR IGNORE INTO evidencias (municipio, digest, tipo, tamano, miniatura, creado)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (municipio, digest, tipo, tamano, miniatura, ahora)
+            )
+            conn.execute(
+                """INSERT INTO evidencias_enlaces (municipio, borrador, digest, nombre, actividad, creado)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (municipio, borrador, digest)
+                   DO UPDATE SET nombre = excluded.nombre, actividad = excluded.actividad""",
+                (municipio, borrador, digest, Path(nombre).name, actividad or "", ahora)
+            )
+        if miniatura == MINIATURA_PENDIENTE:
+            cls.miniatura_async(digest)
+        return digest
+
+    @classmethod
+    def quitar(cls, borrador, digest, municipio=None):
+        """Desenlaza la evidencia del borrador (el objeto queda hasta limpiar())"""
+        with StorageCota.transaccion() as conn:
+            conn.execute(
+                "DELETE FROM evidencias_enlaces WHERE municipio = ? AND borrador = ? AND digest = ?",
+                (StorageCota._municipio(municipio), borrador, digest)
+            )
+
+    @classmethod
+    def vincular_informe(cls, borrador, ruta, municipio=None):
+        """Fija el informe registrado con esa ruta en las evidencias del borrador; devuelve cuántas"""
+        municipio = StorageCota._municipio(municipio)
+        with StorageCota.transaccion() as conn:
+            fila = conn.execute(
+                "SELECT id FROM informes WHERE municipio = ? AND ruta = ? ORDER BY id DESC LIMIT 1",
+                (municipio, str(ruta))
+            ).fetchone()
+            if fila is None:
+                return 0
+            return conn.execute(
+                "UPDATE evidencias_enlaces SET informe = ? WHERE municipio = ? AND borrador = ?",
+                (fila["id"], municipio, borrador)
+            ).rowcount
+
+    @classmethod
+    def listar(cls, borrador=None, informe=None, municipio=None):
+        """Evidencias de un borrador o de un informe (id): [{digest, nombre, actividad, tipo, tamano, ...}]"""
+        sql = """SELECT e.digest, e.nombre, e.actividad, e.borrador, e.informe, e.creado,
+                        o.tipo, o.tamano, o.miniatura
+                 FROM evidencias_enlaces e
+                 JOIN evidencias o ON o.municipio = e.municipio AND o.digest = e.digest
+                 WHERE e.municipio = ?"""
+        parametros = [StorageCota._municipio(municipio)]
+        if borrador is not None:
+            sql += " AND e.borrador = ?"
+            parametros.append(borrador)
+        if informe is not None:
+            sql += " AND e.informe = ?"
+            parametros.append(int(informe))
+        return [dict(f) for f in StorageCota.conexion().execute(sql + " ORDER BY e.creado, e.nombre", parametros)]
+
+    # ============================================
+    # LECTURA (MAPEADA EN MEMORIA)
+    # ============================================
+    @classmethod
+    @contextmanager
+    def abrir(cls, digest):
+        """Vista de solo lectura del objeto mapeado en memoria (memoryview)
+
+        Las páginas se cargan del disco a medida que se leen. La vista deja de
+        ser válida al salir del bloque: copie lo que necesite conservar.
+        """
+        import mmap
+        with open(cls.ruta_objeto(digest), "rb") as archivo:
+            if os.fstat(archivo.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+            with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                vista = memoryview(mapa)
+                try:
+                    yield vista
+                finally:
+                    vista.release()
+
+    @classmethod
+    def fragmentos(cls, digest, inicio=0, fin=None, tamano_bloque=TAMANO_BLOQUE):
+        """Genera el contenido [inicio, fin) por bloques (memoria constante, sirve rangos HTTP)"""
+        with cls.abrir(digest) as vista:
+            fin = len(vista) if fin is None else min(fin, len(vista))
+            for posicion in range(inicio, fin, tamano_bloque):
+                yield bytes(vista[posicion:min(posicion + tamano_bloque, fin)])
+
+    @classmethod
+    def leer(cls, digest):
+        """Contenido completo (para descargas puntuales; la copia se hace desde el mapa)"""
+        with cls.abrir(digest) as vista:
+            return vista.tobytes()
+
+    # ============================================
+    # MINIATURAS
+    # ============================================
+    @classmethod
+    def pool(cls):
+        with cls._lock:
+            if cls._pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                cls._pool = ThreadPoolExecutor(max_workers=cls.HILOS, thread_name_prefix="EvidenciasCota")
+            return cls._pool
+
+    @classmethod
+    def miniatura_async(cls, digest):
+        """Encola la miniatura (una sola vez por digest y municipio); devuelve el Future o None"""
+        clave = (ConfigCota.municipio_actual(), digest)
+        with cls._lock:
+            if clave in cls._encoladas:
+                return None
+            cls._encoladas.add(clave)
+
+        def generar():
+            try:
+                return cls.generar_miniatura(digest)
+            finally:
+                with cls._lock:
+                    cls._encoladas.discard(clave)
+
+        # La tarea corre en el contexto de quien la encola (municipio activo)
+        return cls.pool().submit(contextvars.copy_context().run, generar)
+
+    @classmethod
+    @medir("evidencias.miniatura")
+    def generar_miniatura(cls, digest):
+        """Escribe la miniatura JPEG del objeto; devuelve su ruta o None si no es posible"""
+        ruta = cls.ruta_miniatura(digest)
+        if not ruta.exists():
+            try:
+                from PIL import Image, ImageOps
+            except ImportError:
+                # Sin Pillow queda pendiente: se genera después con --miniaturas
+                return None
+            try:
+                with Image.open(cls.ruta_objeto(digest)) as imagen:
+                    lado = cls.LADO_MINIATURA
+                    # En JPEG decodifica directamente a escala reducida
+                    imagen.draft("RGB", (lado * 2, lado * 2))
+                    imagen = ImageOps.exif_transpose(imagen).convert("RGB")
+                    imagen.thumbnail((lado, lado))
+                    ruta.parent.mkdir(parents=True, exist_ok=True)
+                    with EscrituraCota.atomica(ruta) as destino:
+                        imagen.save(destino, "JPEG", quality=80, optimize=True)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                cls._marcar_miniatura(digest, MINIATURA_NO_DISPONIBLE)
+                return None
+        cls._marcar_miniatura(digest, MINIATURA_LISTA)
+        return ruta
+
+    @classmethod
+    def _marcar_miniatura(cls, digest, estado):
+        with StorageCota.transaccion() as conn:
+            conn.execute("UPDATE evidencias SET miniatura = ? WHERE municipio = ? AND digest = ?",
+                         (estado, StorageCota._municipio(None), digest))
+
+    @classmethod
+    def miniatura(cls, evidencia):
+        """Ruta de la miniatura de una fila de listar() si ya existe (si falta, la encola)"""
+        if evidencia["miniatura"] == MINIATURA_NO_DISPONIBLE:
+            return None
+        ruta = cls.ruta_miniatura(evidencia["digest"])
+        if ruta.exists():
+            return ruta
+        cls.miniatura_async(evidencia["digest"])
+        return None
+
+    @classmethod
+    def generar_pendientes(cls):
+        """Genera las miniaturas pendientes en el pool; devuelve (pendientes, generadas)"""
+        digests = [f["digest"] for f in StorageCota.conexion().execute(
+            "SELECT digest FROM evidencias WHERE municipio = ? AND miniatura = ?",
+            (StorageCota._municipio(None), MINIATURA_PENDIENTE)
+        )]
+        futuros = [cls.pool().submit(contextvars.copy_context().run, cls.generar_miniatura, d) for d in digests]
+        return len(digests), sum(1 for futuro in futuros if futuro.result() is not None)
+
+    # ============================================
+    # MANTENIMIENTO
+    # ============================================
+    @classmethod
+    def verificar(cls):
+        """Recalcula el SHA-256 de cada objeto registrado; devuelve {objetos, bytes, corruptos, faltantes}"""
+        corruptos, faltantes = [], []
+        total_bytes = 0
+        filas = StorageCota.conexion().execute(
+            "SELECT digest FROM evidencias WHERE municipio = ?", (StorageCota._municipio(None),)
+        ).fetchall()
+        for fila in filas:
+            digest = fila["digest"]
+            if not cls.ruta_objeto(digest).exists():
+                faltantes.append(digest)
+                continue
+            sha = hashlib.sha256()
+            for bloque in cls.fragmentos(digest):
+                sha.update(bloque)
+                total_bytes += len(bloque)
+            if sha.hexdigest() != digest:
+                corruptos.append(digest)
+        return {"objetos": len(filas), "bytes": total_bytes, "corruptos": corruptos, "faltantes": faltantes}
+
+    @classmethod
+    def limpiar(cls):
+        """Elimina los objetos que ya no enlaza ningún borrador ni informe; devuelve cuántos"""
+        municipio = StorageCota._municipio(None)
+        candidatos = [f["digest"] for f in StorageCota.conexion().execute(
+            """SELECT digest FROM evidencias o WHERE municipio = ? AND NOT EXISTS (
+                   SELECT 1 FROM evidencias_enlaces e WHERE e.municipio = o.municipio AND e.digest = o.digest)""",
+            (municipio,)
+        )]
+        huerfanos = []
+        for digest in candidatos:
+            with EscrituraCota.bloqueo("evidencia", digest), StorageCota.transaccion() as conn:
+                eliminada = conn.execute(
+                    """DELETE FROM evidencias WHERE municipio = ? AND digest = ? AND NOT EXISTS (
+                           SELECT 1 FROM evidencias_enlaces WHERE municipio = ? AND digest = ?)""",
+                    (municipio, digest, municipio, digest)
+                ).rowcount
+                if eliminada:
+                    for ruta in (cls.ruta_objeto(digest), cls.ruta_miniatura(digest)):
+                        if ruta.exists():
+                            ruta.unlink()
+                    huerfanos.append(digest)
+        return len(huerfanos)
+
+
+# Instancia global de evidencias
+evidence = EvidenciasCota()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Almacén de evidencias de los informes")
+    parser.add_argument("--municipio", help="Municipio (por defecto el configurado)")
+    parser.add_argument("--verificar", action="store_true", help="Verifica la integridad de los objetos")
+    parser.add_argument("--miniaturas", action="store_true", help="Genera las miniaturas pendientes")
+    parser.add_argument("--limpiar", action="store_true", help="Elimina las evidencias sin enlaces")
+    args = parser.parse_args()
+
+    if not (args.verificar or args.miniaturas or args.limpiar):
+        parser.print_help()
+        sys.exit(0)
+    if args.municipio:
+        ConfigCota.seleccionar_municipio(args.municipio)
+
+    if args.miniaturas:
+        pendientes, generadas = EvidenciasCota.generar_pendientes()
+        print(f"🖼️ {generadas} de {pendientes} miniaturas pendientes generadas")
+    if args.limpiar:
+        print(f"🧹 {EvidenciasCota.limpiar()} evidencias sin enlaces eliminadas")
+    if args.verificar:
+        resumen = EvidenciasCota.verificar()
+        megabytes = resumen["bytes"] / (1024 * 1024)
+        print(f"🔍 {resumen['objetos']} evidencias ({megabytes:.1f} MB) verificadas")
+        for digest in resumen["corruptos"]:
+            print(f"❌ Corrupta: {digest}")
+        for digest in resumen["faltantes"]:
+            print(f"❌ Falta el objeto: {digest}")
+        if resumen["corruptos"] or resumen["faltantes"]:
+            sys.exit(1)
+        print("✅ Evidencias íntegras")
@@ -0,0 +1,326 @@
+"""
+EXPORTACIÓN DE INFORMES A PDF Y DOCX - ALCALDÍA DE COTA
+
+Sin dependencias externas: el PDF y el DOCX se escriben directamente
+(PDF 1.4 con fuentes estándar; DOCX como paquete OOXML mínimo).
+"""
+import contextvars
+import hashlib
+import json
+import textwrap
+import threading
+import zipfile
+import zlib
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+from .atomic import EscrituraCota
+from .config import ConfigCota
+from .templates import TemplatesCota
+
+FORMATOS = ("pdf", "docx")
+
+
+def _lineas_informe(contexto, formato):
+    """Secciones del informe como líneas de texto; la de firmas se maqueta aparte"""
+    for seccion, plantilla in TemplatesCota.secciones(formato):
+        if seccion == "firmas":
+            yield "firmas", None
+            continue
+        for linea in plantilla.renderizar(contexto).splitlines():
+            yield "linea", linea
+
+
+def _bloques(contexto, formato):
+    """Convierte las líneas en bloques: regla, titulo, texto o firmas"""
+    lineas = list(_lineas_informe(contexto, formato))
+    for n, (tipo, linea) in enumerate(lineas):
+        if tipo == "firmas":
+            yield "firmas", None
+        elif linea and set(linea) == {"="}:
+            yield "regla", None
+        elif (0 < n < len(lineas) - 1 and lineas[n - 1][1] and set(lineas[n - 1][1]) == {"="}
+              and lineas[n + 1][1] and set(lineas[n + 1][1]) == {"="}):
+            yield "titulo", linea
+        else:
+            yield "texto", linea
+
+
+# ============================================
+# PDF
+# ============================================
+class _EscritorPDF:
+    """Escribe un PDF página por página directamente en un archivo binario"""
+
+    ANCHO, ALTO = 612, 792   # Carta
+    MARGEN = 56
+    TAMANO = 9
+    INTERLINEA = 12
+    COLUMNAS_TEXTO = 90      # caracteres por línea en Courier 9 pt
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.posicion = 0
+        self.desplazamientos = {}
+        self.paginas = []
+        self.siguiente = 5   # 1 catálogo, 2 páginas, 3-4 fuentes
+        self.operaciones = []
+        self.y = self.ALTO - self.MARGEN
+        self._escribir(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _escribir(self, datos):
+        self.destino.write(datos)
+        self.posicion += len(datos)
+
+    def _objeto(self, numero, cuerpo):
+        self.desplazamientos[numero] = self.posicion
+        self._escribir(f"{numero} 0 obj\n".encode() + cuerpo + b"\nendobj\n")
+
+    def _numero(self):
+        numero = self.siguiente
+        self.siguiente += 1
+        return numero
+
+    @staticmethod
+    def _cadena(texto):
+        datos = texto.encode("cp1252", errors="replace")
+        return b"(" + datos.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+    def asegurar(self, alto):
+        """Salta de página si no caben 'alto' puntos"""
+        if self.y - alto < self.MARGEN:
+            self._cerrar_pagina()
+
+    def texto(self, texto, negrita=False, tamano=None, x=None):
+        tamano = tamano or self.TAMANO
+        self.asegurar(self.INTERLINEA)
+        self.texto_en(texto, x if x is not None else self.MARGEN, self.y, negrita, tamano)
+        self.y -= max(self.INTERLINEA, tamano + 3)
+
+    def texto_en(self, texto, x, y, negrita=False, tamano=None):
+        fuente = b"/F2" if negrita else b"/F1"
+        self.operaciones.append(
+            b"BT " + fuente + f" {tamano or self.TAMANO} Tf {x:.1f} {y:.1f} Td ".encode()
+            + self._cadena(texto) + b" Tj ET"
+        )
+
+    def linea(self, x1, y, x2):
+        self.operaciones.append(f"0.6 w {x1:.1f} {y:.1f} m {x2:.1f} {y:.1f} l S".encode())
+
+    def regla(self):
+        self.asegurar(8)
+        self.operaciones.append(b"0.12 0.23 0.54 RG")
+        self.linea(self.MARGEN, self.y + 3, self.ANCHO - self.MARGEN)
+        self.operaciones.append(b"0 0 0 RG")
+        self.y -= 8
+
+    def firmas(self, firmantes):
+        """Bloque de firmas en columnas: línea, nombre y cargo"""
+        alto = 3 * self.INTERLINEA + 50
+        self.asegurar(alto)
+        ancho = (self.ANCHO - 2 * self.MARGEN) / len(firmantes)
+        base = self.y - 40
+        for n, (rol, nombre, cargo) in enumerate(firmantes):
+            x = self.MARGEN + n * ancho
+            self.texto_en(rol, x, self.y, negrita=True)
+            self.linea(x, base, x + ancho - 20)
+            for k, valor in enumerate((nombre, cargo)):
+                parte = (textwrap.wrap(str(valor), int((ancho - 20) / 5.4)) or [""])[0]
+                self.texto_en(parte, x, base - 12 - k * self.INTERLINEA)
+        self.y -= alto
+
+    def _cerrar_pagina(self):
+        contenido = zlib.compress(b"\n".join(self.operaciones))
+        numero_contenido = self._numero()
+        self._objeto(numero_contenido, f"<< /Length {len(contenido)} /Filter /FlateDecode >>\nstream\n".encode()
+                     + contenido + b"\nendstream")
+        numero_pagina = self._numero()
+        self._objeto(numero_pagina, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.ANCHO} {self.ALTO}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {numero_contenido} 0 R >>"
+        ).encode())
+        self.paginas.append(numero_pagina)
+        self.operaciones = []
+        self.y = self.ALTO - self.MARGEN
+
+    def cerrar(self, titulo=""):
+        if self.operaciones or not self.paginas:
+            self._cerrar_pagina()
+        self._objeto(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+        self._objeto(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        hijos = " ".join(f"{n} 0 R" for n in self.paginas)
+        self._objeto(2, f"<< /Type /Pages /Kids [{hijos}] /Count {len(self.paginas)} >>".encode())
+        self._objeto(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        informacion = self._numero()
+        self._objeto(informacion, b"<< /Title " + self._cadena(titulo) + b" /Producer (Sistema de Gestion Cota) >>")
+
+        inicio_xref = self.posicion
+        total = self.siguiente
+        self._escribir(f"xref\n0 {total}\n0000000000 65535 f \n".encode())
+        for numero in range(1, total):
+            self._escribir(f"{self.desplazamientos[numero]:010d} 00000 n \n".encode())
+        self._escribir(
+            f"trailer\n<< /Size {total} /Root 1 0 R /Info {informacion} 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode()
+        )
+
+
+# ============================================
+# DOCX
+# ============================================
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+_W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _parrafo_docx(texto="", negrita=False, regla=False):
+    propiedades = ""
+    if regla:
+        propiedades = ('<w:pPr><w:pBdr><w:bottom w:val="single" w:sz="8" w:space="1" w:color="1E3A8A"/>'
+                       '</w:pBdr></w:pPr>')
+    estilo = '<w:rFonts w:ascii="Consolas" w:hAnsi="Consolas"/><w:sz w:val="18"/>'
+    if negrita:
+        estilo += "<w:b/>"
+    return (f'<w:p>{propiedades}<w:r><w:rPr>{estilo}</w:rPr>'
+            f'<w:t xml:space="preserve">{escape(texto)}</w:t></w:r></w:p>')
+
+
+def _firmas_docx(firmantes):
+    celdas = []
+    for rol, nombre, cargo in firmantes:
+        celdas.append(
+            '<w:tc><w:tcPr><w:tcW w:w="3000" w:type="dxa"/></w:tcPr>'
+            + _parrafo_docx(rol, negrita=True) + _parrafo_docx() + _parrafo_docx()
+            + '<w:p><w:pPr><w:pBdr><w:top w:val="single" w:sz="6" w:space="1" w:color="000000"/></w:pBdr></w:pPr>'
+            + f'<w:r><w:t xml:space="preserve">{escape(str(nombre))}</w:t></w:r></w:p>'
+            + _parrafo_docx(str(cargo)) + "</w:tc>"
+        )
+    return ('<w:tbl><w:tblPr><w:tblW w:w="9000" w:type="dxa"/></w:tblPr>'
+            '<w:tblGrid>' + '<w:gridCol w:w="3000"/>' * len(firmantes) + '</w:tblGrid>'
+            f'<w:tr>{"".join(celdas)}</w:tr></w:tbl>')
+
+
+# ============================================
+# EXPORTACIÓN
+# ============================================
+class ExportCota:
+    """Exporta el modelo de informe a PDF/DOCX en un pool de hilos, con caché por contenido"""
+
+    HILOS = 2
+
+    _pool = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def firmantes(contexto):
+        """Firmas del informe: (rol, nombre, cargo)"""
+        return [
+            ("Elaborado por:", contexto["responsable"], contexto["cargo"]),
+            ("Revisado por:", contexto["alcaldia"]["secretario_tic"], "Oficina de Sistemas y TIC"),
+            ("Aprobado por:", contexto["alcaldia"]["alcalde"],
+             f"Alcaldía Municipal de {contexto['municipio']['nombre']}"),
+        ]
+
+    @staticmethod
+    def clave(contexto, formato_salida, formato="mensual"):
+        """Hash del contenido que determina el artefacto exportado"""
+        texto = json.dumps(
+            [contexto, formato_salida, [p.fuente for _, p in TemplatesCota.secciones(formato)]],
+            sort_keys=True, ensure_ascii=False, default=lambda v: dict(v) if isinstance(v, Mapping) else str(v)
+        )
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def directorio():
+        return ConfigCota.obtener_ruta("reports") / "exportados"
+
+    @classmethod
+    def escribir_pdf(cls, contexto, destino, formato="mensual"):
+        """Escribe el PDF en un archivo binario abierto"""
+        pdf = _EscritorPDF(destino)
+        for tipo, linea in _bloques(contexto, formato):
+            if tipo == "regla":
+                pdf.regla()
+            elif tipo == "firmas":
+                pdf.regla()
+                pdf.texto("FIRMAS", negrita=True, tamano=11)
+                pdf.regla()
+                pdf.firmas(cls.firmantes(contexto))
+            elif tipo == "titulo":
+                pdf.texto(linea, negrita=True, tamano=11)
+            else:
+                for parte in textwrap.wrap(linea, pdf.COLUMNAS_TEXTO) or [""]:
+                    pdf.texto(parte)
+        pdf.cerrar(titulo=f"Informe {contexto['mes']} {contexto['año']}")
+
+    @classmethod
+    def escribir_docx(cls, contexto, destino, formato="mensual"):
+        """Escribe el DOCX en un archivo binario abierto (el XML se genera en flujo)"""
+        with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as paquete:
+            paquete.writestr("[Content_Types].xml", _CONTENT_TYPES)
+            paquete.writestr("_rels/.rels", _RELS)
+            with paquete.open("word/document.xml", "w") as documento:
+                documento.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                                f'<w:document {_W}><w:body>'.encode())
+                for tipo, linea in _bloques(contexto, formato):
+                    if tipo == "regla":
+                        fragmento = _parrafo_docx(regla=True)
+                    elif tipo == "firmas":
+                        fragmento = (_parrafo_docx("FIRMAS", negrita=True)
+                                     + _firmas_docx(cls.firmantes(contexto)) + _parrafo_docx())
+                    else:
+                        fragmento = _parrafo_docx(linea, negrita=(tipo == "titulo"))
+                    documento.write(fragmento.encode("utf-8"))
+                documento.write(b'<w:sectPr><w:pgSz w:w="12240" w:h="15840"/></w:sectPr></w:body></w:document>')
+
+    @classmethod
+    def exportar(cls, contexto, formato_salida="pdf", formato="mensual"):
+        """Exporta a disco (o reutiliza el artefacto en caché) y devuelve la ruta"""
+        if formato_salida not in FORMATOS:
+            raise ValueError(f"Formato de exportación no soportado: {formato_salida}")
+        directorio = cls.directorio()
+        directorio.mkdir(parents=True, exist_ok=True)
+        ruta = directorio / f"{cls.clave(contexto, formato_salida, formato)}.{formato_salida}"
+        if ruta.exists():
+            return ruta
+
+        escribir = cls.escribir_pdf if formato_salida == "pdf" else cls.escribir_docx
+        with EscrituraCota.atomica(ruta) as destino:
+            escribir(contexto, destino, formato)
+        return ruta
+
+    @classmethod
+    def pool(cls):
+        with cls._lock:
+            if cls._pool is None:
+                cls._pool = ThreadPoolExecutor(max_workers=cls.HILOS, thread_name_prefix="ExportCota")
+            return cls._pool
+
+    @classmethod
+    def exportar_async(cls, contexto, formato_salida="pdf", formato="mensual"):
+        """Encola la exportación en el pool; devuelve un Future con la ruta
+
+        La tarea corre en el contexto de quien la encola (municipio activo).
+        """
+        return cls.pool().submit(contextvars.copy_context().run, cls.exportar, contexto, formato_salida, formato)
+
+    @classmethod
+    def exportar_lote(cls, contextos, formatos=FORMATOS, formato="mensual", hilos=None):
+        """Exporta muchos informes; cada artefacto se escribe directo a disco"""
+        with ThreadPoolExecutor(max_workers=hilos or cls.HILOS) as pool:
+            futuros = [pool.submit(contextvars.copy_context().run, cls.exportar, contexto, salida, formato)
+                       for contexto in contextos for salida in formatos]
+            return [futuro.result() for futuro in futuros]
+
+
+# Instancia global de exportación
+export = ExportCota()
@@ -0,0 +1,452 @@
+"""
+IMPORTACIÓN DE INDICADORES DESDE CSV/EXCEL - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.importer analitica_web.csv --dependencia "Oficina de Sistemas y TIC"
+    python -m app.importer pqrs_2024.xlsx --hoja Datos --simular
+    python -m app.importer exportes/*.csv --municipio chia --json
+
+Formatos de fila aceptados (los encabezados no distinguen mayúsculas ni tildes):
+    ancho: fecha, [dependencia], visitas, pqrs, ...   (una columna por indicador,
+           con la clave o la etiqueta de ConfigCota.INDICADORES)
+    largo: fecha, [dependencia], indicador, valor
+
+Las filas diarias se consolidan en el valor mensual según la "agregacion" del
+indicador (suma, promedio o último). El archivo se lee por lotes: la memoria
+depende del número de meses e indicadores, no del número de filas. Los
+archivos .xlsx requieren openpyxl (opcional).
+"""
+import argparse
+import codecs
+import csv
+import functools
+import io
+import json
+import math
+import re
+import sys
+import time
+import unicodedata
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+from .config import ConfigCota
+from .metrics import medir
+from .storage import StorageCota
+from .utils import UtilsCota
+
+# Límites de valor por indicador (los demás solo deben ser >= 0)
+RANGOS = {"disponibilidad": (0, 100)}
+ALIAS_COLUMNAS = {
+    "fecha": ("fecha", "dia", "date", "day", "periodo"),
+    "dependencia": ("dependencia", "area", "oficina", "secretaria"),
+    "indicador": ("indicador", "metrica", "metric"),
+    "valor": ("valor", "value", "cantidad", "total"),
+}
+FORMATOS_FECHA = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%Y-%m", "%m/%Y")
+
+
+@functools.lru_cache(maxsize=4096)
+def _clave(texto):
+    """'Visitas Portal ' -> 'visitas portal' (sin tildes ni signos)"""
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join("".join(c if c.isalnum() else " " for c in texto.lower()).split())
+
+
+class ErrorImportacion(ValueError):
+    """El archivo no se puede importar (formato, columnas o dependencia opcional)"""
+
+
+class Acumulador:
+    """Consolidado de un (dependencia, año, mes, indicador) con memoria constante"""
+
+    __slots__ = ("suma", "n", "fecha", "ultimo")
+
+    def __init__(self):
+        self.suma = 0.0
+        self.n = 0
+        self.fecha = None
+        self.ultimo = None
+
+    def agregar(self, fecha, valor):
+        self.suma += valor
+        self.n += 1
+        # Filas repetidas del mismo día: la posterior en el archivo gana
+        if self.fecha is None or fecha >= self.fecha:
+            self.fecha, self.ultimo = fecha, valor
+
+    def valor(self, agregacion):
+        if agregacion == "ultimo":
+            return self.ultimo
+        if agregacion == "promedio":
+            return round(self.suma / self.n, 4)
+        return self.suma
+
+
+class ImportadorCota:
+    """Lectura por lotes, validación y consolidación mensual de exportes diarios"""
+
+    LOTE = 5000
+    MAX_ERRORES = 50
+    EXTENSIONES_EXCEL = (".xlsx", ".xlsm")
+
+    # ============================================
+    # LECTURA
+    # ============================================
+    @staticmethod
+    def _abrir_texto(flujo):
+        """Texto de un flujo binario: UTF-8 (con o sin BOM) o, si no decodifica, Windows-1252"""
+        muestra = flujo.read(64 * 1024)
+        flujo.seek(0)
+        try:
+            # Un carácter multibyte puede quedar partido al final de la muestra
+            codecs.getincrementaldecoder("utf-8")().decode(muestra, final=False)
+            codificacion = "utf-8-sig"
+        except UnicodeDecodeError:
+            codificacion = "cp1252"
+        return io.TextIOWrapper(flujo, encoding=codificacion, newline="")
+
+    @classmethod
+    def _filas_csv(cls, flujo, delimitador=None):
+        texto = cls._abrir_texto(flujo)
+        if delimitador is None:
+            muestra = texto.read(16 * 1024)
+            texto.seek(0)
+            try:
+                delimitador = csv.Sniffer().sniff(muestra, delimiters=",;\t|").delimiter
+            except csv.Error:
+                delimitador = ","
+        try:
+            yield from csv.reader(texto, delimiter=delimitador)
+        finally:
+            if not flujo.closed:
+                texto.detach()
+
+    @classmethod
+    def _filas_excel(cls, flujo, hoja=None):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ErrorImportacion("Para importar archivos Excel instale openpyxl (pip install openpyxl)")
+        # read_only recorre la hoja sin cargarla completa en memoria
+        libro = load_workbook(flujo, read_only=True, data_only=True)
+        try:
+            if hoja is not None and hoja not in libro.sheetnames:
+                raise ErrorImportacion(f"La hoja '{hoja}' no existe ({', '.join(libro.sheetnames)})")
+            hoja = libro[hoja] if hoja else libro.active
+            yield from hoja.iter_rows(values_only=True)
+        finally:
+            libro.close()
+
+    @classmethod
+    def filas(cls, flujo, nombre="", delimitador=None, hoja=None):
+        """Filas (listas de celdas) de un flujo binario según la extensión del nombre"""
+        if Path(nombre).suffix.lower() in cls.EXTENSIONES_EXCEL:
+            return cls._filas_excel(flujo, hoja)
+        return cls._filas_csv(flujo, delimitador)
+
+    # ============================================
+    # VALIDACIÓN
+    # ============================================
+    @staticmethod
+    def _columnas_indicador():
+        columnas = {}
+        for indicador, datos in ConfigCota.INDICADORES.items():
+            columnas[_clave(indicador)] = indicador
+            columnas[_clave(datos["etiqueta"])] = indicador
+        return columnas
+
+    @classmethod
+    def _esquema(cls, encabezado):
+        """Posición de cada columna: {'fecha': i, 'dependencia': i|None, 'indicadores': {i: indicador}}"""
+        claves = [_clave(celda) for celda in encabezado]
+
+        def posicion(campo):
+            return next((i for i, clave in enumerate(claves) if clave in ALIAS_COLUMNAS[campo]), None)
+
+        esquema = {campo: posicion(campo) for campo in ALIAS_COLUMNAS}
+        if esquema["fecha"] is None:
+            raise ErrorImportacion("El archivo no tiene columna de fecha")
+
+        if esquema["indicador"] is not None and esquema["valor"] is not None:
+            esquema["indicadores"] = None  # formato largo
+        else:
+            columnas = cls._columnas_indicador()
+            esquema["indicadores"] = {i: columnas[clave] for i, clave in enumerate(claves) if clave in columnas}
+            if not esquema["indicadores"]:
+                raise ErrorImportacion(
+                    "No se reconoció ninguna columna de indicador (use las claves o etiquetas: "
+                    f"{', '.join(ConfigCota.INDICADORES)})"
+                )
+        return esquema
+
+    @staticmethod
+    def _fecha(celda):
+        if isinstance(celda, datetime):
+            return celda.date()
+        if isinstance(celda, date):
+            return celda
+        texto = str(celda or "").strip()[:10]
+        try:
+            return date.fromisoformat(texto)
+        except ValueError:
+            pass
+        for formato in FORMATOS_FECHA:
+            try:
+                return datetime.strptime(texto, formato).date()
+            except ValueError:
+                continue
+        raise ValueError(f"fecha no reconocida: {celda!r}")
+
+    @staticmethod
+    def _numero(celda):
+        """Números de exportes: 1234 / 1.234 / 1,234 / 1.234,5 / 1,234.5 / 99,5 %"""
+        if isinstance(celda, str) and celda.isdigit():
+            return float(celda)
+        if isinstance(celda, (int, float)) and not isinstance(celda, bool):
+            valor = float(celda)
+        else:
+            texto = str(celda).strip().replace("%", "").replace(" ", "").replace("\xa0", "")
+            if "," in texto and "." in texto:
+                # El separador que aparece de último es el decimal
+                miles, decimal = (".", ",") if texto.rfind(",") > texto.rfind(".") else (",", ".")
+                texto = texto.replace(miles, "").replace(decimal, ".")
+            elif re.fullmatch(r"-?\d{1,3}([.,]\d{3})+", texto):
+                texto = texto.replace(",", "").replace(".", "")
+            else:
+                texto = texto.replace(",", ".")
+            valor = float(texto)
+        # float() acepta "nan" e "inf", y las hojas de cálculo pueden traerlos como celdas
+        if not math.isfinite(valor):
+            raise ValueError(f"valor no finito: {celda!r}")
+        return valor
+
+    @staticmethod
+    def _dependencias(configuracion):
+        """{clave normalizada: nombre oficial}; vacío si el municipio no define dependencias"""
+        return {_clave(d): d for d in configuracion.get("dependencias_municipales") or ()}
+
+    @staticmethod
+    def advertencias_meta(configuracion, indicadores):
+        """Indicadores importados cuya meta no está definida en indicadores_meta"""
+        metas = configuracion.get("indicadores_meta", {})
+        advertencias = []
+        for indicador in sorted(indicadores):
+            ruta = ConfigCota.INDICADORES[indicador].get("meta")
+            if ruta and metas.get(ruta[0], {}).get(ruta[1]) is None:
+                advertencias.append(f"{indicador}: sin meta en indicadores_meta.{ruta[0]}.{ruta[1]}")
+        return advertencias
+
+    @classmethod
+    def _fila(cls, celdas, esquema, columnas, dependencias, dependencia):
+        """Valida una fila completa: (fecha, dependencia, [(indicador, valor)]) o ValueError"""
+        def leer(campo):
+            i = esquema[campo]
+            return celdas[i] if i is not None and i < len(celdas) else None
+
+        fecha = cls._fecha(leer("fecha"))
+        celda = leer("dependencia")
+        if celda not in (None, ""):
+            nombre_dependencia = str(celda).strip()
+            if dependencias:
+                if _clave(nombre_dependencia) not in dependencias:
+                    raise ValueError(f"dependencia no configurada: {nombre_dependencia}")
+                nombre_dependencia = dependencias[_clave(nombre_dependencia)]
+        elif dependencia is not None:
+            nombre_dependencia = dependencia
+        else:
+            raise ValueError("fila sin dependencia")
+
+        if esquema["indicadores"] is None:
+            indicador = columnas.get(_clave(leer("indicador")))
+            if indicador is None:
+                raise ValueError(f"indicador desconocido: {leer('indicador')}")
+            pares = [(indicador, leer("valor"))]
+        else:
+            pares = [(indicador, celdas[i]) for i, indicador in esquema["indicadores"].items()
+                     if i < len(celdas) and celdas[i] not in (None, "")]
+
+        valores = []
+        for indicador, celda in pares:
+            try:
+                valor = cls._numero(celda)
+            except ValueError:
+                raise ValueError(f"{indicador}: valor no numérico {celda!r}")
+            minimo, maximo = RANGOS.get(indicador, (0, None))
+            if valor < minimo or (maximo is not None and valor > maximo):
+                raise ValueError(f"{indicador}: {celda} fuera de rango")
+            valores.append((indicador, valor))
+        return fecha, nombre_dependencia, valores
+
+    # ============================================
+    # CONSOLIDACIÓN
+    # ============================================
+    @classmethod
+    @medir("importar.analizar")
+    def analizar(cls, flujo, nombre="", dependencia=None, delimitador=None, hoja=None):
+        """Lee, valida y consolida un archivo sin escribir en el almacén
+
+        Devuelve {archivo, filas, validas, rechazadas, errores: [(línea, motivo)],
+        advertencias, periodos: {(dependencia, año, mes): {indicador: valor}},
+        dias: {(dependencia, año, mes): días con datos}, segundos}.
+        """
+        inicio = time.perf_counter()
+        configuracion = ConfigCota.cargar_configuracion()
+        dependencias = cls._dependencias(configuracion)
+        if dependencia is not None and dependencias and _clave(dependencia) not in dependencias:
+            raise ErrorImportacion(f"Dependencia no configurada: {dependencia}")
+        if dependencia is not None:
+            dependencia = dependencias.get(_clave(dependencia), dependencia)
+
+        filas = cls.filas(flujo, nombre, delimitador, hoja)
+        try:
+            encabezado = next(filas, None)
+            if encabezado is None:
+                raise ErrorImportacion("El archivo está vacío")
+            esquema = cls._esquema(encabezado)
+            if esquema["dependencia"] is None and dependencia is None:
+                raise ErrorImportacion("El archivo no tiene columna de dependencia: indique una dependencia")
+
+            columnas = cls._columnas_indicador()
+            acumulados = {}
+            dias = {}
+            resultado = {"archivo": nombre, "filas": 0, "validas": 0, "rechazadas": 0, "errores": []}
+
+            def rechazar(linea, motivo):
+                resultado["rechazadas"] += 1
+                if len(resultado["errores"]) < cls.MAX_ERRORES:
+                    resultado["errores"].append((linea, motivo))
+
+            linea = 1
+            while True:
+                lote = list(islice(filas, cls.LOTE))
+                if not lote:
+                    break
+                for celdas in lote:
+                    linea += 1
+                    if not any(celda not in (None, "") for celda in celdas):
+                        continue
+                    resultado["filas"] += 1
+                    try:
+                        fecha, nombre_dependencia, valores = cls._fila(
+                            celdas, esquema, columnas, dependencias, dependencia
+                        )
+                    except ValueError as e:
+                        rechazar(linea, str(e))
+                        continue
+
+                    # La fila se acepta completa o no se acepta
+                    periodo = (nombre_dependencia, fecha.year, fecha.month)
+                    for indicador, valor in valores:
+                        acumulador = acumulados.get(periodo + (indicador,))
+                        if acumulador is None:
+                            acumulador = acumulados[periodo + (indicador,)] = Acumulador()
+                        acumulador.agregar(fecha, valor)
+                    dias.setdefault(periodo, set()).add(fecha.day)
+                    resultado["validas"] += 1
+        finally:
+            filas.close()
+
+        periodos = {}
+        for (nombre_dependencia, año, mes, indicador), acumulador in sorted(acumulados.items()):
+            valor = acumulador.valor(ConfigCota.INDICADORES[indicador].get("agregacion", "suma"))
+            periodos.setdefault((nombre_dependencia, año, mes), {})[indicador] = StorageCota._valor(valor)
+
+        resultado["periodos"] = periodos
+        resultado["dias"] = {periodo: len(d) for periodo, d in dias.items()}
+        resultado["advertencias"] = cls.advertencias_meta(
+            configuracion, {indicador for clave in acumulados for indicador in clave[3:]}
+        )
+        resultado["segundos"] = round(time.perf_counter() - inicio, 3)
+        return resultado
+
+    @staticmethod
+    @medir("importar.guardar")
+    def guardar(resultado):
+        """Escribe los consolidados de analizar() en el almacén; devuelve los valores guardados"""
+        if not resultado["periodos"]:
+            return 0
+        guardados = StorageCota.guardar_indicadores_lote(resultado["periodos"])
+        UtilsCota.registrar_log(
+            f"Importación {resultado['archivo']}: {resultado['validas']} filas válidas, "
+            f"{resultado['rechazadas']} rechazadas, {len(resultado['periodos'])} períodos"
+        )
+        return guardados
+
+    @classmethod
+    def importar_archivo(cls, ruta, dependencia=None, delimitador=None, hoja=None, simular=False):
+        """Analiza y (salvo simular) guarda un archivo del disco"""
+        ruta = Path(ruta)
+        with open(ruta, "rb") as flujo:
+            resultado = cls.analizar(flujo, ruta.name, dependencia, delimitador, hoja)
+        resultado["guardados"] = 0 if simular else cls.guardar(resultado)
+        return resultado
+
+    @staticmethod
+    def serializable(resultado):
+        """Resultado con claves de texto (para JSON)"""
+        copia = dict(resultado)
+        copia["periodos"] = [
+            {"dependencia": d, "año": a, "mes": m, "dias": resultado["dias"][(d, a, m)], "indicadores": valores}
+            for (d, a, m), valores in resultado["periodos"].items()
+        ]
+        copia.pop("dias")
+        copia["errores"] = [{"linea": linea, "motivo": motivo} for linea, motivo in resultado["errores"]]
+        return copia
+
+
+# Instancia global del importador
+importer = ImportadorCota()
+
+
+def imprimir(resultado, salida=sys.stdout):
+    print(f"📥 {resultado['archivo']}: {resultado['filas']} filas · {resultado['validas']} válidas · "
+          f"{resultado['rechazadas']} rechazadas · {resultado['segundos']} s", file=salida)
+    for (dependencia, año, mes), valores in resultado["periodos"].items():
+        detalle = ", ".join(f"{indicador}={valor}" for indicador, valor in valores.items())
+        print(f"   • {dependencia} - {ConfigCota.MESES[mes - 1]} {año} "
+              f"({resultado['dias'][(dependencia, año, mes)]} días): {detalle}", file=salida)
+    for linea, motivo in resultado["errores"]:
+        print(f"   ✗ línea {linea}: {motivo}", file=salida)
+    if resultado["rechazadas"] > len(resultado["errores"]):
+        print(f"   … y {resultado['rechazadas'] - len(resultado['errores'])} filas rechazadas más", file=salida)
+    for advertencia in resultado["advertencias"]:
+        print(f"   ⚠️  {advertencia}", file=salida)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa indicadores diarios desde CSV/Excel y los consolida por mes")
+    parser.add_argument("archivos", nargs="+", type=Path)
+    parser.add_argument("--dependencia", help="Dependencia de las filas que no la indican")
+    parser.add_argument("--delimitador", help="Separador del CSV (por defecto se detecta)")
+    parser.add_argument("--hoja", help="Hoja del libro de Excel (por defecto, la activa)")
+    parser.add_argument("--municipio", help="Municipio configurado (por defecto, COTA_MUNICIPIO o cota)")
+    parser.add_argument("--simular", action="store_true", help="Solo valida y muestra el consolidado")
+    parser.add_argument("--json", action="store_true", help="Imprime el resultado en JSON")
+    args = parser.parse_args(argv)
+    if args.municipio:
+        ConfigCota.seleccionar_municipio(args.municipio)
+
+    resultados, fallidos = [], 0
+    for ruta in args.archivos:
+        try:
+            resultado = ImportadorCota.importar_archivo(ruta, args.dependencia, args.delimitador, args.hoja,
+                                                        args.simular)
+        except (ErrorImportacion, OSError) as e:
+            fallidos += 1
+            UtilsCota.registrar_log(f"Importación {ruta.name} fallida: {e}", "ERROR")
+            print(f"✗ {ruta}: {e}", file=sys.stderr)
+            continue
+        resultados.append(resultado)
+        if not args.json:
+            imprimir(resultado)
+            if not args.simular:
+                print(f"   💾 {resultado['guardados']} valores guardados")
+
+    if args.json:
+        print(json.dumps([ImportadorCota.serializable(r) for r in resultados], ensure_ascii=False, indent=2))
+    return 1 if fallidos or any(r["rechazadas"] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
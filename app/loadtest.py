@@ -0,0 +1,397 @@
+"""
+PRUEBA DE CARGA CON SESIONES CONCURRENTES - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.loadtest
+    python -m app.loadtest --sesiones 40 --informes 2 --pausa 0.5
+    python -m app.loadtest --sesiones 20 --guardar carga_20.json
+
+Levanta app/main.py con Streamlit en un puerto local, sobre un directorio
+temporal con la configuración sintética de app.bench (los datos reales no
+se tocan), y abre N sesiones a la vez por el mismo websocket que usa el
+navegador. Cada sesión elige su dependencia, escribe el responsable, marca
+actividades, llena los indicadores y pulsa "GENERAR INFORME COMPLETO".
+
+Reporta la latencia de cada tipo de rerun (p50/p90/p95/p99: desde que se
+envía el cambio hasta que el script termina), la memoria del servidor por
+sesión (RSS con todas las sesiones abiertas menos el RSS tras una sesión de
+calentamiento, dividido por N) y los informes escritos por segundo.
+
+No usa AppTest: cada AppTest reemplaza el Runtime global de Streamlit en
+cada ejecución, así que varias en paralelo en un proceso no son seguras, y
+no comparten las cachés como sí lo hace el servidor real. Todo corre sin
+red (localhost). La memoria se lee de /proc (Linux).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from .bench import PERCENTILES, GeneradorDatos, _percentil
+
+MAIN = Path(__file__).resolve().parent / "main.py"
+BOTON_GENERAR = "GENERAR INFORME COMPLETO"
+# Campo de WidgetState según el tipo de widget
+VALORES = {"checkbox": "bool_value", "selectbox": "int_value", "text_input": "string_value",
+           "number_input": "int_value", "slider": "double_array_value", "button": "trigger_value"}
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memoria_rss(pid):
+    """RSS del proceso en bytes (Linux); None si no se puede leer"""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class SesionCarga:
+    """Una sesión del navegador: mantiene los widgets de la página y mide cada rerun
+
+    Los mensajes son los protobuf de Streamlit (BackMsg / ForwardMsg). El
+    servidor conserva el estado de los widgets, así que cada rerun envía solo
+    el widget que cambió.
+    """
+
+    def __init__(self, url, tiempo_limite=120):
+        self.url = url
+        self.tiempo_limite = tiempo_limite
+        self.widgets = {}       # clave (o etiqueta si no tiene) -> (id, tipo, proto)
+        self.alertas = []
+        self.excepciones = []
+        self.latencias = []     # (acción, ms)
+        self._conexion = None
+
+    async def conectar(self):
+        from tornado.websocket import websocket_connect
+        self._conexion = await websocket_connect(self.url, max_message_size=256 * 1024 * 1024)
+
+    def cerrar(self):
+        if self._conexion is not None:
+            self._conexion.close()
+
+    async def rerun(self, accion, estados=()):
+        """Envía un rerun con los widgets indicados y espera el fin del script; devuelve ms"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        mensaje = BackMsg()
+        mensaje.rerun_script.query_string = ""
+        for estado in estados:
+            mensaje.rerun_script.widget_states.widgets.append(estado)
+        self.alertas, self.excepciones = [], []
+        inicio = time.perf_counter()
+        await self._conexion.write_message(mensaje.SerializeToString(), binary=True)
+        await asyncio.wait_for(self._esperar_fin(), self.tiempo_limite)
+        ms = (time.perf_counter() - inicio) * 1000
+        self.latencias.append((accion, ms))
+        return ms
+
+    async def _esperar_fin(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        while True:
+            datos = await self._conexion.read_message()
+            if datos is None:
+                raise ConnectionError("El servidor cerró la sesión")
+            mensaje = ForwardMsg()
+            mensaje.ParseFromString(datos)
+            tipo = mensaje.WhichOneof("type")
+            if tipo == "delta" and mensaje.delta.WhichOneof("type") == "new_element":
+                self._elemento(mensaje.delta.new_element)
+            elif tipo == "script_finished":
+                if mensaje.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    def _elemento(self, elemento):
+        tipo = elemento.WhichOneof("type")
+        proto = getattr(elemento, tipo)
+        if tipo in VALORES:
+            # id = "$$WIDGET_ID-<hash>-<clave>"; sin clave se usa la etiqueta
+            clave = proto.id.split("-", 2)[-1]
+            self.widgets[proto.label if clave == "None" else clave] = (proto.id, tipo, proto)
+        elif tipo == "alert":
+            self.alertas.append(proto.body)
+        elif tipo == "exception":
+            self.excepciones.append(f"{proto.type}: {proto.message}")
+
+    def estado(self, clave, valor):
+        """WidgetState del widget 'clave' con 'valor' (para un selectbox, la opción)"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        identificador, tipo, proto = self.widgets[clave]
+        estado = WidgetState(id=identificador)
+        if tipo == "selectbox":
+            valor = list(proto.options).index(valor)
+        if tipo == "slider":
+            estado.double_array_value.data.append(float(valor))
+        else:
+            setattr(estado, VALORES[tipo], valor)
+        return estado
+
+    def boton(self, texto):
+        return next(clave for clave, (_, tipo, proto) in self.widgets.items()
+                    if tipo == "button" and texto in proto.label)
+
+    async def cambiar(self, accion, clave, valor):
+        return await self.rerun(accion, [self.estado(clave, valor)])
+
+
+async def recorrer_formulario(sesion, dependencia, numero, informes, pausa, azar):
+    """Flujo de un funcionario: dependencia, responsable, actividades, indicadores y generar
+
+    Devuelve {ok, limitados, errores} de los clics en generar.
+    """
+    async def pensar():
+        if pausa:
+            await asyncio.sleep(azar.uniform(0, pausa))
+
+    await sesion.rerun("inicio")
+    await pensar()
+    await sesion.cambiar("dependencia", "dependencia", dependencia)
+    await pensar()
+    await sesion.cambiar("responsable", "responsable", f"Funcionario {numero:03d}")
+    actividades = [clave for clave, (_, tipo, _) in sesion.widgets.items() if tipo == "checkbox"]
+    for clave in azar.sample(actividades, azar.randint(3, min(8, len(actividades)))):
+        await pensar()
+        await sesion.cambiar("actividad", clave, True)
+
+    generador = GeneradorDatos(azar.random())
+    resultado = {"ok": 0, "limitados": 0, "errores": []}
+    for _ in range(informes):
+        for indicador, valor in generador.indicadores().items():
+            await pensar()
+            await sesion.cambiar("indicador", indicador, valor)
+        await pensar()
+        await sesion.rerun("generar", [sesion.estado(sesion.boton(BOTON_GENERAR), True)])
+        if any("EXITOSAMENTE" in alerta for alerta in sesion.alertas):
+            resultado["ok"] += 1
+        elif any(alerta.startswith("⏳") for alerta in sesion.alertas):
+            resultado["limitados"] += 1
+        else:
+            resultado["errores"].append("; ".join(sesion.excepciones + sesion.alertas) or "sin confirmación")
+    if sesion.excepciones:
+        resultado["errores"] += sesion.excepciones
+    return resultado
+
+
+# ============================================
+# SERVIDOR
+# ============================================
+def preparar_directorio(directorio, dependencias, semilla):
+    """cota.json sintético (el de app.bench) en un directorio nuevo; devuelve las dependencias"""
+    generador = GeneradorDatos(semilla, dependencias)
+    configuracion = generador.configuracion(proyectos=50)
+    (directorio / "config").mkdir(parents=True)
+    with open(directorio / "config" / "cota.json", "w", encoding="utf-8") as f:
+        json.dump(configuracion, f, ensure_ascii=False, indent=2)
+    return generador.dependencias
+
+
+def iniciar_servidor(directorio, puerto, informes):
+    """Streamlit sin navegador sobre 'directorio'; espera a que responda el health check"""
+    entorno = dict(os.environ, COTA_BASE_DIR=str(directorio), COTA_CONFIG_DIR=str(directorio / "config"),
+                   PYTHONPATH=os.pathsep.join(filter(None, (str(MAIN.parent.parent), os.environ.get("PYTHONPATH")))))
+    # El límite por usuario protege la operación real; aquí no debe cortar el flujo medido
+    entorno.setdefault("COTA_INFORMES_POR_MINUTO", str(max(5, informes)))
+    for variable in ("COTA_MUNICIPIO", "COTA_DATA_DIR", "COTA_REPORTS_DIR", "COTA_LOGS_DIR"):
+        entorno.pop(variable, None)
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(MAIN), "--server.port", str(puerto),
+         "--server.address", "127.0.0.1", "--server.headless", "true", "--browser.gatherUsageStats", "false",
+         "--server.fileWatcherType", "none", "--server.runOnSave", "false"],
+        env=entorno, cwd=directorio, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"Streamlit terminó al iniciar: {proceso.stderr.read().decode(errors='replace')[-500:]}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/_stcore/health", timeout=1) as respuesta:
+                if respuesta.status == 200:
+                    return proceso
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise TimeoutError("Streamlit no respondió en 60 s")
+
+
+def informes_escritos(directorio):
+    carpeta = directorio / "reports"
+    if not carpeta.is_dir():
+        return 0, 0
+    archivos = list(carpeta.rglob("Informe_*.txt"))
+    return len(archivos), sum(a.stat().st_size for a in archivos)
+
+
+# ============================================
+# PRUEBA
+# ============================================
+async def _carga(url, pid, dependencias, sesiones, informes, pausa, semilla):
+    # Calentamiento: importaciones, cachés de recursos y primer informe fuera de la medición
+    calentamiento = SesionCarga(url)
+    await calentamiento.conectar()
+    await recorrer_formulario(calentamiento, dependencias[0], 0, 1, 0, random.Random(semilla))
+    calentamiento.cerrar()
+    await asyncio.sleep(1)
+    rss_base = memoria_rss(pid)
+
+    picos = []
+
+    async def muestrear():
+        while True:
+            picos.append(memoria_rss(pid) or 0)
+            await asyncio.sleep(0.2)
+
+    muestreo = asyncio.create_task(muestrear())
+    conjunto = [SesionCarga(url) for _ in range(sesiones)]
+    inicio = time.perf_counter()
+    await asyncio.gather(*(s.conectar() for s in conjunto))
+    resultados = await asyncio.gather(*(
+        recorrer_formulario(s, dependencias[n % len(dependencias)], n + 1, informes, pausa,
+                            random.Random(semilla + n + 1))
+        for n, s in enumerate(conjunto)
+    ), return_exceptions=True)
+    duracion = time.perf_counter() - inicio
+    # Todas las sesiones siguen abiertas: su estado sigue en memoria del servidor
+    rss_sesiones = memoria_rss(pid)
+    muestreo.cancel()
+    for sesion in conjunto:
+        sesion.cerrar()
+    return conjunto, resultados, duracion, rss_base, rss_sesiones, max(picos, default=0) or None
+
+
+def resumir(latencias):
+    """{acción: {n, media_ms, p50_ms..., max_ms}} a partir de [(acción, ms)]"""
+    por_accion = {}
+    for accion, ms in latencias:
+        por_accion.setdefault(accion, []).append(ms)
+    por_accion["todas"] = [ms for _, ms in latencias]
+    resumen = {}
+    for accion, valores in por_accion.items():
+        ordenadas = sorted(valores)
+        resumen[accion] = {"n": len(valores), "media_ms": round(sum(valores) / len(valores), 1) if valores else 0.0,
+                           "max_ms": round(ordenadas[-1], 1) if ordenadas else 0.0}
+        for p in PERCENTILES:
+            resumen[accion][f"p{p}_ms"] = round(_percentil(ordenadas, p), 1)
+    return resumen
+
+
+def ejecutar(sesiones=10, informes=1, pausa=0.2, dependencias=10, semilla=2024, conservar=False):
+    """Ejecuta la prueba contra un servidor propio; devuelve {metadatos, reruns, informes, memoria}"""
+    directorio = Path(tempfile.mkdtemp(prefix="cota_carga_"))
+    puerto = _puerto_libre()
+    proceso = None
+    try:
+        nombres = preparar_directorio(directorio, dependencias, semilla)
+        print(f"🚀 Iniciando Streamlit en el puerto {puerto}...", file=sys.stderr)
+        proceso = iniciar_servidor(directorio, puerto, informes)
+        url = f"ws://127.0.0.1:{puerto}/_stcore/stream"
+        print(f"👥 {sesiones} sesiones × {informes} informes...", file=sys.stderr)
+
+        conjunto, resultados, duracion, rss_base, rss_sesiones, rss_pico = asyncio.run(
+            _carga(url, proceso.pid, nombres, sesiones, informes, pausa, semilla)
+        )
+        escritos, bytes_escritos = informes_escritos(directorio)
+
+        fallidas = [r for r in resultados if isinstance(r, BaseException)]
+        validos = [r for r in resultados if not isinstance(r, BaseException)]
+        generados = sum(r["ok"] for r in validos)
+        errores = [f"{type(e).__name__}: {e}" for e in fallidas] + [e for r in validos for e in r["errores"]]
+        memoria = {
+            "rss_base_mib": round(rss_base / 2 ** 20, 1) if rss_base else None,
+            "rss_sesiones_mib": round(rss_sesiones / 2 ** 20, 1) if rss_sesiones else None,
+            "rss_pico_mib": round(rss_pico / 2 ** 20, 1) if rss_pico else None,
+            "por_sesion_kib": round((rss_sesiones - rss_base) / sesiones / 1024, 1)
+                              if rss_base and rss_sesiones else None,
+        }
+        return {
+            "metadatos": {
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "cpus": os.cpu_count(),
+                "parametros": {"sesiones": sesiones, "informes": informes, "pausa": pausa,
+                               "dependencias": dependencias, "semilla": semilla},
+            },
+            "reruns": resumir([l for s in conjunto for l in s.latencias]),
+            "informes": {
+                "generados": generados,
+                "limitados": sum(r["limitados"] for r in validos),
+                "errores": errores,
+                # El calentamiento escribió uno antes de la medición
+                "archivos": max(escritos - 1, 0),
+                "kib_escritos": round(bytes_escritos / 1024, 1),
+                "duracion_s": round(duracion, 2),
+                "por_segundo": round(generados / duracion, 2) if duracion else 0.0,
+            },
+            "memoria": memoria,
+        }
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            try:
+                proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+        if conservar:
+            print(f"📁 Datos de la prueba conservados en {directorio}", file=sys.stderr)
+        else:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def imprimir(informe):
+    print(f"{'Rerun':<14}{'n':>7}{'media ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'máx ms':>10}")
+    for accion, r in informe["reruns"].items():
+        print(f"{accion:<14}{r['n']:>7}{r['media_ms']:>10.1f}{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}"
+              f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+    i, m = informe["informes"], informe["memoria"]
+    print(f"📄 {i['generados']} informes en {i['duracion_s']} s ({i['por_segundo']} informes/s, "
+          f"{i['archivos']} archivos, {i['kib_escritos']:,.0f} KiB); {i['limitados']} limitados, "
+          f"{len(i['errores'])} errores")
+    if m["por_sesion_kib"] is not None:
+        print(f"🧠 RSS del servidor: {m['rss_base_mib']} MiB tras calentar → {m['rss_sesiones_mib']} MiB con "
+              f"{informe['metadatos']['parametros']['sesiones']} sesiones (pico {m['rss_pico_mib']} MiB): "
+              f"{m['por_sesion_kib']:,.0f} KiB por sesión")
+    for error in i["errores"][:10]:
+        print(f"❌ {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de app/main.py con sesiones concurrentes")
+    parser.add_argument("--sesiones", type=int, default=10, help="Sesiones simultáneas")
+    parser.add_argument("--informes", type=int, default=1, help="Informes que genera cada sesión")
+    parser.add_argument("--pausa", type=float, default=0.2,
+                        help="Pausa máxima (s) entre acciones de un usuario; 0 para la carga máxima")
+    parser.add_argument("--dependencias", type=int, default=10)
+    parser.add_argument("--semilla", type=int, default=2024)
+    parser.add_argument("--guardar", type=Path, help="Guarda los resultados (JSON)")
+    parser.add_argument("--conservar", action="store_true", help="No borra el directorio temporal")
+    args = parser.parse_args(argv)
+
+    informe = ejecutar(args.sesiones, args.informes, args.pausa, args.dependencias, args.semilla, args.conservar)
+    imprimir(informe)
+    if args.guardar:
+        args.guardar.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados guardados en {args.guardar}")
+    return 1 if informe["informes"]["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+REGISTRO DE AUDITORÍA (LOG) - ALCALDÍA DE COTA
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from .config import ConfigCota
+
+class LoggerCota:
+    """Log asíncrono: los mensajes se encolan y un hilo los escribe por lotes
+
+    - Cola acotada: si el disco se atrasa, quien registra espera (no se pierden mensajes).
+    - Cada lote se escribe con una sola llamada write() en modo append, así las
+      líneas de sesiones o procesos concurrentes no se mezclan.
+    - Rotación por tamaño y por día (entre procesos es de mejor esfuerzo:
+      quien encuentra el archivo rotado simplemente lo reabre).
+    - Formato de texto o JSON Lines (COTA_LOG_FORMATO=json).
+    - Vaciado garantizado al cerrar el proceso (atexit).
+    """
+
+    TAMANO_COLA = 10000
+    TAMANO_LOTE = 500
+    INTERVALO_VACIADO = 0.5          # segundos máximos que un mensaje espera en la cola
+    TAMANO_MAXIMO = 5 * 1024 * 1024  # bytes antes de rotar
+    ROTACION_DIARIA = True           # rota si la última escritura fue en otro día
+    RESPALDOS = 10
+
+    def __init__(self, formato=None):
+        self.formato = formato or os.environ.get("COTA_LOG_FORMATO", "texto")
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+        atexit.register(self.cerrar)
+
+    def ruta(self):
+        """Archivo de log actual"""
+        nombre = "sistema.jsonl" if self.formato == "json" else "sistema.log"
+        return ConfigCota.LOGS_DIR / nombre
+
+    def registrar(self, mensaje, nivel="INFO"):
+        """Encola un mensaje; la fecha se toma en el momento del registro"""
+        self._asegurar_hilo()
+        self._cola.put((datetime.now(), nivel, str(mensaje)))
+
+    def vaciar(self, timeout=5.0):
+        """Espera a que estén escritos los mensajes encolados antes de esta llamada
+
+        Encola un Event que el hilo escritor activa al escribir el lote que lo
+        contiene; lo que otras sesiones registren después no hace esperar.
+        """
+        if self._hilo is None or self._pid != os.getpid():
+            return True
+        escrito = threading.Event()
+        self._cola.put(escrito)
+        limite = time.monotonic() + timeout
+        while not escrito.wait(0.05):
+            if time.monotonic() > limite or not self._hilo.is_alive():
+                return False
+        return True
+
+    def cerrar(self):
+        """Vacía la cola y detiene el hilo escritor"""
+        if self._hilo is None or self._pid != os.getpid():
+            return
+        self._cola.put(None)
+        self._hilo.join(timeout=5.0)
+        self._hilo = None
+
+    def _asegurar_hilo(self):
+        """Arranca el hilo escritor (también en procesos hijos creados con fork)"""
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is not None and self._pid == os.getpid():
+                return
+            self._cola = queue.Queue(maxsize=self.TAMANO_COLA)
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._escribir, name="LoggerCota", daemon=True)
+            self._hilo.start()
+
+    # ============================================
+    # HILO ESCRITOR
+    # ============================================
+    def _escribir(self):
+        archivo = None
+        terminar = False
+        while not terminar:
+            lote = []
+            try:
+                elemento = self._cola.get(timeout=self.INTERVALO_VACIADO)
+            except queue.Empty:
+                continue
+            limite = time.monotonic() + self.INTERVALO_VACIADO
+            # Pedidos de vaciar(): el lote se escribe ya y se avisa a quien espera
+            marcas = []
+            while True:
+                if elemento is None:
+                    terminar = True
+                elif isinstance(elemento, threading.Event):
+                    marcas.append(elemento)
+                else:
+                    lote.append(elemento)
+                if terminar or marcas or len(lote) >= self.TAMANO_LOTE:
+                    break
+                try:
+                    elemento = self._cola.get(timeout=max(0.0, limite - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            try:
+                if lote:
+                    archivo = self._preparar_archivo(archivo)
+                    os.write(archivo, "".join(self._formatear(*e) for e in lote).encode("utf-8"))
+            except OSError as e:
+                print(f"❌ Error escribiendo el log: {e}")
+            finally:
+                for marca in marcas:
+                    marca.set()
+                for _ in range(len(lote) + len(marcas) + (1 if terminar else 0)):
+                    self._cola.task_done()
+
+        if archivo is not None:
+            os.close(archivo)
+
+    def _formatear(self, fecha, nivel, mensaje):
+        if self.formato == "json":
+            return json.dumps({
+                "fecha": fecha.isoformat(timespec="milliseconds"),
+                "nivel": nivel,
+                "mensaje": mensaje,
+                "pid": self._pid
+            }, ensure_ascii=False) + "\n"
+        return f"[{fecha.strftime('%Y-%m-%d %H:%M:%S')}] [{nivel}] {mensaje}\n"
+
+    def _preparar_archivo(self, archivo):
+        """Abre, reabre (si otro proceso rotó) o rota el archivo antes de escribir"""
+        ruta = self.ruta()
+        if archivo is not None:
+            try:
+                actual = os.stat(ruta)
+                propio = os.fstat(archivo)
+                vigente = (actual.st_ino, actual.st_dev) == (propio.st_ino, propio.st_dev)
+            except OSError:
+                vigente = False
+            if not vigente:
+                os.close(archivo)
+                archivo = None
+
+        if archivo is None:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            archivo = os.open(ruta, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        estado = os.fstat(archivo)
+        if estado.st_size > 0 and (
+            estado.st_size >= self.TAMANO_MAXIMO
+            or self.ROTACION_DIARIA and date.fromtimestamp(estado.st_mtime) != date.today()
+        ):
+            os.close(archivo)
+            self._rotar(ruta)
+            archivo = os.open(ruta, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return archivo
+
+    def _rotar(self, ruta):
+        """sistema.log -> sistema.log.1 -> ... -> sistema.log.N"""
+        for numero in range(self.RESPALDOS - 1, 0, -1):
+            origen = ruta.with_name(f"{ruta.name}.{numero}")
+            if origen.exists():
+                os.replace(origen, ruta.with_name(f"{ruta.name}.{numero + 1}"))
+        if ruta.exists():
+            os.replace(ruta, ruta.with_name(f"{ruta.name}.1"))
+
+
+# Instancia global del log
+logger = LoggerCota()
@@ -7,58 +7,628 @@ ALCALDÍA MUNICIPAL DE COTA - VERSIÓN DEFINITIVA
 import streamlit as st
 import os
 import sys
+import time
 from datetime import datetime
 
 # Configurar rutas
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Configuración básica (sin módulos locales)
-config = {
-    "municipio": {
-        "nombre": "Cota", 
-        "nombre_completo": "Municipio de Cota",
-        "codigo_dane": "25290",
-        "nit": "899999034-1",
-        "departamento": "Cundinamarca"
-    },
-    "alcaldia": {
-        "sitio_web": "https://www.cota-cundinamarca.gov.co",
-        "correo_sistemas": "sistemas@cota-cundinamarca.gov.co",
-        "direccion": "Cra 5 # 4-30, Cota, Cundinamarca",
-        "telefono_principal": "(+57 1) 896 7000",
-        "secretario_tic": "ING. CARLOS ALBERTO GÓMEZ",
-        "alcalde": "DR. JUAN PABLO GARCÍA"
-    },
-    "sistema": {
-        "version": "1.0.0"
+from app.auth import AutenticacionCota, ErrorAutenticacion
+from app.config import ConfigCota
+from app.dashboard import GRANULARIDADES, TableroCota
+from app.drafts import BorradoresCota
+from app.evidence import TIPOS as TIPOS_EVIDENCIA, ErrorEvidencia, EvidenciasCota
+from app.export import ExportCota
+from app.importer import ErrorImportacion, ImportadorCota
+from app.metrics import MetricasCota, cronometro
+from app.projects import ProyectosCota
+from app.utils import UtilsCota
+from app.search import BusquedaCota
+from app.storage import StorageCota
+from app.templates import TemplatesCota
+
+# ============================================
+# RECURSOS EN CACHÉ (se construyen una vez por proceso)
+# ============================================
+@st.cache_resource(max_entries=32, show_spinner=False)
+def cargar_config(municipio, version):
+    """Configuración compartida entre sesiones; la clave es el municipio y la firma de su archivo"""
+    return ConfigCota.cargar_configuracion(municipio)
+
+@st.cache_resource(show_spinner=False)
+def catalogo_actividades():
+    """Actividades por categoría con sus claves de widget precalculadas"""
+    actividades_categorias = {
+        "Planificación": (
+            "Revisión política gobierno digital",
+            "Actualización diagnóstico TIC",
+            "Planificación estratégica",
+            "Definición de indicadores"
+        ),
+        "Implementación": (
+            "Desarrollo portal web",
+            "Configuración sistemas",
+            "Implementación seguridad",
+            "Migración sistemas"
+        ),
+        "Seguimiento": (
+            "Monitoreo indicadores",
+            "Seguimiento proyectos",
+            "Análisis métricas",
+            "Reporte novedades"
+        ),
+        "Capacitación": (
+            "Capacitación funcionarios",
+            "Entrenamiento seguridad",
+            "Charlas sensibilización",
+            "Asesoría técnica"
+        )
+    }
+    return tuple(
+        (categoria, tuple((actividad, f"{categoria}_{actividad}") for actividad in actividades))
+        for categoria, actividades in actividades_categorias.items()
+    )
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def fragmentos_html(municipio, version):
+    """Bloques HTML estáticos que solo dependen de la configuración"""
+    config = cargar_config(municipio, version)
+    municipio = config['municipio']
+    alcaldia = config['alcaldia']
+    sistema = config['sistema']
+    return {
+        "encabezado": f"""
+    <div class="cota-header">
+        <h1 style="margin:0">🏛️ ALCALDÍA MUNICIPAL DE {municipio['nombre'].upper()}</h1>
+        <h3 style="margin:10px 0; color:#dbeafe">Sistema de Gestión de Gobierno Digital</h3>
+        <div style="margin-top:15px">
+            <span class="cota-badge">Código DANE: {municipio['codigo_dane']}</span>
+            <span class="cota-badge">NIT: {municipio.get('nit', '')}</span>
+            <span class="cota-badge">{municipio.get('departamento', '')}</span>
+        </div>
+    </div>
+    """,
+        "logo": f"""
+        <div style="background:#1e3a8a; padding:20px; border-radius:10px; text-align:center; color:white;">
+        <h3>🏛️</h3>
+        <h4>ALCALDÍA DE {municipio['nombre'].upper()}</h4>
+        <p>Sistema de Gestión</p>
+        </div>
+        """,
+        "pie": f"""
+    <div style="text-align:center; color:#666; font-size:0.9em">
+    <strong>© 2024 - Alcaldía Municipal de {municipio['nombre']}, {municipio.get('departamento', '')}</strong><br>
+    Sistema de Gestión de Gobierno Digital v{sistema['version']}<br>
+    {alcaldia['direccion']} | {alcaldia['telefono_principal']}
+    </div>
+    """
     }
+
+# ============================================
+# BORRADOR DEL FORMULARIO
+# ============================================
+CARGOS = ("Contrato de Prestación de Servicios", "Funcionario", "Consultor")
+INDICADORES_INICIALES = {
+    "visitas": 1500, "paginas": 4200, "tramites": 65, "pqrs": 22,
+    "capacitados": 14, "horas": 28, "servidores": 6, "disponibilidad": 99
 }
+# Máximo de cada widget de indicador (el mínimo es 0)
+LIMITES_INDICADORES = {
+    "visitas": 100000, "paginas": 50000, "tramites": 10000, "pqrs": 1000,
+    "capacitados": 500, "horas": 500, "servidores": 50, "disponibilidad": 100
+}
+
+def lista_dependencias(config):
+    return tuple(config.get('dependencias_municipales') or ("Oficina de Sistemas y TIC",))
+
+def valores_formulario(config, borrador=None, perfil=None):
+    """Estado inicial del formulario: valores por defecto completados con el borrador
+
+    Con un usuario en sesión, responsable y cargo salen de su perfil y la
+    dependencia del perfil es la inicial.
+    """
+    dependencias = lista_dependencias(config)
+    valores = {
+        "mes": ConfigCota.MESES[datetime.now().month - 1],
+        "año": 2024,
+        "dependencia": "Oficina de Sistemas y TIC" if "Oficina de Sistemas y TIC" in dependencias else dependencias[0],
+        "responsable": "INGENIERO DE SISTEMAS",
+        "cargo": CARGOS[0],
+        "actividades": [],
+        "indicadores": dict(INDICADORES_INICIALES),
+    }
+    if borrador:
+        opciones = {"mes": ConfigCota.MESES, "dependencia": dependencias, "cargo": CARGOS}
+        for campo in ("mes", "año", "dependencia", "responsable", "cargo", "actividades"):
+            if campo in borrador and (campo not in opciones or borrador[campo] in opciones[campo]):
+                valores[campo] = borrador[campo]
+        for indicador, valor in (borrador.get("indicadores") or {}).items():
+            if indicador in valores["indicadores"]:
+                valores["indicadores"][indicador] = valor
+    if perfil:
+        valores["responsable"] = perfil.get("nombre") or perfil["usuario"]
+        if perfil.get("cargo") in CARGOS:
+            valores["cargo"] = perfil["cargo"]
+        if perfil.get("dependencia") in dependencias and not (borrador and "dependencia" in borrador):
+            valores["dependencia"] = perfil["dependencia"]
+    return valores
+
+def aplicar_formulario(valores, identificador):
+    """Carga los valores en los widgets (antes de crearlos) y los marca como guardados"""
+    estado = st.session_state
+    for campo in ("mes", "año", "dependencia", "responsable", "cargo"):
+        estado[campo] = valores[campo]
+    marcadas = set(valores["actividades"])
+    for categoria, actividades in catalogo_actividades():
+        for actividad, clave in actividades:
+            estado[clave] = f"{categoria}: {actividad}" in marcadas
+    for indicador, valor in valores["indicadores"].items():
+        estado[indicador] = valor
+    estado["borrador_guardado"] = valores
+    enlazar_borrador(identificador)
+
+def enlazar_borrador(identificador):
+    """Deja el borrador en la URL (?borrador=...) conservando los demás parámetros"""
+    st.session_state["borrador_id"] = identificador
+    parametros = st.experimental_get_query_params()
+    parametros["borrador"] = identificador
+    st.experimental_set_query_params(**parametros)
+
+def editor_sesion():
+    """Identificador de esta sesión como editora de borradores"""
+    if "editor" not in st.session_state:
+        st.session_state["editor"] = BorradoresCota.nuevo_id()
+    return st.session_state["editor"]
 
-# Funciones de utilidad
-def fecha_actual():
-    return datetime.now().strftime("%d/%m/%Y")
+def propietario_sesion():
+    """Usuario dueño de los borradores de la sesión; None en acceso abierto"""
+    perfil = perfil_sesion()
+    return perfil["usuario"] if perfil else None
 
-def hora_actual():
-    return datetime.now().strftime("%H:%M:%S")
+def leer_formulario():
+    estado = st.session_state
+    return {
+        "mes": estado["mes"],
+        "año": int(estado["año"]),
+        "dependencia": estado["dependencia"],
+        "responsable": estado["responsable"],
+        "cargo": estado["cargo"],
+        "actividades": [
+            f"{categoria}: {actividad}"
+            for categoria, actividades in catalogo_actividades()
+            for actividad, clave in actividades if estado.get(clave)
+        ],
+        "indicadores": {indicador: estado[indicador] for indicador in INDICADORES_INICIALES},
+    }
+
+def iniciar_borrador(config):
+    """Primera ejecución de la sesión: restaura el borrador del enlace (?borrador=...) o crea uno"""
+    if "borrador_id" in st.session_state:
+        return
+    identificador = st.experimental_get_query_params().get("borrador", [None])[0]
+    borrador = BorradoresCota.abrir(identificador, editor_sesion()) if identificador else None
+    if borrador and not BorradoresCota.accesible(borrador, propietario_sesion()):
+        # El enlace es de un borrador de otro usuario: se empieza uno propio
+        borrador, identificador = None, None
+    aplicar_formulario(valores_formulario(config, borrador, perfil_sesion()),
+                       identificador or BorradoresCota.nuevo_id())
+
+def reanudar_borrador(config, identificador):
+    municipio_sesion()  # los callbacks corren antes que el resto del script
+    borrador = BorradoresCota.abrir(identificador, editor_sesion())
+    if borrador and not BorradoresCota.accesible(borrador, propietario_sesion()):
+        return
+    aplicar_formulario(valores_formulario(config, borrador, perfil_sesion()), identificador)
+
+def nuevo_borrador(config):
+    municipio_sesion()  # los callbacks corren antes que el resto del script
+    aplicar_formulario(valores_formulario(config, perfil=perfil_sesion()), BorradoresCota.nuevo_id())
+
+def autoguardar_borrador():
+    """Programa la escritura solo si el formulario cambió desde lo último guardado"""
+    valores = leer_formulario()
+    if valores != st.session_state.get("borrador_guardado"):
+        BorradoresCota.programar(st.session_state["borrador_id"], valores, editor_sesion(),
+                                 propietario_sesion())
+        st.session_state["borrador_guardado"] = valores
+    return valores
 
-def guardar_informe(contenido, mes, año):
-    # En lugar de guardar archivo, devolvemos ruta simulada
-    return f"informes/Informe_Cota_{mes}_{año}.txt"
+def revisar_conflictos():
+    """Si otra sesión guardó el mismo borrador, esta sigue en la copia con sus cambios"""
+    for original, nuevo in BorradoresCota.conflictos(editor_sesion()):
+        if st.session_state.get("borrador_id") == original:
+            enlazar_borrador(nuevo)
+        st.warning(f"Otra sesión modificó el borrador {original} al mismo tiempo. "
+                   f"Sus cambios se conservaron en el borrador {nuevo}.")
 
 # ============================================
-# CONFIGURACIÓN DE STREAMLIT
+# IMPORTACIÓN DE INDICADORES
+# ============================================
+def analizar_importacion(archivo, dependencia):
+    """Consolidado del archivo subido (se analiza una vez por archivo y dependencia)"""
+    clave = (archivo.file_id, dependencia)
+    anterior = st.session_state.get("importacion")
+    if anterior is None or anterior[0] != clave:
+        try:
+            resultado = ImportadorCota.analizar(archivo, archivo.name, dependencia)
+        except ErrorImportacion as e:
+            resultado = {"error": str(e)}
+        st.session_state["importacion"] = anterior = (clave, resultado)
+    return anterior[1]
+
+def importar_indicadores(resultado):
+    """Guarda el consolidado y, si incluye el período del formulario, carga sus valores"""
+    municipio_sesion()  # los callbacks corren antes que el resto del script
+    guardados = ImportadorCota.guardar(resultado)
+    estado = st.session_state
+    periodo = (estado["dependencia"], int(estado["año"]), StorageCota.numero_mes(estado["mes"]))
+    for indicador, valor in resultado["periodos"].get(periodo, {}).items():
+        if indicador in LIMITES_INDICADORES:
+            estado[indicador] = min(max(int(round(valor)), 0), LIMITES_INDICADORES[indicador])
+    estado["importacion_guardada"] = (estado["importacion"][0], guardados)
+
+def panel_importacion(dependencia):
+    archivo = st.file_uploader("Exporte con filas diarias (fecha, dependencia, indicadores)",
+                               type=["csv", "txt", "xlsx", "xlsm"], key="archivo_importacion")
+    if archivo is None:
+        return
+    resultado = analizar_importacion(archivo, dependencia)
+    if "error" in resultado:
+        st.error(resultado["error"])
+        return
+    
+    st.caption(f"{resultado['filas']:,} filas · {resultado['validas']:,} válidas · "
+               f"{resultado['rechazadas']:,} rechazadas · {resultado['segundos']} s")
+    indicadores = [i for i in ConfigCota.INDICADORES
+                   if any(i in valores for valores in resultado["periodos"].values())]
+    if indicadores:
+        tabla = ["| Dependencia | Período | Días | " + " | ".join(
+                     ConfigCota.INDICADORES[i]["etiqueta"] for i in indicadores) + " |",
+                 "|---|---|---:|" + "---:|" * len(indicadores)]
+        for (nombre_dependencia, año_periodo, mes_periodo), valores in resultado["periodos"].items():
+            tabla.append(
+                f"| {nombre_dependencia} | {ConfigCota.MESES[mes_periodo - 1]} {año_periodo} | "
+                f"{resultado['dias'][(nombre_dependencia, año_periodo, mes_periodo)]} | "
+                + " | ".join(f"{valores[i]:,}" if i in valores else "" for i in indicadores) + " |"
+            )
+        st.markdown("\n".join(tabla))
+    for linea, motivo in resultado["errores"][:10]:
+        st.caption(f"✗ Línea {linea}: {motivo}")
+    for advertencia in resultado["advertencias"]:
+        st.caption(f"⚠️ {advertencia}")
+    
+    guardado = st.session_state.get("importacion_guardada")
+    if guardado and guardado[0] == st.session_state["importacion"][0]:
+        st.success(f"✅ {guardado[1]} valores importados al almacén")
+    elif resultado["periodos"]:
+        st.button("💾 Importar al almacén", on_click=importar_indicadores, args=(resultado,))
+
+# ============================================
+# EVIDENCIAS
+# ============================================
+def adjuntar_evidencias(archivos, actividad):
+    """Guarda los archivos nuevos del cargador y los enlaza al borrador (una vez por archivo)"""
+    borrador = st.session_state["borrador_id"]
+    adjuntadas = st.session_state.setdefault("evidencias_adjuntadas", set())
+    for archivo in archivos:
+        if (borrador, archivo.file_id) in adjuntadas:
+            continue
+        try:
+            EvidenciasCota.adjuntar(archivo, archivo.name, borrador, actividad)
+        except ErrorEvidencia as e:
+            st.error(str(e))
+        adjuntadas.add((borrador, archivo.file_id))
+
+def preparar_descarga(digest):
+    # Solo la evidencia elegida se copia a la respuesta, no todas en cada ejecución
+    st.session_state["evidencia_descarga"] = digest
+
+def quitar_evidencia(digest):
+    municipio_sesion()  # los callbacks corren antes que el resto del script
+    EvidenciasCota.quitar(st.session_state["borrador_id"], digest)
+
+def panel_evidencias(actividades):
+    actividad = st.selectbox("Actividad que soporta", ["General"] + list(actividades), key="evidencia_actividad")
+    archivos = st.file_uploader("Listas de asistencia, capturas o PDF",
+                                type=[extension.lstrip(".") for extension in TIPOS_EVIDENCIA],
+                                accept_multiple_files=True, key="archivos_evidencia")
+    if archivos:
+        adjuntar_evidencias(archivos, "" if actividad == "General" else actividad)
+    
+    for evidencia in EvidenciasCota.listar(borrador=st.session_state["borrador_id"]):
+        digest = evidencia["digest"]
+        col_vista, col_datos, col_acciones = st.columns([1, 4, 2])
+        miniatura = EvidenciasCota.miniatura(evidencia)
+        if miniatura:
+            col_vista.image(str(miniatura))
+        else:
+            col_vista.markdown("📄")
+        col_datos.markdown(f"**{evidencia['nombre']}**")
+        col_datos.caption(f"{evidencia['actividad'] or 'General'} · {evidencia['tamano'] / 1024:,.0f} KB")
+        if st.session_state.get("evidencia_descarga") == digest:
+            col_acciones.download_button("📥 Descargar", data=EvidenciasCota.leer(digest),
+                                         file_name=evidencia["nombre"], mime=evidencia["tipo"],
+                                         key=f"descargar_{digest}")
+        else:
+            col_acciones.button("📥 Preparar descarga", key=f"preparar_{digest}",
+                                on_click=preparar_descarga, args=(digest,))
+        col_acciones.button("🗑️ Quitar", key=f"quitar_{digest}", on_click=quitar_evidencia, args=(digest,))
+
+# ============================================
+# EXPORTACIONES PDF / DOCX
+# ============================================
+TIPOS_EXPORTACION = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+def encolar_exportaciones(contexto, nombre_archivo):
+    """Encola PDF y DOCX en el pool; el script sigue sin esperar a que terminen"""
+    st.session_state["exportaciones"] = {
+        "nombre": nombre_archivo,
+        "futuros": {formato: ExportCota.exportar_async(contexto, formato) for formato in TIPOS_EXPORTACION},
+        "datos": {},
+    }
+
+def panel_exportaciones():
+    """Botones de descarga del último informe; los formatos pendientes se muestran en espera"""
+    exportacion = st.session_state.get("exportaciones")
+    if not exportacion:
+        return
+    st.caption(f"📎 Exportaciones de {exportacion['nombre']}")
+    pendientes = False
+    columnas = st.columns(len(exportacion["futuros"]))
+    for columna, (formato, futuro) in zip(columnas, exportacion["futuros"].items()):
+        if not futuro.done():
+            columna.caption(f"⏳ Generando {formato.upper()}...")
+            pendientes = True
+            continue
+        try:
+            # El archivo se lee una sola vez; las ejecuciones siguientes reutilizan los bytes
+            if formato not in exportacion["datos"]:
+                exportacion["datos"][formato] = futuro.result().read_bytes()
+        except Exception as e:
+            columna.warning(f"No fue posible generar el {formato.upper()}: {e}")
+            continue
+        columna.download_button(
+            label=f"📥 DESCARGAR INFORME (.{formato.upper()})",
+            data=exportacion["datos"][formato],
+            file_name=f"{exportacion['nombre']}.{formato}",
+            mime=TIPOS_EXPORTACION[formato],
+            key=f"exportacion_{formato}",
+            use_container_width=True
+        )
+    if pendientes:
+        st.button("🔄 Actualizar descargas", key="actualizar_exportaciones")
+
 # ============================================
-st.set_page_config(
-    page_title=f"Sistema de Gestión - {config['municipio']['nombre']}",
-    page_icon="🏛️",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+# TABLERO DE INDICADORES
+# ============================================
+VISTAS = ("📝 Informe", "📈 Tablero")
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def series_tablero(municipio, version, indicador, desde, hasta, granularidad):
+    """Series reducidas de un indicador; municipio y versión de los datos son parte de la clave"""
+    return TableroCota.series(indicador, desde, hasta, granularidad)
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def comparativo_tablero(municipio, version, indicador, desde, hasta):
+    return TableroCota.comparativo(indicador, desde, hasta)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def rango_tablero(municipio, version):
+    return TableroCota.rango()
+
+def conservar_formulario():
+    """Streamlit descarta el estado de los widgets que no se dibujan; se fija para volver al informe"""
+    estado = st.session_state
+    claves = ["mes", "año", "dependencia", "responsable", "cargo", *INDICADORES_INICIALES]
+    claves += [clave for _, actividades in catalogo_actividades() for _, clave in actividades]
+    for clave in claves:
+        if clave in estado:
+            estado[clave] = estado[clave]
+
+def grafico_serie(datos, dependencias):
+    """Spec Vega-Lite: líneas por dependencia y, si hay meta, la meta punteada
+
+    Los puntos van en columnas (se envían en Arrow); sin Altair, que valida
+    cada registro contra el esquema y es lo más lento del tablero.
+    """
+    periodos = datos["periodos"]
+    tabla = {"periodo": [], "dependencia": [], "valor": []}
+    for dependencia in dependencias:
+        for periodo, valor in zip(periodos, datos["series"].get(dependencia, ())):
+            if valor is not None:
+                tabla["periodo"].append(periodo)
+                tabla["dependencia"].append(dependencia)
+                tabla["valor"].append(valor)
+    eje_x = {"field": "periodo", "type": "ordinal", "sort": periodos, "title": None}
+    capas = [{
+        "mark": {"type": "line", "point": len(periodos) <= 36},
+        "encoding": {
+            "x": eje_x,
+            "y": {"field": "valor", "type": "quantitative", "title": None},
+            "color": {"field": "dependencia", "type": "nominal", "legend": {"orient": "bottom", "title": None}},
+            "tooltip": [{"field": "periodo"}, {"field": "dependencia"}, {"field": "valor", "type": "quantitative"}],
+        },
+    }]
+    if datos["meta"]:
+        capas.append({
+            "data": {"values": [{"periodo": p, "meta": m} for p, m in zip(periodos, datos["meta"]) if m is not None]},
+            "mark": {"type": "line", "color": "#dc2626", "strokeDash": [6, 4]},
+            "encoding": {"x": eje_x, "y": {"field": "meta", "type": "quantitative"},
+                         "tooltip": [{"field": "periodo"}, {"field": "meta", "type": "quantitative"}]},
+        })
+    return tabla, {"height": 260, "layer": capas}
+
+def grafico_comparativo(filas):
+    tabla = {clave: [f[clave] for f in filas] for clave in ("dependencia", "valor", "porcentaje")}
+    capas = [{
+        "mark": {"type": "bar", "color": "#1e3a8a"},
+        "encoding": {
+            "x": {"field": "valor", "type": "quantitative", "title": None},
+            "y": {"field": "dependencia", "type": "nominal", "sort": "-x", "title": None},
+            "tooltip": [{"field": "dependencia"}, {"field": "valor", "type": "quantitative"},
+                        {"field": "porcentaje", "type": "quantitative", "title": "% de meta"}],
+        },
+    }]
+    if filas and filas[0]["meta"]:
+        capas.append({
+            "data": {"values": [{"meta": filas[0]["meta"]}]},
+            "mark": {"type": "rule", "color": "#dc2626", "strokeDash": [6, 4]},
+            "encoding": {"x": {"field": "meta", "type": "quantitative"}},
+        })
+    return tabla, {"height": max(160, 28 * len(filas)), "layer": capas}
+
+def pagina_tablero(municipio):
+    st.markdown("### 📈 TABLERO DE INDICADORES")
+    version = TableroCota.version()
+    rango = rango_tablero(municipio, version)
+    if rango is None:
+        st.info("Todavía no hay indicadores guardados. Genere informes o importe datos para ver el historial.")
+        return
+    
+    primer_año, ultimo_año = rango[0] // 12, rango[1] // 12
+    col1, col2, col3 = st.columns([2, 1, 3])
+    with col1:
+        if primer_año < ultimo_año:
+            años = st.slider("Años", primer_año, ultimo_año, (max(primer_año, ultimo_año - 4), ultimo_año),
+                             key="tablero_años")
+        else:
+            años = (primer_año, ultimo_año)
+            st.markdown(f"**Año {primer_año}**")
+    with col2:
+        granularidad = st.radio("Agrupar por", [g.capitalize() for g in GRANULARIDADES],
+                                key="tablero_granularidad").lower()
+    desde, hasta = años[0] * 12, años[1] * 12 + 11
+    
+    indicadores = list(ConfigCota.INDICADORES)
+    todas = sorted({d for i in indicadores
+                    for d in series_tablero(municipio, version, i, desde, hasta, granularidad)["series"]})
+    with col3:
+        dependencias = st.multiselect("Dependencias", todas, default=todas, key="tablero_dependencias")
+    
+    st.caption("La línea roja punteada es la meta de indicadores_meta. "
+               "Los indicadores con meta anual se muestran como acumulado del año.")
+    columnas = st.columns(2)
+    for n, indicador in enumerate(indicadores):
+        datos = series_tablero(municipio, version, indicador, desde, hasta, granularidad)
+        with columnas[n % 2]:
+            acumulado = " (acumulado del año)" if datos["metrica"] == "acumulado_anual" else ""
+            st.markdown(f"**{datos['etiqueta']}**{acumulado}")
+            st.vega_lite_chart(*grafico_serie(datos, dependencias), use_container_width=True)
+    
+    st.markdown("---")
+    st.markdown("### 🏢 Comparación entre dependencias")
+    etiquetas = {ConfigCota.INDICADORES[i]["etiqueta"]: i for i in indicadores}
+    indicador = etiquetas[st.selectbox("Indicador", list(etiquetas), key="tablero_indicador")]
+    filas = [f for f in comparativo_tablero(municipio, version, indicador, desde, hasta)
+             if f["dependencia"] in dependencias]
+    if not filas:
+        st.info("Sin datos de las dependencias seleccionadas en el período.")
+        return
+    st.vega_lite_chart(*grafico_comparativo(filas), use_container_width=True)
+    tabla = ["| Dependencia | Valor | Meta | % de meta |", "|---|---:|---:|---:|"]
+    for f in filas:
+        meta = "" if f["meta"] is None else f"{f['meta']:,.0f}"
+        porcentaje = "" if f["porcentaje"] is None else f"{f['porcentaje']}%"
+        tabla.append(f"| {f['dependencia']} | {f['valor']:,} | {meta} | {porcentaje} |")
+    st.markdown("\n".join(tabla))
+
+# ============================================
+# MUNICIPIO DE LA SESIÓN
+# ============================================
+def host_solicitud():
+    """Encabezado Host de la sesión (API interna de Streamlit; None si no está disponible)"""
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        return (_get_websocket_headers() or {}).get("Host")
+    except Exception:
+        return None
+
+def origen_solicitud():
+    """IP del cliente de la sesión (API interna de Streamlit; None si no está disponible)"""
+    try:
+        from streamlit.runtime import get_instance
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_instance().get_client(get_script_run_ctx().session_id).request.remote_ip
+    except Exception:
+        return None
+
+def municipio_sesion():
+    """Municipio de la sesión: ?municipio=..., luego el nombre de host, luego el de por defecto
+
+    Se fija en la primera ejecución de la sesión; devuelve (municipio, solicitado inválido o None).
+    """
+    if "municipio_sesion" not in st.session_state:
+        solicitado = st.experimental_get_query_params().get("municipio", [None])[0]
+        try:
+            municipio = ConfigCota.seleccionar_municipio(solicitado) if solicitado else None
+        except ValueError:
+            municipio = None
+        else:
+            solicitado = None
+        st.session_state["municipio_sesion"] = (
+            municipio or ConfigCota.municipio_por_host(host_solicitud()) or ConfigCota.MUNICIPIO_POR_DEFECTO,
+            solicitado
+        )
+    municipio, invalido = st.session_state["municipio_sesion"]
+    ConfigCota.seleccionar_municipio(municipio)
+    return municipio, invalido
+
+# ============================================
+# USUARIO DE LA SESIÓN
+# ============================================
+def perfil_sesion():
+    """Perfil del usuario que ingresó, o None (sin usuarios configurados o sin ingresar)
+
+    Valida el token de la sesión en memoria: la clave solo se deriva al ingresar.
+    """
+    return AutenticacionCota.sesion(st.session_state.get("sesion"))
+
+def ingresar():
+    municipio_sesion()  # los callbacks corren antes que el resto del script
+    estado = st.session_state
+    try:
+        # Los intentos fallidos se cuentan por equipo (o por sesión), no solo por usuario
+        estado["sesion"] = AutenticacionCota.ingresar(estado["ingreso_usuario"], estado["ingreso_clave"],
+                                                      origen=origen_solicitud() or editor_sesion())
+        estado.pop("ingreso_error", None)
+        # El formulario se vuelve a cargar del borrador, con el perfil del usuario
+        estado.pop("borrador_id", None)
+    except ErrorAutenticacion as e:
+        estado["ingreso_error"] = str(e)
+    # La clave no se conserva en el estado de la sesión
+    estado["ingreso_clave"] = ""
+
+def cerrar_sesion():
+    municipio_sesion()  # los callbacks corren antes que el resto del script
+    AutenticacionCota.salir(st.session_state.pop("sesion", None))
+    # El próximo usuario empieza con su propio perfil en el formulario
+    st.session_state.pop("borrador_id", None)
+    st.session_state.pop("exportaciones", None)
+
+def pagina_ingreso():
+    st.markdown("### 🔐 INGRESO AL SISTEMA")
+    with st.form("ingreso"):
+        st.text_input("Usuario", key="ingreso_usuario")
+        st.text_input("Clave", type="password", key="ingreso_clave")
+        st.form_submit_button("Ingresar", type="primary", on_click=ingresar)
+    if "ingreso_error" in st.session_state:
+        st.error(st.session_state["ingreso_error"])
+
+def autorizar_informe(perfil):
+    """Límite de informes por usuario (por sesión si no hay usuarios): un botón trabado
+    o un script no llenan reports/ ni el log"""
+    espera = AutenticacionCota.espera(perfil["usuario"] if perfil else editor_sesion(), "informe")
+    if espera:
+        st.warning(f"⏳ Se alcanzó el límite de informes por minuto. Intente de nuevo en {espera} s.")
+    return not espera
 
 # ============================================
 # CSS PERSONALIZADO
 # ============================================
-st.markdown("""
+ESTILOS = """
 <style>
     /* Estilos para Alcaldía de Cota */
     .cota-header {
@@ -112,57 +682,153 @@ st.markdown("""
         text-align: center;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# ============================================
+# CONFIGURACIÓN DE STREAMLIT
+# ============================================
+def configurar_pagina():
+    """Primer paso de cada rerun: municipio de la sesión, su configuración, página y estilos
+
+    Devuelve (municipio, municipio solicitado inválido o None, versión de la configuración, configuración).
+    """
+    municipio, invalido = municipio_sesion()
+    version = ConfigCota.version_configuracion()
+    config = cargar_config(municipio, version)
+    st.set_page_config(
+        page_title=f"Sistema de Gestión - {config['municipio']['nombre']}",
+        page_icon="🏛️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(ESTILOS, unsafe_allow_html=True)
+    return municipio, invalido, version, config
+
+# ============================================
+# PÁGINA INTERNA DE MÉTRICAS (?admin=metricas)
+# ============================================
+def es_pagina_metricas():
+    """La página no tiene enlaces; si COTA_METRICAS_CLAVE está definida, exige ?clave=..."""
+    parametros = st.experimental_get_query_params()
+    if parametros.get("admin", [None])[0] != "metricas":
+        return False
+    clave = os.environ.get("COTA_METRICAS_CLAVE")
+    return not clave or parametros.get("clave", [None])[0] == clave
+
+def pagina_metricas():
+    st.markdown("### ⏱️ Métricas de tiempo del proceso")
+    activas = st.toggle("Métricas activas", value=MetricasCota.ACTIVAS)
+    if activas != MetricasCota.ACTIVAS:
+        MetricasCota.activar(activas)
+    
+    col1, col2 = st.columns(2)
+    if col1.button("🔄 Reiniciar histogramas"):
+        MetricasCota.reiniciar()
+    if col2.button("💾 Volcar a archivo"):
+        st.caption(f"Escrito en: {MetricasCota.volcar()}")
+    
+    filas = MetricasCota.resumen()
+    if not filas:
+        st.info("Sin mediciones todavía. Active las métricas (o COTA_METRICAS=1) y use el sistema.")
+    else:
+        tabla = ["| Operación | n | media ms | p50 ms | p95 ms | p99 ms | máx ms | total s |",
+                 "|---|---:|---:|---:|---:|---:|---:|---:|"]
+        tabla += [f"| {f['operacion']} | {f['n']} | {f['media_ms']} | {f['p50_ms']} | {f['p95_ms']} | "
+                  f"{f['p99_ms']} | {f['max_ms']} | {f['total_s']} |" for f in filas]
+        st.markdown("\n".join(tabla))
+    
+    texto = MetricasCota.prometheus()
+    st.download_button("📥 Descargar (formato Prometheus)", data=texto, file_name="metricas.prom",
+                       mime="text/plain")
+    with st.expander("Exposición Prometheus"):
+        st.code(texto, language="text")
 
 # ============================================
 # FUNCIÓN PRINCIPAL
 # ============================================
 def main():
+    municipio, municipio_invalido, version_config, config = configurar_pagina()
+    html = fragmentos_html(municipio, version_config)
+    perfil = perfil_sesion()
+    if perfil is None and AutenticacionCota.activa():
+        st.markdown(html["encabezado"], unsafe_allow_html=True)
+        pagina_ingreso()
+        return
+    if es_pagina_metricas():
+        if AutenticacionCota.puede(perfil, "metricas"):
+            pagina_metricas()
+        else:
+            st.error("🔒 Su rol no tiene acceso a las métricas.")
+        return
+    if municipio_invalido:
+        st.warning(f"Municipio no configurado: {municipio_invalido}. Se muestra {config['municipio']['nombre']}.")
+    iniciar_borrador(config)
+    revisar_conflictos()
+    
     # ENCABEZADO OFICIAL
-    st.markdown(f"""
-    <div class="cota-header">
-        <h1 style="margin:0">🏛️ ALCALDÍA MUNICIPAL DE {config['municipio']['nombre'].upper()}</h1>
-        <h3 style="margin:10px 0; color:#dbeafe">Sistema de Gestión de Gobierno Digital</h3>
-        <div style="margin-top:15px">
-            <span class="cota-badge">Código DANE: {config['municipio']['codigo_dane']}</span>
-            <span class="cota-badge">NIT: {config['municipio']['nit']}</span>
-            <span class="cota-badge">{config['municipio']['departamento']}</span>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(html["encabezado"], unsafe_allow_html=True)
     
     # BARRA LATERAL
     with st.sidebar:
         # Logo/imagen alternativa
-        st.markdown("""
-        <div style="background:#1e3a8a; padding:20px; border-radius:10px; text-align:center; color:white;">
-        <h3>🏛️</h3>
-        <h4>ALCALDÍA DE COTA</h4>
-        <p>Sistema de Gestión</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
+        st.markdown(html["logo"], unsafe_allow_html=True)
+        if perfil:
+            st.markdown(f"👤 **{perfil.get('nombre') or perfil['usuario']}** · {perfil.get('rol', '')}")
+            st.button("🚪 Cerrar sesión", on_click=cerrar_sesion, use_container_width=True)
+        vista = st.radio("Vista", VISTAS, key="vista", horizontal=True, label_visibility="collapsed")
+    
+    if vista == VISTAS[1]:
+        conservar_formulario()
+        pagina_tablero(municipio)
+        st.markdown("---")
+        st.markdown(html["pie"], unsafe_allow_html=True)
+        return
+    
+    with st.sidebar:
         st.markdown("### 📅 Período del Informe")
         
         col1, col2 = st.columns(2)
         with col1:
-            mes = st.selectbox(
-                "Mes",
-                ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-                 "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"],
-                index=datetime.now().month - 1
-            )
+            mes = st.selectbox("Mes", ConfigCota.MESES, key="mes")
         with col2:
-            año = st.number_input("Año", 2024, 2030, 2024)
+            año = st.number_input("Año", 2024, 2030, key="año")
+        
+        proyectos_periodo = ProyectosCota.activos_en(año, mes)
+        with st.expander(f"📁 Proyectos en el período ({len(proyectos_periodo)})"):
+            for proyecto in proyectos_periodo:
+                st.markdown(f"**{proyecto['id']}** · {proyecto.get('nombre', '')}")
+                st.caption(f"{proyecto.get('estado', '')} · Prioridad {proyecto.get('prioridad', '')}")
         
         st.markdown("---")
         st.markdown("### 👤 Datos del Responsable")
         
-        nombre = st.text_input("Nombre completo", "INGENIERO DE SISTEMAS")
-        cargo = st.selectbox(
-            "Cargo",
-            ["Contrato de Prestación de Servicios", "Funcionario", "Consultor"]
-        )
+        dependencia = st.selectbox("Dependencia", lista_dependencias(config), key="dependencia")
+        # Con usuarios, el responsable es quien ingresó (no se edita)
+        nombre = st.text_input("Nombre completo", key="responsable", disabled=perfil is not None)
+        cargo = st.selectbox("Cargo", CARGOS, key="cargo")
+        
+        st.markdown("---")
+        st.markdown("### 🔎 Buscar en informes")
+        consulta = st.text_input("Buscar", placeholder="Ej: migración sistemas", label_visibility="collapsed")
+        if consulta:
+            inicio = time.perf_counter()
+            resultados = BusquedaCota.buscar(consulta, limite=20)
+            st.caption(f"{len(resultados)} resultados en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+            for resultado in resultados:
+                st.markdown(f"**{resultado['periodo']}** · {resultado['dependencia']}")
+                st.caption(resultado['fragmento'])
+        
+        st.markdown("---")
+        with st.expander("📝 Borradores guardados"):
+            st.button("🆕 Nuevo informe", on_click=nuevo_borrador, args=(config,), use_container_width=True)
+            for borrador in BorradoresCota.listar(propietario=propietario_sesion()):
+                if borrador["id"] == st.session_state["borrador_id"]:
+                    continue
+                datos = borrador["datos"]
+                st.caption(f"{datos.get('mes')} {datos.get('año')} · {datos.get('dependencia')} · "
+                           f"{datos.get('responsable')} ({datos.get('actualizado', '')[:16].replace('T', ' ')})")
+                st.button("Reanudar", key=f"reanudar_{borrador['id']}", on_click=reanudar_borrador,
+                          args=(config, borrador["id"]))
         
         st.markdown("---")
         st.info(f"**📞 Contacto:** {config['alcaldia']['correo_sistemas']}")
@@ -172,212 +838,174 @@ def main():
     # ============================================
     st.markdown("### ✅ ACTIVIDADES REALIZADAS")
     
-    # Actividades organizadas por categoría
-    actividades_categorias = {
-        "Planificación": [
-            "Revisión política gobierno digital",
-            "Actualización diagnóstico TIC",
-            "Planificación estratégica",
-            "Definición de indicadores"
-        ],
-        "Implementación": [
-            "Desarrollo portal web",
-            "Configuración sistemas",
-            "Implementación seguridad",
-            "Migración sistemas"
-        ],
-        "Seguimiento": [
-            "Monitoreo indicadores",
-            "Seguimiento proyectos",
-            "Análisis métricas",
-            "Reporte novedades"
-        ],
-        "Capacitación": [
-            "Capacitación funcionarios",
-            "Entrenamiento seguridad",
-            "Charlas sensibilización",
-            "Asesoría técnica"
-        ]
-    }
-    
-    actividades_seleccionadas = []
-    
-    for categoria, actividades in actividades_categorias.items():
+    for categoria, actividades in catalogo_actividades():
         with st.expander(f"📋 {categoria}", expanded=True):
             cols = st.columns(2)
-            for idx, actividad in enumerate(actividades):
+            for idx, (actividad, clave) in enumerate(actividades):
                 col_idx = idx % 2
-                if cols[col_idx].checkbox(actividad, key=f"{categoria}_{actividad}"):
-                    actividades_seleccionadas.append(f"{categoria}: {actividad}")
+                cols[col_idx].checkbox(actividad, key=clave)
     
     # ============================================
     # INDICADORES (SIN PANDAS)
     # ============================================
     st.markdown("### 📊 INDICADORES DE GESTIÓN")
     
+    if AutenticacionCota.puede(perfil, "importar"):
+        with st.expander("📥 Importar desde CSV/Excel"):
+            panel_importacion(dependencia)
+    
     col_met1, col_met2, col_met3, col_met4 = st.columns(4)
     
     with col_met1:
         st.markdown("<div class='metric-box'>", unsafe_allow_html=True)
         st.markdown("**🌐 Portal Web**")
-        visitas = st.number_input("Visitas", 0, 100000, 1500, key="visitas", label_visibility="collapsed")
+        visitas = st.number_input("Visitas", 0, LIMITES_INDICADORES["visitas"], key="visitas", label_visibility="collapsed")
         st.markdown(f"**{visitas:,}** visitas")
         st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("<div class='metric-box' style='margin-top:10px'>", unsafe_allow_html=True)
-        paginas = st.number_input("Páginas", 0, 50000, 4200, key="paginas", label_visibility="collapsed")
+        paginas = st.number_input("Páginas", 0, LIMITES_INDICADORES["paginas"], key="paginas", label_visibility="collapsed")
         st.markdown(f"**{paginas:,}** páginas")
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col_met2:
         st.markdown("<div class='metric-box'>", unsafe_allow_html=True)
         st.markdown("**📄 Trámites**")
-        tramites = st.number_input("Online", 0, 10000, 65, key="tramites", label_visibility="collapsed")
+        tramites = st.number_input("Online", 0, LIMITES_INDICADORES["tramites"], key="tramites", label_visibility="collapsed")
         st.markdown(f"**{tramites}** online")
         st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("<div class='metric-box' style='margin-top:10px'>", unsafe_allow_html=True)
-        pqrs = st.number_input("PQRS", 0, 1000, 22, key="pqrs", label_visibility="collapsed")
+        pqrs = st.number_input("PQRS", 0, LIMITES_INDICADORES["pqrs"], key="pqrs", label_visibility="collapsed")
         st.markdown(f"**{pqrs}** PQRS")
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col_met3:
         st.markdown("<div class='metric-box'>", unsafe_allow_html=True)
         st.markdown("**👥 Capacitación**")
-        capacitados = st.number_input("Personas", 0, 500, 14, key="capacitados", label_visibility="collapsed")
+        capacitados = st.number_input("Personas", 0, LIMITES_INDICADORES["capacitados"], key="capacitados", label_visibility="collapsed")
         st.markdown(f"**{capacitados}** personas")
         st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("<div class='metric-box' style='margin-top:10px'>", unsafe_allow_html=True)
-        horas = st.number_input("Horas", 0, 500, 28, key="horas", label_visibility="collapsed")
+        horas = st.number_input("Horas", 0, LIMITES_INDICADORES["horas"], key="horas", label_visibility="collapsed")
         st.markdown(f"**{horas}** horas")
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col_met4:
         st.markdown("<div class='metric-box'>", unsafe_allow_html=True)
         st.markdown("**🖥️ Infraestructura**")
-        servidores = st.number_input("Servidores", 0, 50, 6, key="servidores", label_visibility="collapsed")
+        servidores = st.number_input("Servidores", 0, LIMITES_INDICADORES["servidores"], key="servidores", label_visibility="collapsed")
         st.markdown(f"**{servidores}** servidores")
         st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("<div class='metric-box' style='margin-top:10px'>", unsafe_allow_html=True)
-        disponibilidad = st.slider("Disponibilidad %", 0, 100, 99, key="dispo", label_visibility="collapsed")
+        disponibilidad = st.slider("Disponibilidad %", 0, LIMITES_INDICADORES["disponibilidad"], key="disponibilidad", label_visibility="collapsed")
         st.markdown(f"**{disponibilidad}%** disponibilidad")
         st.markdown("</div>", unsafe_allow_html=True)
     
+    # Autoguardado del borrador (la escritura se agrupa en segundo plano)
+    formulario = autoguardar_borrador()
+    actividades_seleccionadas = formulario["actividades"]
+    st.caption("📝 Borrador guardado automáticamente")
+    
+    # ============================================
+    # EVIDENCIAS
+    # ============================================
+    st.markdown("### 📎 EVIDENCIAS")
+    
+    with st.expander("📎 Adjuntar evidencias al informe"):
+        panel_evidencias(actividades_seleccionadas)
+    
     # ============================================
     # GENERAR INFORME
     # ============================================
     st.markdown("---")
     st.markdown("### 🚀 GENERAR INFORME OFICIAL")
     
-    if st.button("📄 GENERAR INFORME COMPLETO", type="primary", use_container_width=True):
-        # Crear contenido del informe
-        contenido = f"""
-{'='*70}
-INFORME DE GESTIÓN - GOBIERNO DIGITAL
-ALCALDÍA MUNICIPAL DE {config['municipio']['nombre'].upper()}, {config['municipio']['departamento'].upper()}
-{'='*70}
-
-PERÍODO: {mes} de {año}
-FECHA: {fecha_actual()} {hora_actual()}
-RESPONSABLE: {nombre}
-CARGO: {cargo}
-
-{'='*70}
-ACTIVIDADES REALIZADAS ({len(actividades_seleccionadas)})
-{'='*70}
-{chr(10).join(['• ' + act for act in actividades_seleccionadas])}
-
-{'='*70}
-INDICADORES
-{'='*70}
-PORTAL WEB:
-• Visitas: {visitas:,}
-• Páginas vistas: {paginas:,}
-
-TRÁMITES DIGITALES:
-• Trámites online: {tramites}
-• PQRS digitales: {pqrs}
-
-CAPACITACIÓN:
-• Personas capacitadas: {capacitados}
-• Horas de capacitación: {horas}
-
-INFRAESTRUCTURA:
-• Servidores activos: {servidores}
-• Disponibilidad: {disponibilidad}%
-
-{'='*70}
-FIRMAS
-{'='*70}
-
-Elaborado por:
-___________________________
-{nombre}
-{cargo}
-
-Revisado por:
-___________________________
-{config['alcaldia']['secretario_tic']}
-Oficina de Sistemas y TIC
-
-Aprobado por:
-___________________________
-{config['alcaldia']['alcalde']}
-Alcaldía Municipal de {config['municipio']['nombre']}
-
-{'='*70}
-INFORMACIÓN DE CONTACTO
-{'='*70}
-• Dirección: {config['alcaldia']['direccion']}
-• Teléfono: {config['alcaldia']['telefono_principal']}
-• Correo: {config['alcaldia']['correo_sistemas']}
-• Web: {config['alcaldia']['sitio_web']}
-
-{'='*70}
-*Documento generado por Sistema de Gestión v{config['sistema']['version']}*
-{'='*70}
-"""
+    puede_generar = AutenticacionCota.puede(perfil, "generar")
+    if not puede_generar:
+        st.caption("🔒 Su rol permite consultar, no generar informes.")
+    if st.button("📄 GENERAR INFORME COMPLETO", type="primary", use_container_width=True,
+                 disabled=not puede_generar) and autorizar_informe(perfil):
+        with cronometro("informe.generar"):
+            indicadores = {
+                "visitas": visitas, "paginas": paginas, "tramites": tramites, "pqrs": pqrs,
+                "capacitados": capacitados, "horas": horas, "servidores": servidores,
+                "disponibilidad": disponibilidad
+            }
         
-        # Guardar informe (simulado)
-        ruta = guardar_informe(contenido, mes, año)
+            # Si los datos no cambiaron desde el último clic se reutiliza la misma fecha,
+            # así el contenido es idéntico y el archivo no guarda un duplicado
+            datos = (mes, año, dependencia, nombre, cargo, tuple(actividades_seleccionadas),
+                     tuple(indicadores.items()))
+            anterior = st.session_state.get("ultimo_informe")
+            if anterior and anterior[0] == datos:
+                fecha, hora = anterior[1]
+            else:
+                fecha, hora = UtilsCota.fecha_actual(), UtilsCota.hora_actual()
+                st.session_state["ultimo_informe"] = (datos, (fecha, hora))
         
-        # Mostrar éxito
-        st.success(f"✅ INFORME GENERADO EXITOSAMENTE")
-        st.balloons()
+            # Crear contenido del informe
+            contexto = TemplatesCota.construir_contexto(
+                config, mes, año, nombre, cargo, actividades_seleccionadas, indicadores,
+                fecha=fecha, hora=hora, dependencia=dependencia
+            )
+            with cronometro("informe.renderizar"):
+                contenido = TemplatesCota.renderizar_informe(contexto)
         
-        # Botón de descarga
-        st.download_button(
-            label="📥 DESCARGAR INFORME (.TXT)",
-            data=contenido,
-            file_name=f"Informe_Cota_{mes}_{año}.txt",
-            mime="text/plain",
-            type="primary"
-        )
+            # PDF y DOCX se renderizan en segundo plano; sus botones aparecen al terminar
+            nombre_archivo = f"Informe_{UtilsCota.normalizar_nombre(config['municipio']['nombre'])}_{mes}_{año}"
+            encolar_exportaciones(contexto, nombre_archivo)
+        
+            # Guardar indicadores e informe
+            with cronometro("informe.guardar"):
+                StorageCota.guardar_indicadores(dependencia, año, mes, indicadores)
+                ruta = UtilsCota.guardar_informe(
+                    contenido, mes, año, dependencia=dependencia, responsable=nombre,
+                    cargo=cargo, actividades=actividades_seleccionadas
+                )
+        
+                vinculadas = EvidenciasCota.vincular_informe(st.session_state["borrador_id"], ruta)
+        
+            # El informe ya está guardado: el borrador deja de ser necesario
+            BorradoresCota.descartar(st.session_state["borrador_id"])
+        
+            # Mostrar éxito
+            st.success(f"✅ INFORME GENERADO EXITOSAMENTE")
+            st.caption(f"Guardado en: {ruta}")
+            if vinculadas:
+                st.caption(f"📎 {vinculadas} evidencias vinculadas al informe")
+            st.balloons()
         
-        # Mostrar información
-        with st.expander("📋 VER DETALLES DEL INFORME"):
-            st.text(contenido)
+            # Botón de descarga
+            st.download_button(
+                label="📥 DESCARGAR INFORME (.TXT)",
+                data=contenido,
+                file_name=f"{nombre_archivo}.txt",
+                mime="text/plain",
+                type="primary"
+            )
+        
+            # Mostrar información
+            with st.expander("📋 VER DETALLES DEL INFORME"):
+                st.text(contenido)
+    
+    panel_exportaciones()
     
     # ============================================
     # PIE DE PÁGINA
     # ============================================
     st.markdown("---")
-    st.markdown(f"""
-    <div style="text-align:center; color:#666; font-size:0.9em">
-    <strong>© 2024 - Alcaldía Municipal de {config['municipio']['nombre']}, {config['municipio']['departamento']}</strong><br>
-    Sistema de Gestión de Gobierno Digital v{config['sistema']['version']}<br>
-    {config['alcaldia']['direccion']} | {config['alcaldia']['telefono_principal']}
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(html["pie"], unsafe_allow_html=True)
 
 # ============================================
 # INICIALIZACIÓN
 # ============================================
 if __name__ == "__main__":
     try:
-        main()
+        with cronometro("streamlit.rerun"):
+            main()
     except Exception as e:
         st.error(f"❌ Error en el sistema: {str(e)}")
         st.info("Si el problema persiste, contacte al área de sistemas.")
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+MÉTRICAS DE TIEMPO EN PROCESO - ALCALDÍA DE COTA
+
+Uso:
+    from .metrics import medir, cronometro
+
+    @medir("utils.guardar_informe")
+    def guardar_informe(...): ...
+
+    with cronometro("informe.generar"):
+        ...
+
+Se activan con COTA_METRICAS=1 (o MetricasCota.activar()). Desactivadas,
+cada llamada instrumentada solo consulta una bandera. Activas, cada
+medición suma en un histograma de cubetas fijas (memoria constante).
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Límites superiores de las cubetas, en segundos
+CUBETAS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    """Conteos por cubeta, suma, total y máximo de una operación"""
+
+    __slots__ = ("conteos", "suma", "total", "maximo")
+
+    def __init__(self):
+        self.conteos = [0] * (len(CUBETAS) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, segundos):
+        self.conteos[bisect_left(CUBETAS, segundos)] += 1
+        self.suma += segundos
+        self.total += 1
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, p):
+        """Estimación por interpolación lineal dentro de la cubeta"""
+        if not self.total:
+            return 0.0
+        objetivo = p / 100 * self.total
+        acumulado = 0
+        for n, conteo in enumerate(self.conteos):
+            if conteo and acumulado + conteo >= objetivo:
+                inferior = CUBETAS[n - 1] if n > 0 else 0.0
+                superior = CUBETAS[n] if n < len(CUBETAS) else self.maximo
+                return min(inferior + (superior - inferior) * (objetivo - acumulado) / conteo, self.maximo)
+            acumulado += conteo
+        return self.maximo
+
+
+class _Cronometro:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        MetricasCota.observar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+class _Inactivo:
+    """Context manager vacío compartido (sin asignaciones cuando las métricas están apagadas)"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+
+_INACTIVO = _Inactivo()
+
+
+class MetricasCota:
+    """Registro de histogramas del proceso y su exportación en formato Prometheus"""
+
+    ACTIVAS = os.environ.get("COTA_METRICAS", "").lower() in ("1", "true", "si", "sí")
+    INTERVALO_VOLCADO = float(os.environ.get("COTA_METRICAS_INTERVALO", "15"))
+    NOMBRE_ARCHIVO = "metricas.prom"
+
+    _histogramas = {}
+    _lock = threading.Lock()
+    _hilo_volcado = None
+
+    @classmethod
+    def activar(cls, activas=True):
+        cls.ACTIVAS = bool(activas)
+
+    @classmethod
+    def observar(cls, nombre, segundos):
+        if cls._hilo_volcado is None and cls.INTERVALO_VOLCADO > 0:
+            cls._iniciar_volcado()
+        with cls._lock:
+            histograma = cls._histogramas.get(nombre)
+            if histograma is None:
+                histograma = cls._histogramas[nombre] = Histograma()
+            histograma.observar(segundos)
+
+    @classmethod
+    def reiniciar(cls):
+        with cls._lock:
+            cls._histogramas.clear()
+
+    @classmethod
+    def resumen(cls):
+        """[{operacion, n, media_ms, p50_ms, p95_ms, p99_ms, max_ms, total_s}] ordenado por tiempo total"""
+        with cls._lock:
+            copia = {nombre: (h.total, h.suma, h.maximo, list(h.conteos)) for nombre, h in cls._histogramas.items()}
+        filas = []
+        for nombre, (total, suma, maximo, conteos) in copia.items():
+            histograma = Histograma()
+            histograma.total, histograma.suma, histograma.maximo, histograma.conteos = total, suma, maximo, conteos
+            filas.append({
+                "operacion": nombre, "n": total, "total_s": round(suma, 4),
+                "media_ms": round(suma / total * 1000, 3) if total else 0.0,
+                "p50_ms": round(histograma.percentil(50) * 1000, 3),
+                "p95_ms": round(histograma.percentil(95) * 1000, 3),
+                "p99_ms": round(histograma.percentil(99) * 1000, 3),
+                "max_ms": round(maximo * 1000, 3),
+            })
+        return sorted(filas, key=lambda fila: fila["total_s"], reverse=True)
+
+    @classmethod
+    def prometheus(cls):
+        """Exposición en texto de Prometheus (histograma cota_operacion_segundos)"""
+        lineas = [
+            "# HELP cota_operacion_segundos Duración de las operaciones instrumentadas.",
+            "# TYPE cota_operacion_segundos histogram",
+        ]
+        with cls._lock:
+            copia = sorted((n, h.total, h.suma, list(h.conteos)) for n, h in cls._histogramas.items())
+        for nombre, total, suma, conteos in copia:
+            etiqueta = nombre.replace("\\", "\\\\").replace('"', '\\"')
+            acumulado = 0
+            for limite, conteo in zip(CUBETAS, conteos):
+                acumulado += conteo
+                lineas.append(f'cota_operacion_segundos_bucket{{operacion="{etiqueta}",le="{limite}"}} {acumulado}')
+            lineas.append(f'cota_operacion_segundos_bucket{{operacion="{etiqueta}",le="+Inf"}} {total}')
+            lineas.append(f'cota_operacion_segundos_sum{{operacion="{etiqueta}"}} {suma:.6f}')
+            lineas.append(f'cota_operacion_segundos_count{{operacion="{etiqueta}"}} {total}')
+        return "\n".join(lineas) + "\n"
+
+    @classmethod
+    def ruta_archivo(cls):
+        from .config import ConfigCota
+        return ConfigCota.obtener_ruta("logs") / cls.NOMBRE_ARCHIVO
+
+    @classmethod
+    def volcar(cls, ruta=None):
+        """Escribe la exposición en un archivo (reemplazo atómico, apto para el textfile collector)"""
+        from .atomic import EscrituraCota
+        return EscrituraCota.escribir(ruta or cls.ruta_archivo(), cls.prometheus())
+
+    @classmethod
+    def _iniciar_volcado(cls):
+        """Vuelca el archivo cada INTERVALO_VOLCADO segundos (0 lo desactiva) desde la primera medición"""
+        if cls.INTERVALO_VOLCADO <= 0:
+            return
+        with cls._lock:
+            if cls._hilo_volcado is not None:
+                return
+
+            def volcar_periodicamente():
+                while True:
+                    time.sleep(cls.INTERVALO_VOLCADO)
+                    if not cls.ACTIVAS:
+                        continue
+                    try:
+                        cls.volcar()
+                    except OSError:
+                        pass
+
+            cls._hilo_volcado = threading.Thread(target=volcar_periodicamente, name="MetricasCota", daemon=True)
+            cls._hilo_volcado.start()
+
+
+def medir(nombre):
+    """Decorador: registra la duración de cada llamada bajo 'nombre'"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not MetricasCota.ACTIVAS:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                MetricasCota.observar(nombre, time.perf_counter() - inicio)
+        return envoltura
+    return decorador
+
+
+def cronometro(nombre):
+    """Context manager: registra la duración del bloque bajo 'nombre'"""
+    return _Cronometro(nombre) if MetricasCota.ACTIVAS else _INACTIVO
+
+
+# Instancia global de métricas
+metrics = MetricasCota()
@@ -0,0 +1,326 @@
+"""
+REGISTRO DE PROYECTOS - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.projects --estado "En ejecución"
+    python -m app.projects --año 2024 --mes 3 --prioridad Alta
+"""
+import calendar
+import json
+import threading
+import time
+from datetime import date, datetime
+from .config import ConfigCota
+from .storage import StorageCota
+
+# Contador que cambia con cada escritura en la tabla proyectos (de cualquier
+# proceso); permite revalidar el registro en memoria con una consulta O(1)
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS proyectos_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO proyectos_version (id, version) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS proyectos_version_insert AFTER INSERT ON proyectos
+BEGIN UPDATE proyectos_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS proyectos_version_update AFTER UPDATE ON proyectos
+BEGIN UPDATE proyectos_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS proyectos_version_delete AFTER DELETE ON proyectos
+BEGIN UPDATE proyectos_version SET version = version + 1 WHERE id = 1; END;
+"""
+StorageCota.registrar_esquema(ESQUEMA)
+
+
+def _fecha(valor):
+    """date de una fecha (date, datetime o texto '2024-03-15', también '2024-3-5'); None si no es válida"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        año, mes, dia = str(valor).strip().split("T")[0].split(" ")[0].split("-")
+        return date(int(año), int(mes), int(dia))
+    except ValueError:
+        return None
+
+
+def _mes(fecha):
+    """date -> índice de mes (año * 12 + mes - 1); None si no hay fecha"""
+    return fecha.year * 12 + fecha.month - 1 if fecha is not None else None
+
+
+class RegistroProyectos:
+    """Proyectos de un municipio en memoria, con índices por id, estado,
+    prioridad y mes
+
+    Cada proyecto con fecha de inicio se ubica en los meses que abarca, así
+    "activos en marzo" es una búsqueda directa; los proyectos sin fecha de
+    fin se consideran abiertos. Los cambios actualizan solo los índices del
+    proyecto afectado.
+    """
+
+    def __init__(self, proyectos=()):
+        self.por_id = {}
+        self.por_estado = {}
+        self.por_prioridad = {}
+        self.por_mes = {}
+        self.abiertos = set()
+        self.rangos = {}  # id -> (inicio, fin) ya convertidos a date
+        self._lock = threading.RLock()
+        for proyecto in proyectos:
+            self.actualizar(proyecto)
+
+    def __len__(self):
+        return len(self.por_id)
+
+    def __contains__(self, identificador):
+        return identificador in self.por_id
+
+    @staticmethod
+    def _rango(proyecto):
+        """(inicio, fin) como date; None si falta o no es una fecha válida"""
+        return (_fecha(proyecto.get("fecha_inicio")),
+                _fecha(proyecto.get("fecha_fin_estimada", proyecto.get("fecha_fin"))))
+
+    def actualizar(self, proyecto):
+        """Agrega o reemplaza un proyecto (reindexa solo ese proyecto)"""
+        proyecto = dict(proyecto)
+        identificador = proyecto["id"]
+        with self._lock:
+            self.eliminar(identificador)
+            self.por_id[identificador] = proyecto
+            self.por_estado.setdefault(proyecto.get("estado"), set()).add(identificador)
+            self.por_prioridad.setdefault(proyecto.get("prioridad"), set()).add(identificador)
+            self.rangos[identificador] = self._rango(proyecto)
+            # Sin inicio no se indexa por mes; sin fin el proyecto queda abierto
+            inicio, fin = (_mes(fecha) for fecha in self.rangos[identificador])
+            if inicio is not None and fin is None:
+                self.abiertos.add(identificador)
+            elif inicio is not None:
+                for mes in range(inicio, fin + 1):
+                    self.por_mes.setdefault(mes, set()).add(identificador)
+
+    def eliminar(self, identificador):
+        """Quita un proyecto de todos los índices; devuelve el proyecto o None"""
+        with self._lock:
+            proyecto = self.por_id.pop(identificador, None)
+            if proyecto is None:
+                return None
+            self._descartar(self.por_estado, proyecto.get("estado"), identificador)
+            self._descartar(self.por_prioridad, proyecto.get("prioridad"), identificador)
+            self.abiertos.discard(identificador)
+            inicio, fin = (_mes(fecha) for fecha in self.rangos.pop(identificador))
+            if inicio is not None and fin is not None:
+                for mes in range(inicio, fin + 1):
+                    self._descartar(self.por_mes, mes, identificador)
+            return proyecto
+
+    @staticmethod
+    def _descartar(indice, clave, identificador):
+        ids = indice.get(clave)
+        if ids is not None:
+            ids.discard(identificador)
+            if not ids:
+                del indice[clave]
+
+    # ============================================
+    # CONSULTAS
+    # ============================================
+    def obtener(self, identificador):
+        proyecto = self.por_id.get(identificador)
+        return dict(proyecto) if proyecto is not None else None
+
+    def _ids_en_rango(self, desde, hasta):
+        """Ids de proyectos cuyo intervalo [inicio, fin] se cruza con [desde, hasta] (date)"""
+        inicio, fin = _mes(desde), _mes(hasta)
+        # Un rango abierto (solo desde o solo hasta) abarca miles de meses: en ese
+        # caso se recorren los meses indexados en lugar de todo el calendario
+        if fin - inicio + 1 > len(self.por_mes):
+            meses = [mes for mes in self.por_mes if inicio <= mes <= fin]
+        else:
+            meses = range(inicio, fin + 1)
+        ids = set()
+        for mes in meses:
+            ids |= self.por_mes.get(mes, set())
+        # El índice es por mes: se afina con las fechas exactas en los extremos
+        ids = {i for i in ids if self.rangos[i][0] <= hasta and self.rangos[i][1] >= desde}
+        ids |= {i for i in self.abiertos if self.rangos[i][0] <= hasta}
+        return ids
+
+    @staticmethod
+    def _limite(valor, defecto):
+        """Extremo de un filtro de fechas: el defecto si no se indicó, ValueError si no es una fecha"""
+        if valor is None:
+            return defecto
+        fecha = _fecha(valor)
+        if fecha is None:
+            raise ValueError(f"Fecha no válida: {valor!r} (se espera AAAA-MM-DD)")
+        return fecha
+
+    def buscar(self, estado=None, prioridad=None, desde=None, hasta=None):
+        """Proyectos que cumplen todos los filtros indicados (ordenados por id)
+
+        desde y hasta son date o texto AAAA-MM-DD; ValueError si no son fechas.
+        """
+        if desde is not None or hasta is not None:
+            desde, hasta = self._limite(desde, date.min), self._limite(hasta, date.max)
+        with self._lock:
+            conjuntos = []
+            if estado is not None:
+                conjuntos.append(self.por_estado.get(estado, set()))
+            if prioridad is not None:
+                conjuntos.append(self.por_prioridad.get(prioridad, set()))
+            if desde is not None or hasta is not None:
+                conjuntos.append(self._ids_en_rango(desde, hasta) if desde <= hasta else set())
+            if conjuntos:
+                conjuntos.sort(key=len)
+                ids = conjuntos[0].intersection(*conjuntos[1:])
+            else:
+                ids = self.por_id.keys()
+            return [dict(self.por_id[i]) for i in sorted(ids)]
+
+    def activos_en(self, año, mes, estado=None, prioridad=None):
+        """Proyectos cuyo período se cruza con el mes indicado"""
+        mes = StorageCota.numero_mes(mes)
+        desde = date(int(año), mes, 1)
+        hasta = date(int(año), mes, calendar.monthrange(int(año), mes)[1])
+        return self.buscar(estado, prioridad, desde, hasta)
+
+
+class ProyectosCota:
+    """Un registro por municipio, construido una vez por proceso
+
+    Fuentes (las posteriores reemplazan a las anteriores por id):
+    proyectos_prioritarios de la configuración, config/proyectos.json (solo
+    el municipio por defecto) y la tabla proyectos del almacén. El registro se
+    revalida con la firma de los archivos y el contador de versiones de la
+    tabla; los cambios hechos con guardar() se aplican sin reconstruirlo.
+    """
+
+    ESTADO_EN_EJECUCION = "En ejecución"
+
+    _registros = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def version_almacen(conn=None):
+        fila = (conn or StorageCota.conexion()).execute(
+            "SELECT version FROM proyectos_version WHERE id = 1"
+        ).fetchone()
+        return fila[0] if fila else 0
+
+    @staticmethod
+    def ruta_archivo(municipio=None):
+        municipio = municipio or ConfigCota.municipio_actual()
+        if municipio != ConfigCota.MUNICIPIO_POR_DEFECTO:
+            return None
+        return ConfigCota.CONFIG_DIR / "proyectos.json"
+
+    @classmethod
+    def _firma(cls, municipio):
+        ruta = cls.ruta_archivo(municipio)
+        return (
+            ConfigCota.version_configuracion(municipio),
+            ConfigCota._firma_archivo(ruta) if ruta else None,
+            cls.version_almacen(),
+        )
+
+    @classmethod
+    def _leer_archivo(cls, municipio):
+        ruta = cls.ruta_archivo(municipio)
+        if ruta is None or not ruta.exists() or ruta.stat().st_size == 0:
+            return []
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        return datos.get("proyectos", []) if isinstance(datos, dict) else datos
+
+    @classmethod
+    def _construir(cls, municipio):
+        configuracion = ConfigCota.configuracion_mutable()
+        proyectos = {}
+        for origen in (configuracion.get("proyectos_prioritarios", []), cls._leer_archivo(municipio),
+                       StorageCota.obtener_proyectos()):
+            for proyecto in origen or []:
+                if proyecto.get("id"):
+                    proyectos[proyecto["id"]] = proyecto
+        return RegistroProyectos(proyectos.values())
+
+    @classmethod
+    def registro(cls):
+        """Registro del municipio activo (se reconstruye solo si cambió alguna fuente)"""
+        municipio = ConfigCota.municipio_actual()
+        firma = cls._firma(municipio)
+        entrada = cls._registros.get(municipio)
+        if entrada is not None and entrada[0] == firma:
+            return entrada[1]
+        with cls._lock:
+            entrada = cls._registros.get(municipio)
+            if entrada is None or entrada[0] != firma:
+                entrada = (firma, cls._construir(municipio))
+                cls._registros[municipio] = entrada
+            return entrada[1]
+
+    @classmethod
+    def guardar(cls, proyecto):
+        """Guarda un proyecto en el almacén y actualiza el registro en memoria"""
+        registro = cls.registro()
+        municipio = ConfigCota.municipio_actual()
+        with StorageCota.transaccion() as conn:
+            anterior = cls.version_almacen(conn)
+            StorageCota.guardar_proyecto(proyecto, conn=conn)
+            version = cls.version_almacen(conn)
+        with cls._lock:
+            entrada = cls._registros.get(municipio)
+            # Si nadie más escribió entre medio, basta con reindexar este proyecto
+            if entrada is not None and entrada[1] is registro and entrada[0][2] == anterior:
+                registro.actualizar(proyecto)
+                cls._registros[municipio] = (entrada[0][:2] + (version,), registro)
+        return cls.registro()
+
+    @classmethod
+    def invalidar(cls):
+        with cls._lock:
+            cls._registros.clear()
+
+    # Atajos sobre el registro del municipio activo
+    @classmethod
+    def obtener(cls, identificador):
+        return cls.registro().obtener(identificador)
+
+    @classmethod
+    def buscar(cls, estado=None, prioridad=None, desde=None, hasta=None):
+        return cls.registro().buscar(estado, prioridad, desde, hasta)
+
+    @classmethod
+    def activos_en(cls, año, mes, estado=None, prioridad=None):
+        return cls.registro().activos_en(año, mes, estado, prioridad)
+
+
+# Instancia global de proyectos
+projects = ProyectosCota()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Consulta el registro de proyectos")
+    parser.add_argument("--estado")
+    parser.add_argument("--prioridad")
+    parser.add_argument("--año", type=int)
+    parser.add_argument("--mes", type=int, choices=range(1, 13), metavar="MES")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    registro = ProyectosCota.registro()
+    construido = time.perf_counter()
+    if args.año and args.mes:
+        proyectos = registro.activos_en(args.año, args.mes, args.estado, args.prioridad)
+    else:
+        proyectos = registro.buscar(args.estado, args.prioridad)
+    fin = time.perf_counter()
+
+    for proyecto in proyectos:
+        print(f"• {proyecto['id']} [{proyecto.get('estado')}/{proyecto.get('prioridad')}] "
+              f"{proyecto.get('nombre')} ({proyecto.get('fecha_inicio')} → "
+              f"{proyecto.get('fecha_fin_estimada', proyecto.get('fecha_fin'))})")
+    print(f"🔎 {len(proyectos)} de {len(registro)} proyectos · registro {(construido - inicio) * 1000:.1f} ms · "
+          f"consulta {(fin - construido) * 1000:.2f} ms")
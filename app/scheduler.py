@@ -0,0 +1,282 @@
+"""
+TAREAS PROGRAMADAS (RESPALDOS, CONSOLIDADOS, ÍNDICE) - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.scheduler                      # servicio: corre las tareas según su horario
+    python -m app.scheduler --ejecutar respaldo  # una tarea ahora y termina
+    python -m app.scheduler --estado             # horario y últimas ejecuciones
+
+El mantenimiento pesado corre en este proceso aparte (con prioridad baja),
+no dentro de las sesiones de Streamlit. Los horarios usan sintaxis cron
+("minuto hora día mes día_semana") y se pueden cambiar en cota.json:
+
+    "tareas_programadas": {"respaldo": "0 */6 * * *", "tablero": null}
+
+(null desactiva la tarea). Un bloqueo por tarea evita que dos instancias
+del servicio ejecuten la misma tarea a la vez.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from .atomic import EscrituraCota
+from .config import ConfigCota
+from .logger import logger
+from .metrics import MetricasCota, cronometro
+from .storage import StorageCota
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tareas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tarea TEXT NOT NULL,
+    inicio TEXT NOT NULL,
+    segundos REAL,
+    estado TEXT NOT NULL,
+    detalle TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tareas_tarea ON tareas (tarea, inicio);
+"""
+StorageCota.registrar_esquema(ESQUEMA)
+
+
+class Cron:
+    """Expresión cron de cinco campos: *, listas (1,15), rangos (1-5) y pasos (*/10, 8-18/2)
+
+    Día del mes y día de la semana (0 o 7 = domingo) se combinan como en cron:
+    si ambos están restringidos basta con que se cumpla uno.
+    """
+
+    LIMITES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expresion):
+        partes = expresion.split()
+        if len(partes) != 5:
+            raise ValueError(f"Expresión cron inválida (se esperan 5 campos): {expresion!r}")
+        self.expresion = expresion
+        self.minutos, self.horas, self.dias, self.meses, semana = (
+            self._campo(parte, *limites) for parte, limites in zip(partes, self.LIMITES)
+        )
+        self.dias_semana = {d % 7 for d in semana}
+        self._dia_libre, self._semana_libre = partes[2] == "*", partes[4] == "*"
+
+    @staticmethod
+    def _campo(texto, minimo, maximo):
+        valores = set()
+        for parte in texto.split(","):
+            rango, _, paso = parte.partition("/")
+            if rango == "*":
+                desde, hasta = minimo, maximo
+            elif "-" in rango:
+                desde, hasta = (int(v) for v in rango.split("-", 1))
+            else:
+                desde = hasta = int(rango)
+                if paso:
+                    hasta = maximo
+            paso = int(paso) if paso else 1
+            if not (minimo <= desde <= hasta <= maximo) or paso < 1:
+                raise ValueError(f"Campo cron fuera de rango: {parte!r} ({minimo}-{maximo})")
+            valores.update(range(desde, hasta + 1, paso))
+        return valores
+
+    def _dia_valido(self, momento):
+        en_mes = momento.day in self.dias
+        en_semana = (momento.weekday() + 1) % 7 in self.dias_semana
+        if self._dia_libre or self._semana_libre:
+            return en_mes and en_semana
+        return en_mes or en_semana
+
+    def siguiente(self, desde):
+        """Primer minuto estrictamente posterior a 'desde' que cumple la expresión"""
+        momento = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = momento + timedelta(days=366 * 5)
+        while momento < limite:
+            if momento.month not in self.meses:
+                momento = (momento.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._dia_valido(momento):
+                momento = momento.replace(hour=0, minute=0) + timedelta(days=1)
+            elif momento.hour not in self.horas:
+                momento = momento.replace(minute=0) + timedelta(hours=1)
+            elif momento.minute not in self.minutos:
+                momento += timedelta(minutes=1)
+            else:
+                return momento
+        raise ValueError(f"La expresión cron nunca se cumple: {self.expresion!r}")
+
+
+# ============================================
+# TAREAS
+# ============================================
+def _por_municipio(funcion):
+    """Ejecuta funcion() con cada municipio activo; devuelve {municipio: resultado}"""
+    resultados = {}
+    for municipio in ConfigCota.municipios():
+        contexto = contextvars.copy_context()
+        contexto.run(ConfigCota.seleccionar_municipio, municipio)
+        resultados[municipio] = contexto.run(funcion)
+    return resultados
+
+
+def _respaldo():
+    from .backup import RespaldoCota
+    return RespaldoCota.respaldar()
+
+
+def _agregados():
+    from .aggregates import AgregadosCota
+    return _por_municipio(AgregadosCota.reconstruir)
+
+
+def _busqueda():
+    from .search import BusquedaCota
+    return _por_municipio(BusquedaCota.indexar_existentes)
+
+
+def _tablero():
+    from .dashboard import TableroCota
+    return _por_municipio(TableroCota.construir)
+
+
+class ProgramadorCota:
+    """Servicio asyncio que ejecuta las tareas de mantenimiento según su horario cron
+
+    Cada tarea corre en un hilo (asyncio.to_thread) para no frenar el bucle,
+    con su cronómetro (métrica "tarea.<nombre>") y su registro en la tabla
+    'tareas' del almacén del municipio por defecto.
+    """
+
+    # nombre: (horario por defecto, función, descripción)
+    TAREAS = {
+        "respaldo": ("30 1 * * *", _respaldo, "Respaldo incremental de config, data y reports"),
+        "agregados": ("0 2 * * *", _agregados, "Reconstrucción de los consolidados"),
+        "busqueda": ("30 2 * * *", _busqueda, "Reindexación incremental de la búsqueda"),
+        "tablero": ("45 2 * * *", _tablero, "Series precalculadas del tablero"),
+    }
+
+    @classmethod
+    def horarios(cls):
+        """{tarea: Cron} con los cambios de cota.json (tareas desactivadas excluidas)"""
+        cambios = ConfigCota.cargar_configuracion().get("tareas_programadas") or {}
+        horarios = {}
+        for nombre, (horario, _, _) in cls.TAREAS.items():
+            horario = cambios.get(nombre, horario)
+            if horario:
+                horarios[nombre] = Cron(horario)
+        return horarios
+
+    @classmethod
+    def ejecutar_tarea(cls, nombre):
+        """Ejecuta una tarea si ninguna otra instancia la está corriendo; devuelve (estado, detalle)"""
+        funcion = cls.TAREAS[nombre][1]
+        inicio, reloj = datetime.now(), time.perf_counter()
+        with ExitStack() as pila:
+            try:
+                pila.enter_context(EscrituraCota.bloqueo("tarea", nombre, espera=0))
+            except TimeoutError:
+                estado, detalle = "omitida", "otra instancia la está ejecutando"
+            else:
+                try:
+                    with cronometro(f"tarea.{nombre}"):
+                        estado, detalle = "ok", funcion()
+                except Exception as e:
+                    estado, detalle = "error", f"{type(e).__name__}: {e}"
+        segundos = round(time.perf_counter() - reloj, 3)
+        cls._registrar(nombre, inicio, segundos, estado, detalle)
+        return estado, detalle
+
+    @classmethod
+    def _registrar(cls, nombre, inicio, segundos, estado, detalle):
+        texto = json.dumps(detalle, ensure_ascii=False, default=str)
+        with StorageCota.transaccion() as conn:
+            conn.execute(
+                "INSERT INTO tareas (tarea, inicio, segundos, estado, detalle) VALUES (?, ?, ?, ?, ?)",
+                (nombre, inicio.isoformat(timespec="seconds"), segundos, estado, texto)
+            )
+        nivel = {"ok": "INFO", "omitida": "WARNING"}.get(estado, "ERROR")
+        logger.registrar(f"Tarea {nombre}: {estado} en {segundos} s ({texto[:300]})", nivel)
+
+    @classmethod
+    def ultimas(cls, limite=20):
+        """Últimas ejecuciones registradas: [{tarea, inicio, segundos, estado, detalle}]"""
+        return [dict(fila) for fila in StorageCota.conexion().execute(
+            "SELECT tarea, inicio, segundos, estado, detalle FROM tareas ORDER BY id DESC LIMIT ?", (limite,)
+        )]
+
+    @classmethod
+    async def servir(cls, detener=None, ahora=datetime.now):
+        """Bucle del servicio hasta que se active 'detener' (asyncio.Event)"""
+        detener = detener or asyncio.Event()
+        horarios = cls.horarios()
+        if not horarios:
+            return
+        proximas = {nombre: cron.siguiente(ahora()) for nombre, cron in horarios.items()}
+        en_curso = {}
+        while not detener.is_set():
+            nombre, momento = min(proximas.items(), key=lambda item: item[1])
+            espera = (momento - ahora()).total_seconds()
+            if espera > 0:
+                # Espera por tramos cortos: un cambio de hora del sistema se nota pronto
+                try:
+                    await asyncio.wait_for(detener.wait(), timeout=min(espera, 60))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            proximas[nombre] = horarios[nombre].siguiente(momento)
+            if nombre in en_curso and not en_curso[nombre].done():
+                logger.registrar(f"Tarea {nombre}: la ejecución anterior sigue en curso", "WARNING")
+                continue
+            en_curso[nombre] = asyncio.create_task(asyncio.to_thread(cls.ejecutar_tarea, nombre))
+        await asyncio.gather(*en_curso.values(), return_exceptions=True)
+
+
+# Instancia global del programador
+scheduler = ProgramadorCota()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Tareas programadas de mantenimiento")
+    parser.add_argument("--ejecutar", nargs="+", choices=list(ProgramadorCota.TAREAS), metavar="TAREA",
+                        help=f"Ejecuta ahora estas tareas ({', '.join(ProgramadorCota.TAREAS)}) y termina")
+    parser.add_argument("--estado", action="store_true", help="Muestra el horario y las últimas ejecuciones")
+    args = parser.parse_args(argv)
+
+    if args.estado:
+        for nombre, cron in ProgramadorCota.horarios().items():
+            print(f"🕑 {nombre:<10} {cron.expresion:<15} próxima: {cron.siguiente(datetime.now()):%Y-%m-%d %H:%M}"
+                  f"  ({ProgramadorCota.TAREAS[nombre][2]})")
+        for fila in ProgramadorCota.ultimas():
+            print(f"   {fila['inicio']} {fila['tarea']:<10} {fila['estado']:<8} {fila['segundos']} s")
+        return 0
+
+    # Prioridad baja: el mantenimiento cede la CPU a las sesiones interactivas
+    if hasattr(os, "nice"):
+        os.nice(10)
+    # Las métricas de este proceso no pisan las de Streamlit
+    MetricasCota.NOMBRE_ARCHIVO = "metricas_tareas.prom"
+
+    if args.ejecutar:
+        fallidas = 0
+        for nombre in args.ejecutar:
+            estado, detalle = ProgramadorCota.ejecutar_tarea(nombre)
+            print(f"{'✅' if estado == 'ok' else '⚠️' if estado == 'omitida' else '❌'} {nombre}: {estado} · {detalle}")
+            fallidas += estado == "error"
+        logger.vaciar()
+        return 1 if fallidas else 0
+
+    print("🕑 Servicio de tareas iniciado (Ctrl+C para detener)")
+    for nombre, cron in ProgramadorCota.horarios().items():
+        print(f"   {nombre:<10} {cron.expresion}")
+    try:
+        asyncio.run(ProgramadorCota.servir())
+    except KeyboardInterrupt:
+        pass
+    logger.vaciar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
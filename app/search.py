@@ -0,0 +1,180 @@
+"""
+BÚSQUEDA DE TEXTO COMPLETO EN INFORMES - ALCALDÍA DE COTA
+
+Uso:
+    python -m app.search --indexar
+    python -m app.search "migración sistemas"
+"""
+import re
+import time
+from pathlib import Path
+from .config import ConfigCota
+from .storage import StorageCota
+
+# unicode61 + remove_diacritics: "migracion" encuentra "Migración"
+ESQUEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5 (
+    ruta UNINDEXED,
+    periodo,
+    dependencia,
+    responsable,
+    cargo,
+    actividades,
+    indicadores,
+    contenido,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS busqueda_archivos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ruta TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    tamano INTEGER NOT NULL
+);
+"""
+StorageCota.registrar_esquema(ESQUEMA)
+
+_CAMPO = re.compile(r"^(PERÍODO|DEPENDENCIA|RESPONSABLE|CARGO):\s*(.*)$", re.MULTILINE)
+_SEPARADOR = re.compile(r"^=+$")
+
+
+class BusquedaCota:
+    """Índice FTS5 de los informes generados (en el mismo almacén SQLite)"""
+
+    @staticmethod
+    def extraer_campos(contenido):
+        """Extrae período, dependencia, responsable, cargo, actividades e indicadores del texto del informe"""
+        campos = {clave.lower(): valor.strip() for clave, valor in _CAMPO.findall(contenido)}
+        actividades, indicadores = [], []
+        seccion = None
+        for linea in contenido.splitlines():
+            if _SEPARADOR.match(linea):
+                continue
+            if linea.startswith("ACTIVIDADES REALIZADAS"):
+                seccion = actividades
+            elif linea.startswith(("INDICADORES", "FIRMAS", "INFORMACIÓN DE CONTACTO")):
+                seccion = indicadores if linea.startswith("INDICADORES") else None
+            elif seccion is not None and linea.strip():
+                seccion.append(linea.lstrip("• ").strip())
+        return {
+            "periodo": campos.get("período", ""),
+            "dependencia": campos.get("dependencia", ""),
+            "responsable": campos.get("responsable", ""),
+            "cargo": campos.get("cargo", ""),
+            "actividades": "\n".join(actividades),
+            "indicadores": "\n".join(indicadores),
+        }
+
+    @classmethod
+    def indexar_texto(cls, ruta, contenido, dependencia=None, conn=None):
+        """Indexa (o reindexa) un informe"""
+        ruta = str(ruta)
+        campos = cls.extraer_campos(contenido)
+        if dependencia is None:
+            fila = StorageCota.conexion().execute(
+                "SELECT dependencia FROM informes WHERE ruta = ? ORDER BY id DESC LIMIT 1", (ruta,)
+            ).fetchone()
+            # Sin registro en el almacén, la del encabezado del informe
+            dependencia = fila["dependencia"] if fila else campos["dependencia"]
+        try:
+            estado = Path(ruta).stat()
+            firma = (estado.st_mtime_ns, estado.st_size)
+        except OSError:
+            firma = (0, len(contenido))
+
+        if conn is None:
+            with StorageCota.transaccion() as conn:
+                cls._escribir(conn, ruta, firma, dependencia, campos, contenido)
+        else:
+            cls._escribir(conn, ruta, firma, dependencia, campos, contenido)
+
+    @staticmethod
+    def _escribir(conn, ruta, firma, dependencia, campos, contenido):
+        conn.execute(
+            """INSERT INTO busqueda_archivos (ruta, mtime_ns, tamano) VALUES (?, ?, ?)
+               ON CONFLICT (ruta) DO UPDATE SET mtime_ns = excluded.mtime_ns, tamano = excluded.tamano""",
+            (ruta, *firma)
+        )
+        identificador = conn.execute("SELECT id FROM busqueda_archivos WHERE ruta = ?", (ruta,)).fetchone()[0]
+        conn.execute("DELETE FROM busqueda WHERE rowid = ?", (identificador,))
+        conn.execute(
+            """INSERT INTO busqueda (rowid, ruta, periodo, dependencia, responsable, cargo,
+                                     actividades, indicadores, contenido)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (identificador, ruta, campos["periodo"], dependencia or "", campos["responsable"],
+             campos["cargo"], campos["actividades"], campos["indicadores"], contenido)
+        )
+
+    @classmethod
+    def indexar_existentes(cls, directorio=None):
+        """Indexa incrementalmente los .txt de reports/<año>/<mes>/ (solo nuevos o modificados)"""
+        directorio = Path(directorio) if directorio else ConfigCota.obtener_ruta("reports")
+        conocidos = {
+            fila["ruta"]: (fila["mtime_ns"], fila["tamano"])
+            for fila in StorageCota.conexion().execute("SELECT ruta, mtime_ns, tamano FROM busqueda_archivos")
+        }
+        resumen = {"indexados": 0, "sin_cambios": 0, "eliminados": 0}
+        vistos = set()
+
+        with StorageCota.transaccion() as conn:
+            for archivo in directorio.glob("*/*/*.txt"):
+                ruta = str(archivo)
+                vistos.add(ruta)
+                estado = archivo.stat()
+                if conocidos.get(ruta) == (estado.st_mtime_ns, estado.st_size):
+                    resumen["sin_cambios"] += 1
+                    continue
+                cls.indexar_texto(ruta, archivo.read_text(encoding="utf-8", errors="replace"), conn=conn)
+                resumen["indexados"] += 1
+
+            for ruta in set(conocidos) - vistos:
+                if Path(ruta).is_relative_to(directorio) and not Path(ruta).exists():
+                    identificador = conn.execute(
+                        "SELECT id FROM busqueda_archivos WHERE ruta = ?", (ruta,)
+                    ).fetchone()[0]
+                    conn.execute("DELETE FROM busqueda WHERE rowid = ?", (identificador,))
+                    conn.execute("DELETE FROM busqueda_archivos WHERE id = ?", (identificador,))
+                    resumen["eliminados"] += 1
+        return resumen
+
+    @staticmethod
+    def consulta_fts(texto):
+        """Convierte texto libre en una consulta FTS5 segura: cada palabra como prefijo"""
+        palabras = re.findall(r"\w+", texto, flags=re.UNICODE)
+        return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+    @classmethod
+    def buscar(cls, texto, limite=50):
+        """Busca informes; devuelve [{ruta, periodo, dependencia, fragmento}] por relevancia"""
+        consulta = cls.consulta_fts(texto)
+        if not consulta:
+            return []
+        filas = StorageCota.conexion().execute(
+            """SELECT ruta, periodo, dependencia, responsable,
+                      snippet(busqueda, -1, '**', '**', '…', 12) AS fragmento
+               FROM busqueda WHERE busqueda MATCH ? ORDER BY rank LIMIT ?""",
+            (consulta, limite)
+        ).fetchall()
+        return [dict(fila) for fila in filas]
+
+
+# Instancia global de búsqueda
+search = BusquedaCota()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Búsqueda de texto completo en informes")
+    parser.add_argument("texto", nargs="?", help="Texto a buscar")
+    parser.add_argument("--indexar", action="store_true", help="Indexa los informes nuevos o modificados")
+    args = parser.parse_args()
+
+    if args.indexar:
+        resumen = BusquedaCota.indexar_existentes()
+        print(f"✅ Indexados: {resumen['indexados']}  Sin cambios: {resumen['sin_cambios']}  "
+              f"Eliminados: {resumen['eliminados']}")
+    if args.texto:
+        inicio = time.perf_counter()
+        resultados = BusquedaCota.buscar(args.texto)
+        print(f"🔎 {len(resultados)} resultados en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+        for resultado in resultados:
+            print(f"• {resultado['periodo']} - {resultado['dependencia']}: {resultado['ruta']}")
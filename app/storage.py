@@ -0,0 +1,569 @@
+"""
+ALMACÉN DE DATOS (SQLITE) - ALCALDÍA DE COTA
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from .config import ConfigCota
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS informes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    municipio TEXT NOT NULL,
+    dependencia TEXT NOT NULL DEFAULT '',
+    año INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    tipo TEXT NOT NULL DEFAULT 'mensual',
+    responsable TEXT,
+    cargo TEXT,
+    actividades TEXT,
+    ruta TEXT,
+    hash TEXT,
+    creado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_informes_periodo
+    ON informes (municipio, dependencia, año, mes, tipo);
+CREATE INDEX IF NOT EXISTS idx_informes_hash ON informes (hash);
+
+CREATE TABLE IF NOT EXISTS indicadores (
+    municipio TEXT NOT NULL,
+    dependencia TEXT NOT NULL,
+    año INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    indicador TEXT NOT NULL,
+    valor REAL,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (municipio, dependencia, año, mes, indicador)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_indicadores_serie
+    ON indicadores (municipio, indicador, año, mes);
+
+CREATE TABLE IF NOT EXISTS proyectos (
+    municipio TEXT NOT NULL,
+    id TEXT NOT NULL,
+    nombre TEXT,
+    estado TEXT,
+    prioridad TEXT,
+    fecha_inicio TEXT,
+    fecha_fin TEXT,
+    datos TEXT NOT NULL,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (municipio, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_proyectos_estado ON proyectos (municipio, estado);
+
+CREATE TABLE IF NOT EXISTS documentos (
+    subcarpeta TEXT NOT NULL DEFAULT '',
+    nombre TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (subcarpeta, nombre)
+) WITHOUT ROWID;
+"""
+
+
+class ConflictoVersion(Exception):
+    """Otro editor guardó el documento después de que se leyó (control optimista)"""
+
+    def __init__(self, nombre, esperada, actual):
+        super().__init__(f"El documento '{nombre}' cambió: se esperaba la versión {esperada} y está en la {actual}")
+        self.nombre = nombre
+        self.esperada = esperada
+        self.actual = actual
+
+
+class StorageCota:
+    """Almacén local en SQLite (modo WAL) para informes, indicadores y proyectos"""
+
+    NOMBRE_BASE_DATOS = "cota.db"
+
+    _local = threading.local()
+    _lock = threading.Lock()
+    _esquemas = [ESQUEMA]
+    _inicializadas = {}  # ruta -> cuántos esquemas registrados ya se aplicaron
+
+    @classmethod
+    def ruta_base_datos(cls):
+        """Ruta del archivo SQLite dentro de data/base_datos"""
+        return ConfigCota.obtener_ruta("base_datos") / cls.NOMBRE_BASE_DATOS
+
+    @classmethod
+    def conexion(cls):
+        """Devuelve la conexión del hilo actual (sqlite3 no comparte conexiones entre hilos)"""
+        ruta = str(cls.ruta_base_datos())
+        conexiones = getattr(cls._local, "conexiones", None)
+        if conexiones is None:
+            conexiones = cls._local.conexiones = {}
+
+        conn = conexiones.get(ruta)
+        if conn is None:
+            conn = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conexiones[ruta] = conn
+        if cls._inicializadas.get(ruta) != len(cls._esquemas):
+            cls._crear_esquema(conn, ruta)
+        return conn
+
+    @classmethod
+    def registrar_esquema(cls, esquema):
+        """Agrega las tablas de un módulo (sentencias IF NOT EXISTS) a las que crea el almacén
+
+        Cada módulo con tablas propias lo llama al importarse, así el almacén
+        no depende de ellos. Las conexiones de este hilo las crean enseguida
+        (el módulo puede importarse a mitad de una transacción que ya las
+        usa); las de otros hilos, en su siguiente conexion().
+        """
+        with cls._lock:
+            if esquema in cls._esquemas:
+                return
+            cls._esquemas.append(esquema)
+        for ruta, conn in getattr(cls._local, "conexiones", {}).items():
+            cls._crear_esquema(conn, ruta)
+
+    @classmethod
+    def _crear_esquema(cls, conn, ruta):
+        """Crea las tablas e índices registrados que faltan, una vez por proceso y archivo
+
+        Se ejecuta sentencia por sentencia: executescript confirmaría la
+        transacción abierta de quien importó el módulo a mitad de una escritura.
+        """
+        with cls._lock:
+            total = len(cls._esquemas)
+            sentencia = ""
+            for linea in "".join(cls._esquemas[cls._inicializadas.get(ruta, 0):]).splitlines(keepends=True):
+                sentencia += linea
+                if sqlite3.complete_statement(sentencia):
+                    conn.execute(sentencia)
+                    sentencia = ""
+            # Dentro de una transacción se podría deshacer: se confirma en la siguiente conexión
+            if not conn.in_transaction:
+                cls._inicializadas[ruta] = total
+
+    @classmethod
+    @contextmanager
+    def transaccion(cls):
+        """Transacción de escritura (BEGIN IMMEDIATE evita bloqueos al escalar de lectura a escritura)"""
+        conn = cls.conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    @classmethod
+    def cerrar(cls):
+        """Cierra las conexiones abiertas por el hilo actual"""
+        for conn in getattr(cls._local, "conexiones", {}).values():
+            conn.close()
+        cls._local.conexiones = {}
+
+    # ============================================
+    # UTILIDADES
+    # ============================================
+    @staticmethod
+    def numero_mes(mes):
+        """Convierte un mes (número o nombre en español) a entero 1-12"""
+        if isinstance(mes, int):
+            numero = mes
+        elif isinstance(mes, str) and mes.strip().isdigit():
+            numero = int(mes)
+        else:
+            nombres = [m.lower() for m in ConfigCota.MESES]
+            try:
+                numero = nombres.index(str(mes).strip().lower()) + 1
+            except ValueError:
+                raise ValueError(f"Mes no reconocido: {mes}")
+        if not 1 <= numero <= 12:
+            raise ValueError(f"Mes fuera de rango: {mes}")
+        return numero
+
+    @staticmethod
+    def _municipio(municipio=None):
+        """Municipio por defecto según la configuración"""
+        if municipio:
+            return municipio
+        return ConfigCota.cargar_configuracion().get("municipio", {}).get("nombre", "Cota")
+
+    @staticmethod
+    def _ahora():
+        return datetime.now().isoformat(timespec="seconds")
+
+    # ============================================
+    # INFORMES
+    # ============================================
+    @classmethod
+    def registrar_informe(cls, mes, año, ruta=None, hash=None, dependencia="", tipo="mensual",
+                          responsable=None, cargo=None, actividades=None, municipio=None):
+        """Registra un informe generado y devuelve su id"""
+        with cls.transaccion() as conn:
+            cursor = conn.execute(
+                """INSERT INTO informes (municipio, dependencia, año, mes, tipo, responsable,
+                                         cargo, actividades, ruta, hash, creado)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (cls._municipio(municipio), dependencia or "", int(año), cls.numero_mes(mes), tipo,
+                 responsable, cargo, json.dumps(list(actividades or []), ensure_ascii=False),
+                 ruta, hash, cls._ahora())
+            )
+            return cursor.lastrowid
+
+    @classmethod
+    def obtener_informes(cls, año=None, mes=None, dependencia=None, tipo=None, municipio=None):
+        """Consulta informes registrados por período y dependencia"""
+        condiciones = ["municipio = ?"]
+        parametros = [cls._municipio(municipio)]
+        for columna, valor in (("año", año), ("mes", mes), ("dependencia", dependencia), ("tipo", tipo)):
+            if valor is None:
+                continue
+            condiciones.append(f"{columna} = ?")
+            parametros.append(cls.numero_mes(valor) if columna == "mes" else valor)
+
+        filas = cls.conexion().execute(
+            f"SELECT * FROM informes WHERE {' AND '.join(condiciones)} ORDER BY año, mes, id",
+            parametros
+        ).fetchall()
+
+        informes = []
+        for fila in filas:
+            informe = dict(fila)
+            informe["actividades"] = json.loads(informe["actividades"] or "[]")
+            informes.append(informe)
+        return informes
+
+    # ============================================
+    # INDICADORES
+    # ============================================
+    @classmethod
+    def guardar_indicadores(cls, dependencia, año, mes, valores, municipio=None, conn=None):
+        """Guarda (o actualiza) los indicadores de una dependencia en un período"""
+        from .aggregates import AgregadosCota
+
+        municipio, año, mes = cls._municipio(municipio), int(año), cls.numero_mes(mes)
+        filas = [
+            (municipio, dependencia, año, mes, indicador, valor, cls._ahora())
+            for indicador, valor in valores.items()
+        ]
+        sql = """INSERT INTO indicadores (municipio, dependencia, año, mes, indicador, valor, actualizado)
+                 VALUES (?, ?, ?, ?, ?, ?, ?)
+                 ON CONFLICT (municipio, dependencia, año, mes, indicador)
+                 DO UPDATE SET valor = excluded.valor, actualizado = excluded.actualizado"""
+        if conn is not None:
+            conn.executemany(sql, filas)
+            AgregadosCota.actualizar(conn, municipio, dependencia, año, [mes])
+        else:
+            with cls.transaccion() as conn:
+                conn.executemany(sql, filas)
+                AgregadosCota.actualizar(conn, municipio, dependencia, año, [mes])
+        return len(filas)
+
+    @classmethod
+    def guardar_indicadores_lote(cls, periodos, municipio=None):
+        """Guarda {(dependencia, año, mes): {indicador: valor}} en una sola transacción
+
+        Los consolidados se recalculan una vez por dependencia y año, no por mes.
+        """
+        from .aggregates import AgregadosCota
+
+        municipio, ahora = cls._municipio(municipio), cls._ahora()
+        meses_por_año = {}
+        filas = []
+        for (dependencia, año, mes), valores in periodos.items():
+            año, mes = int(año), cls.numero_mes(mes)
+            meses_por_año.setdefault((dependencia, año), set()).add(mes)
+            filas.extend((municipio, dependencia, año, mes, indicador, valor, ahora)
+                         for indicador, valor in valores.items())
+        with cls.transaccion() as conn:
+            conn.executemany(
+                """INSERT INTO indicadores (municipio, dependencia, año, mes, indicador, valor, actualizado)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (municipio, dependencia, año, mes, indicador)
+                   DO UPDATE SET valor = excluded.valor, actualizado = excluded.actualizado""",
+                filas
+            )
+            for (dependencia, año), meses in meses_por_año.items():
+                AgregadosCota.actualizar(conn, municipio, dependencia, año, meses)
+        return len(filas)
+
+    @classmethod
+    def obtener_indicadores(cls, dependencia=None, año=None, mes=None, municipio=None):
+        """Devuelve {(dependencia, año, mes): {indicador: valor}} según los filtros"""
+        condiciones = ["municipio = ?"]
+        parametros = [cls._municipio(municipio)]
+        if dependencia is not None:
+            condiciones.append("dependencia = ?")
+            parametros.append(dependencia)
+        if año is not None:
+            condiciones.append("año = ?")
+            parametros.append(int(año))
+        if mes is not None:
+            condiciones.append("mes = ?")
+            parametros.append(cls.numero_mes(mes))
+
+        resultado = {}
+        for fila in cls.conexion().execute(
+            f"""SELECT dependencia, año, mes, indicador, valor FROM indicadores
+                WHERE {' AND '.join(condiciones)} ORDER BY dependencia, año, mes""",
+            parametros
+        ):
+            clave = (fila["dependencia"], fila["año"], fila["mes"])
+            resultado.setdefault(clave, {})[fila["indicador"]] = cls._valor(fila["valor"])
+        return resultado
+
+    @staticmethod
+    def _valor(valor):
+        """SQLite devuelve REAL; los conteos enteros vuelven como int"""
+        if isinstance(valor, float) and valor.is_integer():
+            return int(valor)
+        return valor
+
+    @classmethod
+    def obtener_periodo(cls, dependencia, año, mes, tipo=None, municipio=None):
+        """Indicadores, fecha de captura y último informe de una dependencia en un período"""
+        municipio = cls._municipio(municipio)
+        conn = cls.conexion()
+        mes = cls.numero_mes(mes)
+
+        filas = conn.execute(
+            """SELECT indicador, valor, actualizado FROM indicadores
+               WHERE municipio = ? AND dependencia = ? AND año = ? AND mes = ?""",
+            (municipio, dependencia, int(año), mes)
+        ).fetchall()
+
+        sql = """SELECT * FROM informes
+                 WHERE municipio = ? AND dependencia = ? AND año = ? AND mes = ?"""
+        parametros = [municipio, dependencia, int(año), mes]
+        if tipo is not None:
+            sql += " AND tipo = ?"
+            parametros.append(tipo)
+        informe = conn.execute(sql + " ORDER BY id DESC LIMIT 1", parametros).fetchone()
+        if informe is not None:
+            informe = dict(informe)
+            informe["actividades"] = json.loads(informe["actividades"] or "[]")
+
+        return {
+            "indicadores": {fila["indicador"]: cls._valor(fila["valor"]) for fila in filas},
+            "actualizado": max((fila["actualizado"] for fila in filas), default=None),
+            "informe": informe,
+        }
+
+    # ============================================
+    # PROYECTOS
+    # ============================================
+    @classmethod
+    def guardar_proyecto(cls, proyecto, municipio=None, conn=None):
+        """Guarda (o actualiza) un proyecto; debe tener 'id'"""
+        fila = (
+            cls._municipio(municipio), proyecto["id"], proyecto.get("nombre"),
+            proyecto.get("estado"), proyecto.get("prioridad"), proyecto.get("fecha_inicio"),
+            proyecto.get("fecha_fin_estimada", proyecto.get("fecha_fin")),
+            json.dumps(proyecto, ensure_ascii=False), cls._ahora()
+        )
+        sql = """INSERT INTO proyectos (municipio, id, nombre, estado, prioridad, fecha_inicio,
+                                        fecha_fin, datos, actualizado)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 ON CONFLICT (municipio, id) DO UPDATE SET
+                     nombre = excluded.nombre, estado = excluded.estado,
+                     prioridad = excluded.prioridad, fecha_inicio = excluded.fecha_inicio,
+                     fecha_fin = excluded.fecha_fin, datos = excluded.datos,
+                     actualizado = excluded.actualizado"""
+        if conn is not None:
+            conn.execute(sql, fila)
+        else:
+            with cls.transaccion() as conn:
+                conn.execute(sql, fila)
+
+    @classmethod
+    def obtener_proyectos(cls, estado=None, municipio=None):
+        """Devuelve los proyectos almacenados, opcionalmente filtrados por estado"""
+        sql = "SELECT datos FROM proyectos WHERE municipio = ?"
+        parametros = [cls._municipio(municipio)]
+        if estado is not None:
+            sql += " AND estado = ?"
+            parametros.append(estado)
+        return [json.loads(fila["datos"]) for fila in cls.conexion().execute(sql + " ORDER BY id", parametros)]
+
+    # ============================================
+    # DOCUMENTOS (compatibilidad con guardar_json / cargar_json)
+    # ============================================
+    @classmethod
+    def guardar_documento(cls, nombre, datos, subcarpeta=None, version=None):
+        """Guarda un documento JSON y devuelve su nueva versión
+
+        Con version (la leída con cargar_documento_version; 0 si no existía)
+        lanza ConflictoVersion si otro editor lo guardó entre medio.
+        """
+        texto = json.dumps(datos, ensure_ascii=False)
+        with cls.transaccion() as conn:
+            if version is not None:
+                fila = conn.execute(
+                    "SELECT version FROM documentos WHERE subcarpeta = ? AND nombre = ?",
+                    (subcarpeta or "", nombre)
+                ).fetchone()
+                actual = fila["version"] if fila else 0
+                if actual != version:
+                    raise ConflictoVersion(nombre, version, actual)
+            conn.execute(
+                """INSERT INTO documentos (subcarpeta, nombre, datos, version, actualizado)
+                   VALUES (?, ?, ?, 1, ?)
+                   ON CONFLICT (subcarpeta, nombre) DO UPDATE SET
+                       datos = excluded.datos, version = documentos.version + 1,
+                       actualizado = excluded.actualizado""",
+                (subcarpeta or "", nombre, texto, cls._ahora())
+            )
+            cls._expandir_documento(conn, nombre, datos)
+            return conn.execute(
+                "SELECT version FROM documentos WHERE subcarpeta = ? AND nombre = ?",
+                (subcarpeta or "", nombre)
+            ).fetchone()["version"]
+
+    @classmethod
+    def cargar_documento(cls, nombre, subcarpeta=None):
+        """Carga un documento JSON; devuelve None si no existe"""
+        fila = cls.conexion().execute(
+            "SELECT datos FROM documentos WHERE subcarpeta = ? AND nombre = ?",
+            (subcarpeta or "", nombre)
+        ).fetchone()
+        return json.loads(fila["datos"]) if fila else None
+
+    @classmethod
+    def cargar_documento_version(cls, nombre, subcarpeta=None):
+        """(datos, versión) de un documento; (None, 0) si no existe"""
+        fila = cls.conexion().execute(
+            "SELECT datos, version FROM documentos WHERE subcarpeta = ? AND nombre = ?",
+            (subcarpeta or "", nombre)
+        ).fetchone()
+        return (json.loads(fila["datos"]), fila["version"]) if fila else (None, 0)
+
+    @classmethod
+    def listar_documentos(cls, subcarpeta=None, limite=None):
+        """Documentos de una subcarpeta, del más reciente al más antiguo: [{nombre, datos, version, actualizado}]"""
+        sql = "SELECT nombre, datos, version, actualizado FROM documentos WHERE subcarpeta = ? ORDER BY actualizado DESC"
+        parametros = [subcarpeta or ""]
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(int(limite))
+        return [
+            {"nombre": fila["nombre"], "datos": json.loads(fila["datos"]),
+             "version": fila["version"], "actualizado": fila["actualizado"]}
+            for fila in cls.conexion().execute(sql, parametros)
+        ]
+
+    @classmethod
+    def eliminar_documento(cls, nombre, subcarpeta=None):
+        """Elimina un documento; devuelve True si existía"""
+        with cls.transaccion() as conn:
+            cursor = conn.execute(
+                "DELETE FROM documentos WHERE subcarpeta = ? AND nombre = ?", (subcarpeta or "", nombre)
+            )
+            return cursor.rowcount > 0
+
+    @classmethod
+    def referencia_documento(cls, nombre, subcarpeta=None):
+        """Referencia legible de un documento dentro del almacén"""
+        clave = f"{subcarpeta}/{nombre}" if subcarpeta else nombre
+        return f"{cls.ruta_base_datos()}::{clave}"
+
+    @classmethod
+    def _expandir_documento(cls, conn, nombre, datos):
+        """Distribuye los documentos conocidos en sus tablas indexadas"""
+        if nombre == "indicadores":
+            registros = datos.get("registros", []) if isinstance(datos, dict) else datos
+            for registro in registros or []:
+                cls.guardar_indicadores(
+                    registro.get("dependencia", ""), registro["año"], registro["mes"],
+                    registro.get("indicadores", {}), registro.get("municipio"), conn=conn
+                )
+        elif nombre == "proyectos":
+            proyectos = datos.get("proyectos", []) if isinstance(datos, dict) else datos
+            for proyecto in proyectos or []:
+                cls.guardar_proyecto(proyecto, proyecto.get("municipio"), conn=conn)
+
+    # ============================================
+    # IMPORTACIÓN DE LA BASE DE DATOS EN JSON
+    # ============================================
+    @staticmethod
+    def apartar_migrado(archivo):
+        """Renombra un .json ya migrado a .json.migrado: no se vuelve a importar y queda de respaldo"""
+        archivo = Path(archivo)
+        apartado = archivo.with_name(f"{archivo.name}.migrado")
+        try:
+            os.replace(archivo, apartado)
+        except FileNotFoundError:
+            pass  # otra sesión lo migró y apartó primero
+        return apartado
+
+    @classmethod
+    def migrar_documento(cls, nombre, datos, subcarpeta=None):
+        """Guarda un documento heredado solo si el almacén aún no lo tiene; True si lo guardó
+
+        Los datos del almacén siempre son más recientes que el archivo heredado.
+        """
+        try:
+            cls.guardar_documento(nombre, datos, subcarpeta, version=0)
+        except ConflictoVersion:
+            return False
+        return True
+
+    @classmethod
+    def importar_json(cls, directorio=None):
+        """Importa los archivos data/base_datos/**/*.json al almacén (una sola vez)
+
+        Cada archivo se renombra a .json.migrado; si el documento ya existía
+        en el almacén, se conserva la versión del almacén.
+        """
+        directorio = Path(directorio) if directorio else ConfigCota.obtener_ruta("base_datos")
+        resumen = {"importados": [], "existentes": [], "vacios": [], "errores": []}
+
+        for archivo in sorted(directorio.rglob("*.json")):
+            relativo = archivo.relative_to(directorio)
+            subcarpeta = relativo.parent.as_posix() if relativo.parent != Path(".") else None
+
+            if archivo.stat().st_size == 0:
+                resumen["vacios"].append(str(relativo))
+                continue
+
+            try:
+                with open(archivo, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+                if cls.migrar_documento(archivo.stem, datos, subcarpeta):
+                    resumen["importados"].append(str(relativo))
+                else:
+                    resumen["existentes"].append(str(relativo))
+                cls.apartar_migrado(archivo)
+            except (json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
+                resumen["errores"].append(f"{relativo}: {e}")
+
+        return resumen
+
+
+# Instancia global del almacén
+storage = StorageCota()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Importa la base de datos JSON al almacén SQLite")
+    parser.add_argument("directorio", nargs="?", help="Carpeta con los .json (por defecto data/base_datos)")
+    args = parser.parse_args()
+
+    resumen = StorageCota.importar_json(args.directorio)
+    print(f"📦 Almacén: {StorageCota.ruta_base_datos()}")
+    print(f"✅ Importados: {len(resumen['importados'])}")
+    for nombre in resumen["importados"]:
+        print(f"   ✓ {nombre}")
+    if resumen["existentes"]:
+        print(f"ℹ️  Ya estaban en el almacén (se conservó esa versión): {', '.join(resumen['existentes'])}")
+    if resumen["vacios"]:
+        print(f"⚠️  Vacíos (omitidos): {', '.join(resumen['vacios'])}")
+    for error in resumen["errores"]:
+        print(f"❌ {error}")
@@ -0,0 +1,295 @@
+"""
+PLANTILLAS DE INFORMES - ALCALDÍA DE COTA
+"""
+import hashlib
+import io
+import re
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+
+class ErrorPlantilla(Exception):
+    """Error de sintaxis o de datos faltantes en una plantilla"""
+
+
+# Filtros disponibles con la sintaxis {{ valor|filtro }}
+FILTROS = {
+    "upper": lambda v: str(v).upper(),
+    "lower": lambda v: str(v).lower(),
+    "contar": len,
+    "vinetas": lambda v: "\n".join(f"• {item}" for item in v),
+    "lineas": lambda v: "\n".join(str(item) for item in v),
+}
+
+
+class PlantillaCota:
+    """Plantilla compilada: se analiza una sola vez y se renderiza muchas veces
+
+    Sintaxis:
+        {{ municipio.nombre|upper }}      valor del contexto con filtros
+        {{ indicadores.visitas:, }}       valor con especificación de formato
+        {% linea %} / {% linea 40 - %}    separador (por defecto 70 '=')
+    """
+
+    _PATRON = re.compile(r"\{\{\s*(.+?)\s*\}\}|\{%\s*(.+?)\s*%\}", re.DOTALL)
+
+    def __init__(self, fuente, nombre="plantilla"):
+        self.nombre = nombre
+        self.fuente = fuente
+        self._partes = self._compilar(fuente)
+
+    def _compilar(self, fuente):
+        """Convierte la fuente en una lista de textos fijos y funciones de contexto"""
+        partes = []
+        posicion = 0
+        for coincidencia in self._PATRON.finditer(fuente):
+            partes.append(fuente[posicion:coincidencia.start()])
+            expresion, directiva = coincidencia.groups()
+            if expresion is not None:
+                partes.append(self._compilar_expresion(expresion))
+            else:
+                partes.append(self._compilar_directiva(directiva))
+            posicion = coincidencia.end()
+        partes.append(fuente[posicion:])
+
+        # Unir textos fijos consecutivos para renderizar con menos escrituras
+        compactas = []
+        for parte in partes:
+            if isinstance(parte, str):
+                if not parte:
+                    continue
+                if compactas and isinstance(compactas[-1], str):
+                    compactas[-1] += parte
+                    continue
+            compactas.append(parte)
+        return tuple(compactas)
+
+    def _compilar_expresion(self, expresion):
+        """Compila 'ruta|filtro:formato' en una función del contexto"""
+        expresion, _, formato = expresion.partition(":")
+        ruta, *filtros = [p.strip() for p in expresion.split("|")]
+        claves = tuple(ruta.split("."))
+
+        try:
+            funciones = tuple(FILTROS[f] for f in filtros)
+        except KeyError as e:
+            raise ErrorPlantilla(f"{self.nombre}: filtro desconocido {e}")
+
+        nombre = self.nombre
+
+        def evaluar(contexto):
+            valor = contexto
+            for clave in claves:
+                try:
+                    valor = valor[clave] if isinstance(valor, Mapping) else getattr(valor, clave)
+                except (KeyError, AttributeError):
+                    raise ErrorPlantilla(f"{nombre}: falta el dato '{ruta}'")
+            for funcion in funciones:
+                valor = funcion(valor)
+            return format(valor, formato) if formato else str(valor)
+
+        return evaluar
+
+    def _compilar_directiva(self, directiva):
+        """Las directivas se resuelven en tiempo de compilación"""
+        nombre, *argumentos = directiva.split()
+        if nombre == "linea":
+            ancho = int(argumentos[0]) if argumentos else 70
+            caracter = argumentos[1] if len(argumentos) > 1 else "="
+            return caracter * ancho
+        raise ErrorPlantilla(f"{self.nombre}: directiva desconocida '{nombre}'")
+
+    def renderizar(self, contexto, destino=None):
+        """Renderiza en 'destino' (objeto con write) o devuelve el texto"""
+        if destino is None:
+            destino = io.StringIO()
+            self.renderizar(contexto, destino)
+            return destino.getvalue()
+
+        escribir = destino.write
+        for parte in self._partes:
+            escribir(parte if isinstance(parte, str) else parte(contexto))
+        return None
+
+
+# ============================================
+# FORMATOS DE INFORME
+# ============================================
+FORMATO_MENSUAL = {
+    "encabezado": """
+{% linea %}
+INFORME DE GESTIÓN - GOBIERNO DIGITAL
+ALCALDÍA MUNICIPAL DE {{ municipio.nombre|upper }}, {{ municipio.departamento|upper }}
+{% linea %}
+
+PERÍODO: {{ mes }} de {{ año }}
+DEPENDENCIA: {{ dependencia }}
+FECHA: {{ fecha }} {{ hora }}
+RESPONSABLE: {{ responsable }}
+CARGO: {{ cargo }}
+
+""",
+    "actividades": """{% linea %}
+ACTIVIDADES REALIZADAS ({{ actividades|contar }})
+{% linea %}
+{{ actividades|vinetas }}
+
+""",
+    "indicadores": """{% linea %}
+INDICADORES
+{% linea %}
+PORTAL WEB:
+• Visitas: {{ indicadores.visitas:, }}
+• Páginas vistas: {{ indicadores.paginas:, }}
+
+TRÁMITES DIGITALES:
+• Trámites online: {{ indicadores.tramites }}
+• PQRS digitales: {{ indicadores.pqrs }}
+
+CAPACITACIÓN:
+• Personas capacitadas: {{ indicadores.capacitados }}
+• Horas de capacitación: {{ indicadores.horas }}
+
+INFRAESTRUCTURA:
+• Servidores activos: {{ indicadores.servidores }}
+• Disponibilidad: {{ indicadores.disponibilidad }}%
+
+""",
+    "firmas": """{% linea %}
+FIRMAS
+{% linea %}
+
+Elaborado por:
+___________________________
+{{ responsable }}
+{{ cargo }}
+
+Revisado por:
+___________________________
+{{ alcaldia.secretario_tic }}
+Oficina de Sistemas y TIC
+
+Aprobado por:
+___________________________
+{{ alcaldia.alcalde }}
+Alcaldía Municipal de {{ municipio.nombre }}
+
+""",
+    "contacto": """{% linea %}
+INFORMACIÓN DE CONTACTO
+{% linea %}
+• Dirección: {{ alcaldia.direccion }}
+• Teléfono: {{ alcaldia.telefono_principal }}
+• Correo: {{ alcaldia.correo_sistemas }}
+• Web: {{ alcaldia.sitio_web }}
+
+""",
+    "pie": """{% linea %}
+*Documento generado por Sistema de Gestión v{{ sistema.version }}*
+{% linea %}
+""",
+}
+
+
+class TemplatesCota:
+    """Registro de formatos de informe y caché de plantillas compiladas"""
+
+    _formatos = {"mensual": FORMATO_MENSUAL}
+    _compiladas = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def compilar(cls, fuente, nombre="plantilla"):
+        """Devuelve la plantilla compilada (en caché por contenido)"""
+        clave = hashlib.sha1(fuente.encode("utf-8")).hexdigest()
+        plantilla = cls._compiladas.get(clave)
+        if plantilla is None:
+            plantilla = PlantillaCota(fuente, nombre)
+            with cls._lock:
+                cls._compiladas.setdefault(clave, plantilla)
+        return plantilla
+
+    @classmethod
+    def registrar_formato(cls, nombre, secciones):
+        """Registra un formato de informe como {seccion: fuente} en orden"""
+        # Compilar de inmediato para detectar errores al registrar
+        for seccion, fuente in secciones.items():
+            cls.compilar(fuente, f"{nombre}.{seccion}")
+        cls._formatos[nombre] = dict(secciones)
+
+    @classmethod
+    def registrar_formato_archivo(cls, nombre, ruta):
+        """Registra un formato desde un archivo con secciones marcadas como [[seccion]]"""
+        secciones = {}
+        actual = None
+        for linea in Path(ruta).read_text(encoding="utf-8").splitlines(keepends=True):
+            marca = re.fullmatch(r"\[\[(\w+)\]\]\s*", linea)
+            if marca:
+                actual = marca.group(1)
+                secciones[actual] = ""
+            elif actual is not None:
+                secciones[actual] += linea
+        if not secciones:
+            raise ErrorPlantilla(f"{ruta}: no contiene secciones [[nombre]]")
+        cls.registrar_formato(nombre, secciones)
+
+    @classmethod
+    def formatos(cls):
+        """Nombres de los formatos registrados"""
+        return list(cls._formatos)
+
+    @classmethod
+    def secciones(cls, formato="mensual"):
+        """Secciones compiladas de un formato, en orden"""
+        try:
+            fuentes = cls._formatos[formato]
+        except KeyError:
+            raise ErrorPlantilla(f"Formato de informe desconocido: {formato}")
+        return [(seccion, cls.compilar(fuente, f"{formato}.{seccion}")) for seccion, fuente in fuentes.items()]
+
+    @staticmethod
+    def construir_contexto(config, mes, año, responsable, cargo, actividades, indicadores,
+                           fecha, hora, dependencia=None):
+        """Modelo de datos de un informe, común a la interfaz, los lotes y las exportaciones"""
+        return {
+            "municipio": config["municipio"],
+            "alcaldia": config["alcaldia"],
+            "sistema": config["sistema"],
+            "mes": mes,
+            "año": año,
+            "fecha": fecha,
+            "hora": hora,
+            "responsable": responsable,
+            "cargo": cargo,
+            "dependencia": dependencia or "",
+            "actividades": list(actividades),
+            "indicadores": indicadores,
+        }
+
+    @classmethod
+    def renderizar_informe(cls, contexto, formato="mensual", destino=None, secciones=None):
+        """Renderiza un informe completo (o solo las secciones indicadas)"""
+        if destino is None:
+            destino = io.StringIO()
+            cls.renderizar_informe(contexto, formato, destino, secciones)
+            return destino.getvalue()
+
+        for seccion, plantilla in cls.secciones(formato):
+            if secciones is None or seccion in secciones:
+                plantilla.renderizar(contexto, destino)
+        return None
+
+    @classmethod
+    def renderizar_lote(cls, contextos, abrir_destino, formato="mensual"):
+        """Renderiza muchos informes; abrir_destino(contexto) devuelve un archivo abierto"""
+        total = 0
+        for contexto in contextos:
+            with abrir_destino(contexto) as destino:
+                cls.renderizar_informe(contexto, formato, destino)
+            total += 1
+        return total
+
+
+# Instancia global de plantillas
+templates = TemplatesCota()
@@ -4,9 +4,18 @@ UTILIDADES DEL SISTEMA - ALCALDÍA DE COTA
 import json
 import os
 import hashlib
+import io
+import unicodedata
 from datetime import datetime, date
 from pathlib import Path
+from .archive import ArchivoCota
+from .atomic import EscrituraCota
 from .config import ConfigCota
+from .logger import logger
+from .metrics import medir
+from .projects import ProyectosCota
+from .search import BusquedaCota
+from .storage import StorageCota
 
 class UtilsCota:
     """Clase con funciones utilitarias para el sistema"""
@@ -29,15 +38,26 @@ class UtilsCota:
     @staticmethod
     def mes_actual_nombre():
         """Devuelve el nombre del mes actual en español"""
-        meses = [
-            "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-            "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-        ]
-        return meses[datetime.now().month - 1]
+        return ConfigCota.MESES[datetime.now().month - 1]
+    
+    @staticmethod
+    def normalizar_nombre(texto):
+        """Convierte un texto en un nombre seguro para archivos (sin tildes ni espacios)"""
+        texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+        return "_".join("".join(c if c.isalnum() else " " for c in texto).split())
     
     @classmethod
-    def guardar_informe(cls, contenido, mes, año, tipo="mensual"):
-        """Guarda un informe en la estructura organizada"""
+    @medir("utils.guardar_informe")
+    def guardar_informe(cls, contenido, mes, año, tipo="mensual", dependencia=None,
+                        responsable=None, cargo=None, actividades=None):
+        """Guarda un informe en la estructura organizada (sin duplicar contenidos idénticos)"""
+        # Un informe idéntico ya archivado para el mismo período no se vuelve a escribir
+        digest = ArchivoCota.digest_texto(contenido)
+        existente = ArchivoCota.buscar(año, mes, digest, tipo, dependencia)
+        if existente and existente["ruta"] and Path(existente["ruta"]).exists():
+            cls.registrar_log(f"Informe sin cambios (ya archivado): {Path(existente['ruta']).name}")
+            return existente["ruta"]
+        
         # Obtener rutas
         reports_dir = ConfigCota.obtener_ruta("reports")
         año_dir = reports_dir / str(año)
@@ -49,12 +69,40 @@ class UtilsCota:
         
         # Generar nombre de archivo
         timestamp = cls.timestamp()
-        nombre_archivo = f"Informe_{tipo}_Cota_{mes}_{año}_{timestamp}.txt"
-        ruta_completa = mes_dir / nombre_archivo
+        sufijo = f"_{cls.normalizar_nombre(dependencia)}" if dependencia else ""
+        municipio = cls.normalizar_nombre(StorageCota._municipio())
+        base_nombre = f"Informe_{tipo}_{municipio}{sufijo}_{mes}_{año}_{timestamp}"
+        
+        # Guardar contenido en el archivo por SHA-256 (escritura atómica, idempotente)
+        digest, tamano = ArchivoCota.archivar(io.BytesIO(contenido.encode("utf-8")))
         
-        # Guardar contenido
-        with open(ruta_completa, 'w', encoding='utf-8') as f:
-            f.write(contenido)
+        # Publicación y registro con el bloqueo del período: dos sesiones (o procesos
+        # del lote) no publican el mismo contenido dos veces ni se pisan el nombre
+        with EscrituraCota.bloqueo_periodo(año, mes, dependencia):
+            existente = ArchivoCota.buscar(año, mes, digest, tipo, dependencia)
+            if existente and existente["ruta"] and Path(existente["ruta"]).exists():
+                return existente["ruta"]
+            
+            # Si otro informe tomó el mismo nombre en el mismo segundo, se numera
+            for numero in range(1, 1000):
+                nombre_archivo = f"{base_nombre}.txt" if numero == 1 else f"{base_nombre}_{numero}.txt"
+                ruta_completa = mes_dir / nombre_archivo
+                try:
+                    ArchivoCota.publicar(digest, ruta_completa)
+                    break
+                except FileExistsError:
+                    continue
+            ArchivoCota.registrar(digest, tamano, año, mes, tipo, dependencia, str(ruta_completa))
+            
+            # Registrar en el almacén
+            StorageCota.registrar_informe(
+                mes, año, ruta=str(ruta_completa), hash=digest,
+                dependencia=dependencia, tipo=tipo, responsable=responsable,
+                cargo=cargo, actividades=actividades
+            )
+        
+        # Indexar para la búsqueda de texto completo
+        BusquedaCota.indexar_texto(ruta_completa, contenido, dependencia=dependencia)
         
         # Registrar en log
         cls.registrar_log(f"Informe generado: {nombre_archivo}")
@@ -62,59 +110,66 @@ class UtilsCota:
         return str(ruta_completa)
     
     @classmethod
-    def guardar_json(cls, datos, nombre_archivo, subcarpeta=None):
-        """Guarda datos en formato JSON"""
-        if subcarpeta:
-            ruta = ConfigCota.DATA_DIR / "base_datos" / subcarpeta
-            ruta.mkdir(exist_ok=True)
-            archivo_path = ruta / f"{nombre_archivo}.json"
-        else:
-            archivo_path = ConfigCota.DATA_DIR / "base_datos" / f"{nombre_archivo}.json"
-        
-        with open(archivo_path, 'w', encoding='utf-8') as f:
-            json.dump(datos, f, indent=2, ensure_ascii=False)
-        
-        return str(archivo_path)
+    @medir("utils.guardar_json")
+    def guardar_json(cls, datos, nombre_archivo, subcarpeta=None, version=None):
+        """Guarda datos JSON en el almacén SQLite (reemplaza los archivos de base_datos)
+
+        Con version, ConflictoVersion si otro editor lo guardó después de leerlo.
+        """
+        StorageCota.guardar_documento(nombre_archivo, datos, subcarpeta, version)
+        return StorageCota.referencia_documento(nombre_archivo, subcarpeta)
     
     @classmethod
+    @medir("utils.cargar_json")
     def cargar_json(cls, nombre_archivo, subcarpeta=None):
-        """Carga datos desde un archivo JSON"""
+        """Carga datos JSON desde el almacén; si no existen, migra el archivo antiguo (queda como .json.migrado)"""
+        datos = StorageCota.cargar_documento(nombre_archivo, subcarpeta)
+        if datos is not None:
+            return datos
+        
+        base_datos = ConfigCota.obtener_ruta("base_datos", crear=False)
         if subcarpeta:
-            archivo_path = ConfigCota.DATA_DIR / "base_datos" / subcarpeta / f"{nombre_archivo}.json"
+            archivo_path = base_datos / subcarpeta / f"{nombre_archivo}.json"
         else:
-            archivo_path = ConfigCota.DATA_DIR / "base_datos" / f"{nombre_archivo}.json"
+            archivo_path = base_datos / f"{nombre_archivo}.json"
         
         try:
             with open(archivo_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                datos = json.load(f)
         except FileNotFoundError:
             return {}
-        except json.JSONDecodeError:
-            return {}
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            if archivo_path.stat().st_size == 0:
+                return {}
+            # Un archivo dañado no se trata como vacío: se aparta y se informa
+            apartado = archivo_path.with_name(f"{archivo_path.name}.danado_{cls.timestamp()}")
+            os.replace(archivo_path, apartado)
+            cls.registrar_log(f"JSON dañado apartado en {apartado.name}: {e}", "ERROR")
+            raise ValueError(f"{archivo_path.name} está dañado ({e}); se conservó como {apartado.name}") from e
+        
+        # Si otra sesión lo migró entre medio, gana lo que ya está en el almacén
+        if not StorageCota.migrar_documento(nombre_archivo, datos, subcarpeta):
+            datos = StorageCota.cargar_documento(nombre_archivo, subcarpeta)
+        StorageCota.apartar_migrado(archivo_path)
+        return datos
     
     @staticmethod
+    @medir("utils.calcular_hash")
     def calcular_hash(texto):
         """Calcula el hash MD5 de un texto (para verificar integridad)"""
         return hashlib.md5(texto.encode()).hexdigest()
     
     @classmethod
+    @medir("utils.registrar_log")
     def registrar_log(cls, mensaje, nivel="INFO"):
-        """Registra un mensaje en el log del sistema"""
-        log_dir = ConfigCota.BASE_DIR / "logs"
-        log_dir.mkdir(exist_ok=True)
-        
-        log_file = log_dir / "sistema.log"
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(f"[{timestamp}] [{nivel}] {mensaje}\n")
+        """Registra un mensaje en el log del sistema (escritura asíncrona por lotes)"""
+        logger.registrar(mensaje, nivel)
     
     @classmethod
+    @medir("utils.obtener_proyectos_activos")
     def obtener_proyectos_activos(cls):
         """Obtiene la lista de proyectos activos"""
-        config = ConfigCota.cargar_configuracion()
-        proyectos = config.get("proyectos_prioritarios", [])
-        return [p for p in proyectos if p.get("estado") == "En ejecución"]
+        return ProyectosCota.buscar(estado=ProyectosCota.ESTADO_EN_EJECUCION)
     
     @classmethod
     def obtener_indicadores_meta(cls):
@@ -137,11 +192,12 @@ class UtilsCota:
             return f"{numero:,}".replace(",", ".")
     
     @classmethod
+    @medir("utils.verificar_archivos_sistema")
     def verificar_archivos_sistema(cls):
         """Verifica que todos los archivos necesarios existan"""
         archivos_requeridos = [
-            ConfigCota.CONFIG_DIR / "cota.json",
-            ConfigCota.BASE_DIR / "requirements.txt",
+            ConfigCota.ruta_configuracion(),
+            ConfigCota.APP_DIR.parent / "requirements.txt",
             ConfigCota.APP_DIR / "main.py"
         ]
         
@@ -9,11 +9,11 @@ echo   GOBIERNO DIGITAL - VERSION DEFINITIVA
 echo ============================================
 echo.
 
-:: Verificar que estamos en C:\Sistema_Cota
-cd /d "C:\Sistema_Cota" 2>nul
+:: Trabajar en la carpeta del sistema (donde esta este archivo)
+:: Para usar otra carpeta de datos defina COTA_BASE_DIR antes de ejecutar
+cd /d "%~dp0" 2>nul
 if errorlevel 1 (
-    echo ERROR: No se encuentra C:\Sistema_Cota
-    echo Crea la carpeta y coloca alli los archivos
+    echo ERROR: No se puede acceder a %~dp0
     pause
     exit /b 1
 )
@@ -41,22 +41,14 @@ if errorlevel 1 (
     echo ✓ Dependencias OK
 )
 
-:: 3. Verificar estructura
+:: 3. Verificar estructura, archivos y configuracion (con tiempos)
 echo [3] Verificando estructura...
-if not exist "config\cota.json" (
-    echo ✗ ERROR: No se encuentra config\cota.json
-    echo Crea el archivo de configuracion
-    pause
-    exit /b 1
-)
-
-if not exist "app\main.py" (
-    echo ✗ ERROR: No se encuentra app\main.py
+python -m app.check
+if errorlevel 1 (
+    echo ✗ ERROR: La verificacion del sistema fallo
     pause
     exit /b 1
 )
-
-echo ✓ Estructura OK
 echo.
 
 :: 4. Iniciar sistema
@@ -65,31 +57,23 @@ echo.
 echo ============================================
 echo   URL: http://localhost:8600
 echo   Puerto: 8600
+echo   Otros municipios: http://localhost:8600/?municipio=ID
+echo   (uno por archivo config\municipios\ID.json)
 echo ============================================
 echo.
-echo Por favor espera 10 segundos...
-echo Se abrira en tu navegador automaticamente.
+echo Se abrira en tu navegador en cuanto el servidor este listo.
+echo Si no se abre, visita manualmente: http://localhost:8600
+echo Presiona Ctrl+C en esta ventana para detener.
 echo.
 
-:: Cerrar procesos anteriores
-taskkill /F /IM python.exe 2>nul
-timeout /t 3 /nobreak >nul
-
-:: Iniciar Streamlit
-start /B python -m streamlit run app/main.py --server.port 8600 --server.headless false
-
-:: Esperar
-timeout /t 10 /nobreak >nul
+:: Cerrar solo una instancia anterior del sistema (la que escucha en el puerto 8600)
+for /f "tokens=5" %%p in ('netstat -ano ^| findstr /r /c:":8600 .*LISTENING"') do (
+    taskkill /F /PID %%p >nul 2>&1
+)
 
-:: Abrir navegador
-start http://localhost:8600
+:: Iniciar Streamlit; con headless false abre el navegador cuando el servidor responde
+python -m streamlit run app/main.py --server.port 8600 --server.headless false
 
 echo.
-echo ✓ SISTEMA INICIADO CORRECTAMENTE
-echo.
-echo Si no se abre, visita manualmente:
-echo http://localhost:8600
-echo.
-echo Presiona Ctrl+C en esta ventana para detener.
-echo.
+echo Sistema detenido.
 pause
\ No newline at end of file
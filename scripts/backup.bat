@@ -0,0 +1,16 @@
+@echo off
+chcp 65001 >nul
+
+:: Respaldo incremental inmediato (el servicio de tareas lo hace cada noche)
+:: Destino: carpeta respaldos\ o la variable COTA_RESPALDOS_DIR
+cd /d "%~dp0.." 2>nul
+if errorlevel 1 (
+    echo ERROR: No se puede acceder a %~dp0..
+    exit /b 1
+)
+
+python -m app.scheduler --ejecutar respaldo
+if errorlevel 1 (
+    echo ✗ ERROR: El respaldo fallo, revise logs\sistema.log
+    exit /b 1
+)
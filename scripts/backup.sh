@@ -0,0 +1,4 @@
+#!/bin/sh
+# Respaldo incremental inmediato (equivalente portable de backup.bat)
+cd "$(dirname "$0")/.." || exit 1
+exec python -m app.scheduler --ejecutar respaldo
@@ -0,0 +1,17 @@
+@echo off
+chcp 65001 >nul
+title SISTEMA ALCALDIA DE COTA - SERVIDOR Y TAREAS
+
+:: Carpeta del sistema (la superior a scripts\)
+cd /d "%~dp0.." 2>nul
+if errorlevel 1 (
+    echo ERROR: No se puede acceder a %~dp0..
+    exit /b 1
+)
+
+:: Tareas programadas (respaldos, consolidados, indice) con prioridad baja
+:: para no competir con los usuarios; horarios en config\cota.json
+start "TAREAS COTA" /B /LOW python -m app.scheduler
+
+:: Servidor sin abrir navegador (equipo servidor o tarea de Windows)
+python -m streamlit run app/main.py --server.port 8600 --server.headless true
@@ -0,0 +1,11 @@
+#!/bin/sh
+# Servidor y tareas programadas (equivalente portable de run.bat)
+cd "$(dirname "$0")/.." || exit 1
+
+# Tareas programadas (app.scheduler baja su propia prioridad con os.nice);
+# se detienen junto con el servidor
+python -m app.scheduler &
+TAREAS=$!
+trap 'kill $TAREAS 2>/dev/null' EXIT INT TERM
+
+python -m streamlit run app/main.py --server.port 8600 --server.headless true
@@ -0,0 +1,34 @@
+"""
+PRUEBAS DEL NÚCLEO - ALCALDÍA DE COTA
+
+Uso:
+    python -m pytest tests
+
+Cada prueba trabaja en una carpeta temporal propia (config, data, reports,
+logs y respaldos): nunca toca las carpetas del sistema.
+"""
+import json
+import pytest
+from app.config import ConfigCota
+from app.projects import ProyectosCota
+from app.storage import StorageCota
+
+DEPENDENCIAS = ("Oficina de Sistemas y TIC", "Secretaría de Gobierno")
+
+VARIABLES_RUTAS = ("COTA_BASE_DIR", "COTA_CONFIG_DIR", "COTA_DATA_DIR", "COTA_REPORTS_DIR",
+                   "COTA_LOGS_DIR", "COTA_MUNICIPIOS_DIR", "COTA_RESPALDOS_DIR")
+
+
+@pytest.fixture(autouse=True)
+def base(tmp_path, monkeypatch):
+    """Sistema vacío en tmp_path con la configuración por defecto y dos dependencias"""
+    for variable in VARIABLES_RUTAS:
+        monkeypatch.delenv(variable, raising=False)
+    configuracion = dict(ConfigCota._configuracion_por_defecto(), dependencias_municipales=list(DEPENDENCIAS))
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "cota.json").write_text(json.dumps(configuracion, ensure_ascii=False), encoding="utf-8")
+    ConfigCota.configurar_rutas(tmp_path)
+    ConfigCota._cache.clear()
+    ProyectosCota.invalidar()
+    yield tmp_path
+    StorageCota.cerrar()
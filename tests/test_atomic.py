@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import pytest
+from app.atomic import EscrituraCota
+
+
+def sostener(*clave, segundos=5.0):
+    """Toma el bloqueo en otro hilo; devuelve (tomado, soltar)"""
+    tomado, soltar = threading.Event(), threading.Event()
+
+    def trabajo():
+        with EscrituraCota.bloqueo(*clave):
+            tomado.set()
+            soltar.wait(segundos)
+
+    threading.Thread(target=trabajo, daemon=True).start()
+    assert tomado.wait(5)
+    return soltar
+
+
+def test_exclusion_entre_hilos():
+    dentro, maximo, total = [0], [0], [0]
+
+    def trabajo():
+        for _ in range(20):
+            with EscrituraCota.bloqueo("contador", 1):
+                dentro[0] += 1
+                maximo[0] = max(maximo[0], dentro[0])
+                valor = total[0]
+                time.sleep(0.0005)
+                total[0] = valor + 1
+                dentro[0] -= 1
+
+    hilos = [threading.Thread(target=trabajo) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert (total[0], maximo[0]) == (160, 1)
+
+
+def test_espera_agotada():
+    soltar = sostener("informe", 2024, 3)
+    try:
+        inicio = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with EscrituraCota.bloqueo("informe", 2024, 3, espera=0.2):
+                pass
+        assert time.monotonic() - inicio < 2
+        # Otra clave no espera
+        with EscrituraCota.bloqueo("informe", 2024, 4, espera=0):
+            pass
+    finally:
+        soltar.set()
+
+
+def test_exclusion_entre_procesos(base):
+    codigo = (
+        "import sys, time\n"
+        "from app.atomic import EscrituraCota\n"
+        "with EscrituraCota.bloqueo('tarea', 'respaldo'):\n"
+        "    print('tomado', flush=True)\n"
+        "    sys.stdin.readline()\n"
+    )
+    entorno = dict(os.environ, COTA_BASE_DIR=str(base),
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(Path(__file__).resolve().parents[1]),
+                                                            os.environ.get("PYTHONPATH")])))
+    proceso = subprocess.Popen([sys.executable, "-c", codigo], env=entorno, text=True,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        assert proceso.stdout.readline().strip() == "tomado"
+        with pytest.raises(TimeoutError):
+            with EscrituraCota.bloqueo("tarea", "respaldo", espera=0.2):
+                pass
+        proceso.stdin.write("\n")
+        proceso.stdin.flush()
+        assert proceso.wait(10) == 0
+        with EscrituraCota.bloqueo("tarea", "respaldo", espera=2):
+            pass
+    finally:
+        proceso.kill()
+
+
+@pytest.mark.skipif(not Path("/proc/self/fd").is_dir(), reason="requiere /proc")
+def test_no_quedan_descriptores_ni_locks():
+    antes = len(os.listdir("/proc/self/fd"))
+    for mes in range(1, 13):
+        for año in range(2000, 2020):
+            with EscrituraCota.bloqueo_periodo(año, mes):
+                pass
+    assert len(os.listdir("/proc/self/fd")) == antes
+    assert EscrituraCota._locks == {}
@@ -0,0 +1,61 @@
+import sqlite3
+from app.backup import DIRECTORIOS_EXCLUIDOS, RespaldoCota
+from app.config import ConfigCota
+from app.storage import StorageCota
+
+MUNICIPIO = ConfigCota.MUNICIPIO_POR_DEFECTO
+
+
+def escribir(ruta, texto):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(texto, encoding="utf-8")
+
+
+def contenido(carpeta):
+    """{ruta relativa: bytes} de lo que se respalda, sin la base de datos (se compara aparte)"""
+    return {
+        ruta.relative_to(carpeta).as_posix(): ruta.read_bytes()
+        for ruta in carpeta.rglob("*")
+        if ruta.is_file() and ruta.suffix != ".db" and not RespaldoCota._excluido(ruta)
+        and not DIRECTORIOS_EXCLUIDOS.intersection(ruta.relative_to(carpeta).parts)
+    }
+
+
+def test_respaldo_incremental_y_restauracion(base, tmp_path_factory):
+    data, reports = ConfigCota.directorios_municipio()
+    escribir(data / "documentos" / "acta.txt", "acta de marzo")
+    escribir(data / "documentos" / "borrar.txt", "temporal")
+    escribir(reports / "2024" / "Marzo" / "informe.txt", "informe de marzo")
+    escribir(reports / "2024" / "Marzo" / "copia.txt", "informe de marzo")
+    StorageCota.guardar_indicadores("Oficina de Sistemas y TIC", 2024, 3, {"visitas": 1500})
+
+    primero = RespaldoCota.respaldar()
+    assert primero["nuevos"] >= 5
+    # El contenido repetido se guarda una sola vez
+    assert primero["repetidos"] == 1
+
+    escribir(data / "documentos" / "acta.txt", "acta de marzo, revisada")
+    escribir(reports / "2024" / "Abril" / "informe.txt", "informe de abril")
+    (data / "documentos" / "borrar.txt").unlink()
+    StorageCota.guardar_indicadores("Oficina de Sistemas y TIC", 2024, 4, {"visitas": 1700})
+
+    segundo = RespaldoCota.respaldar()
+    # Solo lo modificado: el acta, el informe de abril y la base de datos
+    assert (segundo["nuevos"], segundo["eliminados"]) == (3, 1)
+    assert segundo["sin_cambios"] == primero["archivos"] - 3
+    assert segundo["respaldo"] != primero["respaldo"]
+    assert RespaldoCota.respaldar()["nuevos"] == 0
+
+    destino = tmp_path_factory.mktemp("restaurado")
+    assert RespaldoCota.restaurar(destino) == segundo["archivos"]
+    assert contenido(destino / "config") == contenido(ConfigCota.CONFIG_DIR)
+    assert contenido(destino / MUNICIPIO / "data") == contenido(data)
+    assert contenido(destino / MUNICIPIO / "reports") == contenido(reports)
+    assert not (destino / MUNICIPIO / "data" / "documentos" / "borrar.txt").exists()
+
+    restaurada = sqlite3.connect(destino / MUNICIPIO / "data" / "base_datos" / StorageCota.NOMBRE_BASE_DATOS)
+    try:
+        filas = restaurada.execute("SELECT mes, valor FROM indicadores ORDER BY mes").fetchall()
+    finally:
+        restaurada.close()
+    assert filas == [(3, 1500), (4, 1700)]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from app.dashboard import TableroCota
+
+NAN = np.nan
+# Códigos de período: año * 12 + mes - 1 (enero a junio de 2024)
+PERIODOS = np.arange(2024 * 12, 2024 * 12 + 6)
+MATRIZ = np.array([
+    [1, 2, 3, 4, 5, 6],
+    [NAN, NAN, NAN, 4, NAN, 6],
+    [1, NAN, NAN, 4, 5, NAN],
+], dtype=float)
+
+
+@pytest.mark.parametrize("agregacion, esperado", [
+    ("suma", [[6, 15], [NAN, 10], [1, 9]]),
+    ("promedio", [[2, 5], [NAN, 5], [1, 4.5]]),
+    # 'ultimo' toma el último mes con dato del bloque
+    ("ultimo", [[3, 6], [NAN, 6], [1, 5]]),
+])
+def test_reducir_trimestres(agregacion, esperado):
+    inicios, reducida = TableroCota.reducir(PERIODOS, MATRIZ, agregacion, 3)
+    np.testing.assert_array_equal(inicios, [2024 * 12, 2024 * 12 + 3])
+    np.testing.assert_array_equal(reducida, esperado)
+
+
+def test_reducir_bloques_incompletos():
+    # La serie empieza en febrero: el primer trimestre solo tiene febrero y marzo
+    inicios, reducida = TableroCota.reducir(PERIODOS[1:], MATRIZ[:1, 1:], "suma", 3)
+    np.testing.assert_array_equal(inicios, [2024 * 12 + 1, 2024 * 12 + 3])
+    np.testing.assert_array_equal(reducida, [[5, 15]])
+
+
+def test_reducir_años():
+    periodos = np.arange(2023 * 12 + 10, 2024 * 12 + 2)  # nov-2023 a feb-2024
+    inicios, reducida = TableroCota.reducir(periodos, np.array([[1.0, 2, 3, 4]]), "suma", 12)
+    assert [TableroCota.etiqueta_periodo(codigo, 12) for codigo in inicios] == ["2023", "2024"]
+    np.testing.assert_array_equal(reducida, [[3, 7]])
+
+
+def test_reducir_sin_cambios():
+    inicios, reducida = TableroCota.reducir(PERIODOS, MATRIZ, "suma", 1)
+    assert inicios is PERIODOS and reducida is MATRIZ
+    vacios = np.array([], dtype=int)
+    assert TableroCota.reducir(vacios, np.empty((2, 0)), "suma", 3)[0] is vacios
@@ -0,0 +1,79 @@
+import io
+import math
+import pytest
+from app.importer import ErrorImportacion, ImportadorCota
+
+
+def analizar(texto, **opciones):
+    return ImportadorCota.analizar(io.BytesIO(texto.encode("utf-8")), "exporte.csv", **opciones)
+
+
+@pytest.mark.parametrize("celda, esperado", [
+    ("1234", 1234), ("1.234", 1234), ("1,234", 1234), ("1.234.567", 1234567),
+    ("1.234,5", 1234.5), ("1,234.5", 1234.5), ("99,5 %", 99.5), ("0.5", 0.5),
+    (" 12\xa0000 ", 12000), (7, 7), (2.25, 2.25),
+])
+def test_numero(celda, esperado):
+    assert ImportadorCota._numero(celda) == esperado
+
+
+@pytest.mark.parametrize("celda", ["nan", "NaN", "inf", "-Infinity", math.nan, math.inf, "abc", ""])
+def test_numero_invalido(celda):
+    with pytest.raises(ValueError):
+        ImportadorCota._numero(celda)
+
+
+def test_analizar_consolida_por_mes():
+    resultado = analizar(
+        "fecha,dependencia,visitas,disponibilidad,servidores\n"
+        "2024-03-01,Oficina de Sistemas y TIC,10,98,5\n"
+        "02/03/2024,oficina de sistemas y tic,\"1.200\",100,6\n"
+        "2024-04-01,Secretaría de Gobierno,7,,\n"
+    )
+    assert (resultado["filas"], resultado["validas"], resultado["rechazadas"]) == (3, 3, 0)
+    assert resultado["periodos"] == {
+        # visitas se suma, disponibilidad se promedia y servidores toma el último día
+        ("Oficina de Sistemas y TIC", 2024, 3): {"visitas": 1210, "disponibilidad": 99, "servidores": 6},
+        ("Secretaría de Gobierno", 2024, 4): {"visitas": 7},
+    }
+    assert resultado["dias"] == {("Oficina de Sistemas y TIC", 2024, 3): 2, ("Secretaría de Gobierno", 2024, 4): 1}
+
+
+def test_analizar_rechaza_filas_completas():
+    resultado = analizar(
+        "fecha,visitas,paginas,disponibilidad\n"
+        "2024-03-01,nan,inf,nan\n"
+        "2024-03-02,10,20,101\n"
+        "2024-03-03,-5,20,99\n"
+        "sin fecha,10,20,99\n"
+        "2024-03-05,10,20,99\n",
+        dependencia="Oficina de Sistemas y TIC",
+    )
+    assert (resultado["validas"], resultado["rechazadas"]) == (1, 4)
+    assert [linea for linea, _ in resultado["errores"]] == [2, 3, 4, 5]
+    # Una fila rechazada no aporta ninguno de sus valores
+    assert resultado["periodos"] == {
+        ("Oficina de Sistemas y TIC", 2024, 3): {"visitas": 10, "paginas": 20, "disponibilidad": 99},
+    }
+
+
+def test_analizar_formato_largo():
+    resultado = analizar(
+        "fecha;indicador;valor\n"
+        "2024-05-01;Visitas;100\n"
+        "2024-05-02;visitas;50\n"
+        "2024-05-02;desconocido;1\n",
+        dependencia="Secretaría de Gobierno",
+    )
+    assert resultado["periodos"] == {("Secretaría de Gobierno", 2024, 5): {"visitas": 150}}
+    assert resultado["rechazadas"] == 1
+
+
+def test_analizar_dependencias():
+    resultado = analizar("fecha,dependencia,visitas\n2024-03-01,Bodega,1\n")
+    assert resultado["validas"] == 0
+    assert "Bodega" in resultado["errores"][0][1]
+    with pytest.raises(ErrorImportacion):
+        analizar("fecha,visitas\n2024-03-01,1\n")
+    with pytest.raises(ErrorImportacion):
+        analizar("fecha,visitas\n2024-03-01,1\n", dependencia="Bodega")
@@ -0,0 +1,79 @@
+from datetime import date
+import pytest
+from app.projects import RegistroProyectos
+
+PROYECTOS = [
+    {"id": "A", "estado": "En ejecución", "prioridad": "Alta",
+     "fecha_inicio": "2024-01-15", "fecha_fin_estimada": "2024-03-10"},
+    {"id": "B", "estado": "Planeación", "prioridad": "Media",
+     "fecha_inicio": "2024-03-20", "fecha_fin_estimada": "2024-06-30"},
+    # Sin fecha de fin: abierto
+    {"id": "C", "estado": "En ejecución", "prioridad": "Media", "fecha_inicio": "2023-11-01"},
+    # Fechas sin ceros
+    {"id": "D", "estado": "Planeación", "prioridad": "Alta", "fecha_inicio": "2024-7-1", "fecha_fin": "2024-8-15"},
+    # Sin fecha de inicio: no aparece en filtros por fecha
+    {"id": "E", "estado": "En ejecución", "prioridad": "Baja"},
+]
+
+
+@pytest.fixture
+def registro():
+    return RegistroProyectos(PROYECTOS)
+
+
+def ids(proyectos):
+    return [proyecto["id"] for proyecto in proyectos]
+
+
+def test_sin_filtros(registro):
+    assert ids(registro.buscar()) == ["A", "B", "C", "D", "E"]
+
+
+def test_estado_y_prioridad(registro):
+    assert ids(registro.buscar(estado="En ejecución")) == ["A", "C", "E"]
+    assert ids(registro.buscar(estado="En ejecución", prioridad="Media")) == ["C"]
+    assert registro.buscar(estado="Cancelado") == []
+
+
+@pytest.mark.parametrize("desde, hasta, esperado", [
+    ("2024-03-01", "2024-03-31", ["A", "B", "C"]),
+    # Los extremos se comparan con la fecha exacta, no solo con el mes
+    ("2024-03-11", "2024-03-19", ["C"]),
+    ("2024-03-10", "2024-03-10", ["A", "C"]),
+    # Rangos abiertos
+    ("2024-03-15", None, ["B", "C", "D"]),
+    (None, "2024-01-01", ["C"]),
+    (None, "2023-10-31", []),
+    # Fechas sin ceros y objetos date
+    ("2024-7-20", "2024-07-31", ["C", "D"]),
+    (date(2024, 8, 16), date(2025, 1, 1), ["C"]),
+    # Rango invertido
+    ("2024-06-01", "2024-01-01", []),
+])
+def test_rango_de_fechas(registro, desde, hasta, esperado):
+    assert ids(registro.buscar(desde=desde, hasta=hasta)) == esperado
+
+
+def test_activos_en(registro):
+    assert ids(registro.activos_en(2024, 3)) == ["A", "B", "C"]
+    assert ids(registro.activos_en(2024, "Agosto", prioridad="Alta")) == ["D"]
+
+
+@pytest.mark.parametrize("fecha", ["2024", "2024-13-01", "mañana"])
+def test_fecha_invalida(registro, fecha):
+    with pytest.raises(ValueError):
+        registro.buscar(desde=fecha)
+
+
+def test_actualizar_y_eliminar_reindexan(registro):
+    registro.actualizar(dict(PROYECTOS[0], fecha_fin_estimada="2024-12-31", estado="Finalizado"))
+    assert ids(registro.buscar(desde="2024-11-01")) == ["A", "C"]
+    assert ids(registro.buscar(estado="En ejecución")) == ["C", "E"]
+
+    registro.eliminar("A")
+    registro.eliminar("B")
+    registro.eliminar("D")
+    assert "A" not in registro
+    assert ids(registro.buscar(desde="2024-01-01", hasta="2024-12-31")) == ["C"]
+    # Los meses que quedaron vacíos no se conservan en el índice
+    assert registro.por_mes == {}
@@ -0,0 +1,46 @@
+from datetime import datetime
+import pytest
+from app.scheduler import Cron
+
+
+@pytest.mark.parametrize("expresion, desde, esperado", [
+    ("*/15 * * * *", datetime(2024, 3, 1, 10, 7, 30), datetime(2024, 3, 1, 10, 15)),
+    # Estrictamente posterior: un minuto que ya cumple no se repite
+    ("*/15 * * * *", datetime(2024, 3, 1, 10, 15), datetime(2024, 3, 1, 10, 30)),
+    ("30 1 * * *", datetime(2024, 3, 1, 2, 0), datetime(2024, 3, 2, 1, 30)),
+    ("0 8-18/2 * * *", datetime(2024, 3, 1, 8, 1), datetime(2024, 3, 1, 10, 0)),
+    ("0 0 1 1 *", datetime(2024, 6, 10, 12, 0), datetime(2025, 1, 1, 0, 0)),
+    ("0 6 1,15 * *", datetime(2024, 3, 2), datetime(2024, 3, 15, 6, 0)),
+    # 29 de febrero: solo en años bisiestos
+    ("0 0 29 2 *", datetime(2024, 3, 1), datetime(2028, 2, 29, 0, 0)),
+])
+def test_siguiente(expresion, desde, esperado):
+    assert Cron(expresion).siguiente(desde) == esperado
+
+
+def test_domingo_es_0_y_7():
+    desde = datetime(2024, 9, 2)  # lunes
+    assert Cron("0 8 * * 0").siguiente(desde) == Cron("0 8 * * 7").siguiente(desde) == datetime(2024, 9, 8, 8, 0)
+
+
+def test_dia_del_mes_o_dia_de_la_semana():
+    # Con ambos restringidos basta uno: el 13 o cualquier viernes
+    cron = Cron("0 9 13 * 5")
+    assert cron.siguiente(datetime(2024, 9, 1)) == datetime(2024, 9, 6, 9, 0)
+    assert cron.siguiente(datetime(2024, 9, 6, 9, 0)) == datetime(2024, 9, 13, 9, 0)
+
+
+def test_dia_de_la_semana_solo():
+    # Con el día del mes libre, solo cuenta el día de la semana (1 = lunes)
+    assert Cron("0 7 * * 1").siguiente(datetime(2024, 9, 3)) == datetime(2024, 9, 9, 7, 0)
+
+
+@pytest.mark.parametrize("expresion", ["* * *", "60 * * * *", "0 24 * * *", "0 0 0 * *", "*/0 * * * *", "a * * * *"])
+def test_expresion_invalida(expresion):
+    with pytest.raises(ValueError):
+        Cron(expresion)
+
+
+def test_expresion_que_nunca_se_cumple():
+    with pytest.raises(ValueError):
+        Cron("0 0 31 2 *").siguiente(datetime(2024, 1, 1))
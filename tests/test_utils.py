@@ -0,0 +1,54 @@
+import threading
+from pathlib import Path
+from app.config import ConfigCota
+from app.storage import StorageCota
+from app.utils import UtilsCota
+
+DEPENDENCIA = "Oficina de Sistemas y TIC"
+
+
+def informes_en_disco():
+    return sorted(ConfigCota.obtener_ruta("reports").rglob("Informe_*.txt"))
+
+
+def test_contenido_repetido_no_se_duplica():
+    primera = UtilsCota.guardar_informe("INFORME DE MARZO", "Marzo", 2024, dependencia=DEPENDENCIA)
+    segunda = UtilsCota.guardar_informe("INFORME DE MARZO", "Marzo", 2024, dependencia=DEPENDENCIA)
+    assert segunda == primera
+    assert informes_en_disco() == [Path(primera)]
+    assert len(StorageCota.obtener_informes(año=2024, mes="Marzo")) == 1
+
+
+def test_contenido_o_periodo_distinto_se_guarda():
+    rutas = {
+        UtilsCota.guardar_informe("INFORME DE MARZO", "Marzo", 2024, dependencia=DEPENDENCIA),
+        UtilsCota.guardar_informe("INFORME DE MARZO (corregido)", "Marzo", 2024, dependencia=DEPENDENCIA),
+        UtilsCota.guardar_informe("INFORME DE MARZO", "Marzo", 2024, dependencia="Secretaría de Gobierno"),
+        UtilsCota.guardar_informe("INFORME DE MARZO", "Abril", 2024, dependencia=DEPENDENCIA),
+    }
+    assert len(rutas) == 4
+    assert len(informes_en_disco()) == 4
+    assert Path(sorted(rutas)[0]).read_text(encoding="utf-8").startswith("INFORME DE MARZO")
+
+
+def test_archivo_borrado_se_vuelve_a_guardar():
+    primera = UtilsCota.guardar_informe("INFORME DE MAYO", "Mayo", 2024, dependencia=DEPENDENCIA)
+    Path(primera).unlink()
+    segunda = UtilsCota.guardar_informe("INFORME DE MAYO", "Mayo", 2024, dependencia=DEPENDENCIA)
+    assert Path(segunda).read_text(encoding="utf-8") == "INFORME DE MAYO"
+
+
+def test_sesiones_concurrentes_guardan_una_vez():
+    rutas = []
+
+    def guardar():
+        rutas.append(UtilsCota.guardar_informe("INFORME DE JUNIO", "Junio", 2024, dependencia=DEPENDENCIA))
+
+    hilos = [threading.Thread(target=guardar) for _ in range(6)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert len(set(rutas)) == 1
+    assert len(informes_en_disco()) == 1
+    assert len(StorageCota.obtener_informes(año=2024, mes="Junio")) == 1